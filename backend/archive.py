@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import asyncio
+import gzip
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import List, Optional
+
+from backend.config import get_settings
+from backend.locking import file_lock
+from backend.storage import ARCHIVE_DIR, DB_PATH, LOG_FILE, LOG_LOCK, connect
+
+logger = logging.getLogger("backend.archive")
+
+MAINTENANCE_LOCK = ARCHIVE_DIR / "maintenance.lock"
+SEGMENT_PREFIX = "ai_output-"
+
+
+def _compressor() -> tuple[str, object]:
+    try:
+        import zstandard
+    except ImportError:
+        return ".gz", None
+    return ".zst", zstandard
+
+
+def segment_started_at(path: Path) -> Optional[datetime]:
+    try:
+        with path.open("r", encoding="utf-8") as stream:
+            first = stream.readline()
+    except OSError:
+        return None
+    if not first.strip():
+        return None
+    try:
+        return datetime.fromisoformat(json.loads(first)["created_at"])
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def rotate_active_segment(max_bytes: int, max_age: timedelta) -> Optional[Path]:
+    """Close the active JSONL file if it is too large or too old.
+
+    The rename happens under the same lock writers hold, so no line is split
+    across segments. Returns the closed (still uncompressed) segment.
+    """
+
+    with file_lock(LOG_LOCK):
+        try:
+            size = LOG_FILE.stat().st_size
+        except FileNotFoundError:
+            return None
+        if size == 0:
+            return None
+        started = segment_started_at(LOG_FILE)
+        too_old = started is not None and datetime.now(timezone.utc) - started >= max_age
+        if size < max_bytes and not too_old:
+            return None
+        stamp = (started or datetime.now(timezone.utc)).strftime("%Y%m%dT%H%M%S")
+        target = ARCHIVE_DIR / f"{SEGMENT_PREFIX}{stamp}-{os.getpid()}.jsonl"
+        os.replace(LOG_FILE, target)
+        LOG_FILE.touch()
+    return target
+
+
+def export_parquet(segment: Path) -> Optional[Path]:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        logger.warning("ARCHIVE_PARQUET is enabled but pyarrow is not installed; skipping export.")
+        return None
+    with segment.open("r", encoding="utf-8") as stream:
+        rows = [json.loads(line) for line in stream if line.strip()]
+    if not rows:
+        return None
+    target = segment.with_suffix(".parquet")
+    pq.write_table(pa.Table.from_pylist(rows), target, compression="zstd")
+    return target
+
+
+def compress_segment(segment: Path) -> Path:
+    suffix, zstandard = _compressor()
+    target = segment.with_name(segment.name + suffix)
+    tmp_path = target.with_name(target.name + ".tmp")
+    with segment.open("rb") as source:
+        if zstandard is not None:
+            with tmp_path.open("wb") as sink:
+                zstandard.ZstdCompressor(level=10).copy_stream(source, sink)
+        else:
+            with gzip.open(tmp_path, "wb", compresslevel=6) as sink:
+                shutil.copyfileobj(source, sink)
+    os.replace(tmp_path, target)
+    segment.unlink()
+    return target
+
+
+def apply_retention(retention_days: float, max_bytes: int) -> int:
+    """Drop segments and SQLite rows past the retention window or size budget."""
+
+    removed = 0
+    segments = sorted(
+        (path for path in ARCHIVE_DIR.glob(f"{SEGMENT_PREFIX}*") if not path.name.endswith(".tmp")),
+        key=lambda path: path.stat().st_mtime,
+    )
+    if retention_days > 0:
+        cutoff = time.time() - retention_days * 86400
+        for path in [path for path in segments if path.stat().st_mtime < cutoff]:
+            path.unlink(missing_ok=True)
+            segments.remove(path)
+            removed += 1
+    total = sum(path.stat().st_size for path in segments)
+    while segments and total > max_bytes:
+        oldest = segments.pop(0)
+        total -= oldest.stat().st_size
+        oldest.unlink(missing_ok=True)
+        removed += 1
+
+    if retention_days > 0 and DB_PATH.exists():
+        cutoff_iso = (datetime.now(timezone.utc) - timedelta(days=retention_days)).isoformat()
+        try:
+            with connect() as connection:
+                deleted = connection.execute("DELETE FROM logs WHERE created_at < ?", (cutoff_iso,)).rowcount
+                connection.commit()
+                if deleted:
+                    # execute() steps the pragma once, freeing a single page; executescript() runs it to the end.
+                    connection.executescript("PRAGMA incremental_vacuum;")
+                    logger.info("Retention removed %s log rows older than %s", deleted, cutoff_iso)
+        except sqlite3.Error as exc:
+            logger.warning("SQLite retention failed: %s", exc)
+    return removed
+
+
+def maintain_archive() -> None:
+    settings = get_settings()
+    ARCHIVE_DIR.mkdir(parents=True, exist_ok=True)
+    # Workers run this on the same schedule; only one at a time does the work.
+    with file_lock(MAINTENANCE_LOCK):
+        closed = rotate_active_segment(
+            int(settings.archive_segment_mb * 1024 * 1024),
+            timedelta(hours=settings.archive_segment_hours),
+        )
+        # Also pick up segments a crash left uncompressed.
+        pending: List[Path] = sorted(ARCHIVE_DIR.glob(f"{SEGMENT_PREFIX}*.jsonl"))
+        for segment in pending:
+            if settings.archive_parquet:
+                export_parquet(segment)
+            compressed = compress_segment(segment)
+            if segment == closed:
+                logger.info("Rotated log segment to %s", compressed.name)
+        apply_retention(settings.archive_retention_days, int(settings.archive_max_mb * 1024 * 1024))
+
+
+async def run_archive_maintenance() -> None:
+    interval = get_settings().archive_check_interval
+    while True:
+        try:
+            await asyncio.to_thread(maintain_archive)
+        except Exception:  # pragma: no cover - keep the loop alive whatever went wrong
+            logger.exception("Archive maintenance failed")
+        await asyncio.sleep(interval)
@@ -2,75 +2,268 @@ from __future__ import annotations
 
 import asyncio
 import base64
+import importlib
 import logging
-from typing import Any, Dict, List, Optional
+import os
+import uuid
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
-import httpx
-from fastapi import Depends, FastAPI, File, Form, Header, HTTPException, UploadFile, status, Request
-from fastapi.responses import JSONResponse
+from fastapi import Depends, FastAPI, File, Form, Header, HTTPException, Query, UploadFile, status, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel, Field
 
+from backend.archive import run_archive_maintenance
+from backend.cancellation import RequestCancelled, request_shared_cancel
+from backend.cancellation import registry as inflight
 from backend.config import get_settings
-from backend.prompts_loader import load_base_prompt, load_domain_prompts
-from backend.services.generation import archive_response, generate_response
-from backend.storage import ensure_data_paths, get_recent_entries
-from backend.notes import gather_relevant_notes
-from backend.telemetry import monitor_resources, record_request, get_metrics
+from backend.fastjson import FastJSONResponse, dumps, parse_body
+from backend.profiler import ProfilerBusy, SamplingProfiler, SlowRequestMiddleware, start_profiler, stop_profiler
+from backend.prompts_loader import GenerationProfile, PromptRegistry
+from backend.ratelimit import KeyPolicy, QuotaHeadersMiddleware, get_registry
+from backend.services import context, prefetch
+from backend.services.context import join_prompt, resolve_domain
+from backend.services.generation import archive_response, archive_responses, generate_response
+from backend.storage import SearchUnavailable, ensure_data_paths, search_entries
+from backend.notes import gather_relevant_notes, get_notes_index, resolve_notes_root
+from backend.startup import timeline
+from backend.telemetry import monitor_resources, publish_metrics, record_request, get_metrics
+from backend.tracing import TracingMiddleware, span
 
 logger = logging.getLogger("backend.backend")
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s | %(message)s")
 
-SETTINGS = get_settings()
-ensure_data_paths()
+# Non-standard status (nginx's 499) for requests abandoned before an answer was produced.
+CLIENT_CLOSED_REQUEST = 499
 
-BASE_PROMPT = load_base_prompt()
-DOMAIN_PROMPTS = load_domain_prompts()
 UNIVERSAL_INSTRUCTION = (
     "Respond with concise, numbered reasoning when helpful and finish with a single line that begins "
     "with 'Answer:' followed by the final result when a definitive answer exists."
 )
 
 
+PROMPTS = PromptRegistry(UNIVERSAL_INSTRUCTION)
+
+
 def compose_system_prompt(domain_key: Optional[str]) -> str:
-    parts: List[str] = [BASE_PROMPT]
-    if domain_key:
-        prompt = DOMAIN_PROMPTS.get(domain_key)
-        if prompt:
-            parts.append(prompt.strip())
-    parts.append(UNIVERSAL_INSTRUCTION)
-    return "\n\n".join(parts)
+    return PROMPTS.current().system_prompt(domain_key)
+
 
+def generation_profile(domain_key: Optional[str], options: GenerationOptions) -> GenerationProfile:
+    return PROMPTS.current().profile(domain_key).merged(options.model_dump())
 
-async def verify_api_key(x_api_key: Optional[str] = Header(default=None, alias="x-api-key")) -> None:
-    if not x_api_key or x_api_key != SETTINGS.api_key:
+
+async def verify_api_key(
+    request: Request,
+    x_api_key: Optional[str] = Header(default=None, alias="x-api-key"),
+) -> None:
+    policy = get_registry().lookup(x_api_key)
+    if policy is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid API key.")
+    request.state.key_policy = policy
+
+
+async def verify_admin_key(request: Request, _: None = Depends(verify_api_key)) -> None:
+    policy: KeyPolicy = request.state.key_policy
+    if not policy.admin:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=f"Key '{policy.name}' is not an admin key.")
+
+
+def charge_quota(http_request: Optional[Request], cost: int = 1) -> Optional[KeyPolicy]:
+    """Take `cost` tokens from the caller's bucket, raising 429 when it is empty.
+
+    The cost is capped at the bucket size, so a batch larger than the burst
+    can still be paid for; its items are then paced by the fair scheduler.
+    """
+
+    policy: Optional[KeyPolicy] = getattr(http_request.state, "key_policy", None) if http_request else None
+    if policy is None:
+        return None
+    quota = get_registry().take(policy, min(cost, policy.burst))
+    http_request.state.quota = quota
+    if not quota["allowed"]:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"Rate limit exceeded for key '{policy.name}'.",
+        )
+    return policy
+
+
+app = FastAPI(title="AI Hotkey Backend", version="1.2.0", default_response_class=FastJSONResponse)
+app.add_middleware(QuotaHeadersMiddleware)
+app.add_middleware(TracingMiddleware)
+app.add_middleware(SlowRequestMiddleware)
+
+
+async def _prepare_storage() -> None:
+    await asyncio.to_thread(ensure_data_paths)
+
+
+async def _prepare_prompts() -> None:
+    PROMPTS.check_interval = get_settings().prompts_reload_interval
+    await asyncio.to_thread(PROMPTS.current)
+
+
+async def _import_clients() -> None:
+    backend = get_settings().ai_backend
+    module = "backend.clients.ollama_client" if backend == "ollama" else "backend.clients.openai_client"
+    await asyncio.to_thread(importlib.import_module, module)
+
+
+async def _build_notes_index() -> None:
+    if not get_settings().notes_index:
+        return
+    notes_root = await asyncio.to_thread(resolve_notes_root)
+    if notes_root is not None:
+        await asyncio.to_thread(get_notes_index(notes_root).refresh)
 
 
-app = FastAPI(title="AI Hotkey Backend", version="1.2.0")
+async def _warm_up_model() -> None:
+    settings = get_settings()
+    if not settings.model_warmup or settings.ai_backend != "ollama":
+        return
+    ollama_client = await asyncio.to_thread(importlib.import_module, "backend.clients.ollama_client")
+    num_ctx = (await asyncio.to_thread(PROMPTS.current)).profile(None).num_ctx
+    await ollama_client.warm_up(settings.ollama_model, num_ctx=num_ctx)
+
+
+async def _start_archive_maintenance() -> None:
+    # Retention queries the logs table, which the storage phase creates.
+    await timeline.wait_until_ready()
+    asyncio.create_task(run_archive_maintenance())
+
+
+async def _start_monitor() -> None:
+    await asyncio.to_thread(importlib.import_module, "psutil")
+    asyncio.create_task(monitor_resources())
+    if get_settings().workers > 1:
+        asyncio.create_task(publish_metrics())
+
+
+async def wait_until_ready() -> None:
+    try:
+        await timeline.wait_until_ready()
+    except RuntimeError as exc:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(exc)) from exc
 
 
 @app.on_event("startup")
 async def startup_event() -> None:
-    asyncio.create_task(monitor_resources())
+    get_settings()
+    timeline.start(
+        [
+            ("storage", True, _prepare_storage),
+            ("prompts", True, _prepare_prompts),
+            ("clients", False, _import_clients),
+            ("notes_index", False, _build_notes_index),
+            ("model_warmup", False, _warm_up_model),
+            ("archive", False, _start_archive_maintenance),
+            ("telemetry", False, _start_monitor),
+        ]
+    )
 
 
 @app.get("/status")
 async def get_status() -> Dict[str, Any]:
+    settings = get_settings()
     return {
         "ok": True,
-        "backend": SETTINGS.ai_backend,
-        "model": SETTINGS.ollama_model if SETTINGS.ai_backend == "ollama" else SETTINGS.openai_model,
+        "ready": timeline.ready,
+        "backend": settings.ai_backend,
+        "model": settings.ollama_model if settings.ai_backend == "ollama" else settings.openai_model,
+        "prompts_version": PROMPTS.current().version if timeline.ready else None,
+        "startup": timeline.snapshot(),
     }
 
 
 @app.get("/telemetry")
 async def get_telemetry() -> Dict[str, Any]:
-    return get_metrics()
+    return await asyncio.to_thread(get_metrics)
+
+
+@app.get("/debug/profile", response_model=None, dependencies=[Depends(verify_admin_key)])
+async def debug_profile(
+    seconds: float = Query(default=10.0, gt=0, description="How long to sample the live process."),
+    interval_ms: float = Query(default=5.0, ge=1.0, le=1000.0),
+    slow_ms: Optional[float] = Query(default=None, ge=0, description="Only keep samples from requests slower than this."),
+    top: int = Query(default=20, ge=1, le=200),
+    idle: bool = Query(default=False, description="Keep samples of threads waiting for work."),
+    format: str = Query(default="json", pattern="^(json|collapsed)$"),
+) -> Any:
+    settings = get_settings()
+    if not settings.profiler_enabled:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profiling is disabled.")
+    if seconds > settings.profiler_max_seconds:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"seconds must be at most {settings.profiler_max_seconds:g}.",
+        )
+    profiler = SamplingProfiler(interval_ms / 1000, include_idle=idle, slow_ms=slow_ms)
+    try:
+        start_profiler(profiler)
+    except ProfilerBusy as exc:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(exc)) from exc
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        await asyncio.to_thread(stop_profiler, profiler)
+    if format == "collapsed":
+        return PlainTextResponse(profiler.collapsed())
+    return {"pid": os.getpid(), **profiler.summary(top)}
+
+
+@app.post("/generate/{request_id}/cancel", dependencies=[Depends(verify_api_key)])
+async def cancel_generation(request_id: str, request: Request) -> Dict[str, Any]:
+    # Only the key that started a request may cancel it; to others it does not exist.
+    owner = request.state.key_policy.key_id
+    if inflight.cancel(request_id, owner=owner):
+        return {"status": "cancelled", "id": request_id}
+    if get_settings().workers > 1 and await asyncio.to_thread(request_shared_cancel, request_id, owner):
+        # It is running in another worker; that worker's watcher picks this up.
+        return {"status": "requested", "id": request_id}
+    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"No generation {request_id} is running.")
+
+
+@app.get("/history/search", dependencies=[Depends(verify_api_key)])
+async def search_history(
+    q: str = Query(..., min_length=1, description="Words that must all appear in the prompt or response."),
+    domain: Optional[str] = Query(default=None),
+    model: Optional[str] = Query(default=None),
+    since: Optional[datetime] = Query(default=None),
+    until: Optional[datetime] = Query(default=None),
+    limit: int = Query(default=20, ge=1, le=100),
+    offset: int = Query(default=0, ge=0),
+) -> Dict[str, Any]:
+    await wait_until_ready()
+    try:
+        results, has_more = await asyncio.to_thread(
+            search_entries,
+            q,
+            domain=domain,
+            model=model,
+            since=since,
+            until=until,
+            limit=limit,
+            offset=offset,
+        )
+    except SearchUnavailable as exc:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=f"History search unavailable: {exc}") from exc
+    return {
+        "query": q,
+        "offset": offset,
+        "limit": limit,
+        "has_more": has_more,
+        "results": results,
+    }
 
 
 @app.post("/generate", response_model=None, dependencies=[Depends(verify_api_key)])
-async def generate(request: Request, payload: Dict[str, Any]) -> JSONResponse:
-    generation_payload = GenerationPayload.model_validate(payload)
+async def generate(request: Request) -> JSONResponse:
+    # Validated once from the raw bytes: screenshots make these bodies several MB of base64.
+    with span("receive"):
+        body = await request.body()
+    with span("parse"):
+        generation_payload = parse_body(GenerationPayload, body)
     return await _handle_generation(generation_payload, request)
 
 
@@ -81,8 +274,9 @@ async def generate_with_image(
     files: Optional[List[UploadFile]] = File(default=None),
 ) -> JSONResponse:
     payload = GenerationPayload(prompt=prompt, context=GenerationContext())
-    if SETTINGS.question_domain:
-        payload.context.question_type = SETTINGS.question_domain
+    settings = get_settings()
+    if settings.question_domain:
+        payload.context.question_type = settings.question_domain
 
     collected: List[bytes] = []
     if files:
@@ -95,7 +289,7 @@ async def generate_with_image(
                 await file.close()
 
     if collected:
-        if not SETTINGS.vision_enabled:
+        if not settings.vision_enabled:
             raise HTTPException(status_code=400, detail="Vision support is disabled. Set VISION_ENABLED=1 and configure a vision model.")
         payload.images = [base64.b64encode(data).decode("ascii") for data in collected]
         payload.prompt_prefix = "Image(s) attached with the request."
@@ -107,96 +301,229 @@ class GenerationContext(BaseModel):
     question_type: Optional[str] = Field(default=None)
 
 
+class GenerationOptions(BaseModel):
+    """Per-request overrides of the domain's generation profile."""
+
+    max_tokens: Optional[int] = Field(default=None, ge=1)
+    temperature: Optional[float] = Field(default=None, ge=0.0, le=2.0)
+    stop: Optional[List[str]] = Field(default=None)
+    num_ctx: Optional[int] = Field(default=None, ge=256)
+    stop_after_answer: Optional[bool] = Field(default=None)
+
+
 class GenerationPayload(BaseModel):
     prompt: str = Field(..., min_length=1)
     context: GenerationContext = Field(default_factory=GenerationContext)
     images: Optional[List[str]] = Field(default=None, description="Base64-encoded images for OCR.")
     prompt_prefix: Optional[str] = Field(default=None, description="Optional extra text prepended to the prompt.")
     model: Optional[str] = Field(default=None)
+    options: GenerationOptions = Field(default_factory=GenerationOptions)
+    request_id: Optional[str] = Field(
+        default=None,
+        pattern=r"^[A-Za-z0-9_-]{1,64}$",
+        description=(
+            "Client-chosen id, usable with /generate/{request_id}/cancel while the request runs. "
+            "The answer is archived under its own server-generated id."
+        ),
+    )
+    session_id: Optional[str] = Field(
+        default=None,
+        pattern=r"^[A-Za-z0-9_-]{1,64}$",
+        description="Capture session whose /prefetch results this request may reuse.",
+    )
+
+    model_config = {"extra": "ignore"}
+
+
+class PrefetchPayload(BaseModel):
+    """The prompt as typed so far, sent by the listener while the user types."""
+
+    session_id: str = Field(..., pattern=r"^[A-Za-z0-9_-]{1,64}$")
+    text: str = Field(default="", max_length=20000)
+    context: GenerationContext = Field(default_factory=GenerationContext)
+
+    model_config = {"extra": "ignore"}
+
+
+class BatchGenerationPayload(BaseModel):
+    """Several prompts answered with one shared system prompt and context."""
+
+    prompts: List[str] = Field(..., min_length=1)
+    context: GenerationContext = Field(default_factory=GenerationContext)
+    prompt_prefix: Optional[str] = Field(default=None, description="Optional extra text prepended to every prompt.")
+    model: Optional[str] = Field(default=None)
+    options: GenerationOptions = Field(default_factory=GenerationOptions)
+    concurrency: Optional[int] = Field(default=None, ge=1, description="Upstream requests in flight at once.")
 
     model_config = {"extra": "ignore"}
 
 
+@app.post("/prefetch", dependencies=[Depends(verify_api_key)])
+async def prefetch_context(payload: PrefetchPayload) -> Dict[str, Any]:
+    if not get_settings().prefetch_enabled:
+        return {"session_id": payload.session_id, "disabled": True}
+    await wait_until_ready()
+    domain = resolve_domain(payload.context.question_type)
+    num_ctx = PROMPTS.current().profile(domain).num_ctx
+    return await prefetch.prefetch(payload.session_id, payload.text, domain, num_ctx)
+
+
+@app.post("/generate-batch", response_model=None, dependencies=[Depends(verify_api_key)])
+async def generate_batch(request: Request, payload: BatchGenerationPayload) -> StreamingResponse:
+    return await _handle_batch(payload, request)
+
+
+def _client_identity(http_request: Optional[Request]) -> Tuple[str, str]:
+    if http_request is None:
+        return "unknown", "none"
+    client = http_request.client
+    policy: Optional[KeyPolicy] = getattr(http_request.state, "key_policy", None)
+    return (client.host if client else "unknown"), policy.key_id if policy else "none"
+
+
 async def _handle_generation(payload: GenerationPayload, http_request: Optional[Request]) -> JSONResponse:
-    domain = (payload.context.question_type or "").strip() or None
-    if not domain and SETTINGS.question_domain:
-        domain = SETTINGS.question_domain
+    import httpx
+
+    with span("ready"):
+        await wait_until_ready()
+    settings = get_settings()
+    key_policy = charge_quota(http_request)
+    domain = resolve_domain(payload.context.question_type)
     system_prompt = compose_system_prompt(domain)
 
-    if payload.images and not SETTINGS.vision_enabled:
+    if payload.images and not settings.vision_enabled:
         raise HTTPException(
             status_code=400,
             detail="Vision support is disabled. Set VISION_ENABLED=1 and configure a vision-capable model.",
         )
 
-    prompt_parts: List[str] = []
-    if payload.prompt_prefix:
-        prompt_parts.append(payload.prompt_prefix.strip())
-    prompt_parts.append(payload.prompt.strip())
-    prompt_text = "\n\n".join(part for part in prompt_parts if part)
-    payload.prompt = prompt_text
-
-    history_entries = get_recent_entries(limit=5)
-    history_section = ""
-    if history_entries:
-        history_blocks = [
-            f"User: {item['prompt'].strip()}\nAssistant: {item['response'].strip()}"
-            for item in history_entries
-        ]
-        history_section = (
-            "Here is the recent conversation history between the user and assistant:\n"
-            + "\n\n".join(history_blocks)
-            + "\n\n"
-        )
-
-    notes_section = ""
-    notes_snippets = gather_relevant_notes(payload.prompt)
-    if notes_snippets:
-        notes_section = (
-            "Relevant notes extracted from the knowledge base:\n"
-            + "\n\n".join(notes_snippets)
-            + "\n\n"
-        )
-
-    prompt_body = (
-        history_section
-        + notes_section
-        + "Respond to the user's latest request while referencing prior context when helpful:\n"
-        + payload.prompt.strip()
-    )
-
-    client_ip = "unknown"
-    api_key = ""
-    if http_request is not None:
-        client = http_request.client
-        client_ip = client.host if client else "unknown"
-        api_key = http_request.headers.get("x-api-key", "")
-    record_request(client_ip, api_key, len(prompt_body))
-
+    payload.prompt = join_prompt(payload.prompt, payload.prompt_prefix)
+    history, notes = prefetch.consume(payload.session_id, payload.prompt, domain) if payload.session_id else (None, None)
+    if history is None:
+        with span("history"):
+            history = context.history_section(await asyncio.to_thread(context.select_history, payload.prompt, domain))
+    if notes is None:
+        with span("notes"):
+            notes = context.notes_section(gather_relevant_notes(payload.prompt))
+    prompt_body = context.prompt_body(history, notes, payload.prompt)
+
+    record_request(*_client_identity(http_request), len(prompt_body))
+
+    request_id = payload.request_id or str(uuid.uuid4())
+    if request_id in inflight:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Request {request_id} is already running.")
     try:
-        result = await generate_response(
-            prompt=prompt_body,
-            system_prompt=system_prompt,
-            domain=domain,
-            model_override=payload.model,
-            images=payload.images if SETTINGS.vision_enabled else None,
+        result = await inflight.run(
+            request_id,
+            generate_response(
+                prompt=prompt_body,
+                system_prompt=system_prompt,
+                domain=domain,
+                model_override=payload.model,
+                images=payload.images if settings.vision_enabled else None,
+                question=payload.prompt,
+                profile=generation_profile(domain, payload.options),
+                key_policy=key_policy,
+            ),
+            http_request.is_disconnected if http_request is not None else None,
+            owner=key_policy.key_id if key_policy is not None else None,
         )
+    except RequestCancelled as exc:
+        raise HTTPException(status_code=CLIENT_CLOSED_REQUEST, detail=str(exc)) from exc
     except httpx.HTTPError as exc:
         logger.exception("LLM request failed")
         raise HTTPException(status_code=502, detail=f"Upstream request failed: {exc}") from exc
 
-    await archive_response(
-        request_id=result["id"],
-        prompt=payload.prompt,
-        response=result["response"],
-        final_answer=result["final_answer"],
-        elapsed_ms=result["elapsed_ms"],
-        domain=domain,
-        model=result["model"],
-    )
+    with span("archive"):
+        await archive_response(
+            request_id=result["id"],
+            prompt=payload.prompt,
+            response=result["response"],
+            final_answer=result["final_answer"],
+            elapsed_ms=result["elapsed_ms"],
+            domain=domain,
+            model=result["model"],
+        )
 
-    payload = {
+    body: Dict[str, Any] = {
         "status": "ok",
         **result,
     }
-    return JSONResponse(content=payload)
+    if payload.request_id:
+        body["request_id"] = payload.request_id
+    return FastJSONResponse(content=body)
+
+
+async def _handle_batch(payload: BatchGenerationPayload, http_request: Optional[Request]) -> StreamingResponse:
+    import httpx
+
+    await wait_until_ready()
+    settings = get_settings()
+    if len(payload.prompts) > settings.batch_max_prompts:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"A batch may contain at most {settings.batch_max_prompts} prompts.",
+        )
+    key_policy = charge_quota(http_request, len(payload.prompts))
+
+    # Everything that does not depend on the individual prompt is resolved once per batch.
+    domain = resolve_domain(payload.context.question_type)
+    system_prompt = compose_system_prompt(domain)
+    profile = generation_profile(domain, payload.options)
+    prompts = [join_prompt(prompt, payload.prompt_prefix) for prompt in payload.prompts]
+    history = context.history_section(
+        await asyncio.to_thread(context.select_history, "\n".join(prompts), domain)
+    )
+    # Notes are matched per prompt, all in one worker thread so the scan stays off the event loop.
+    notes = await asyncio.to_thread(lambda: [gather_relevant_notes(prompt) for prompt in prompts])
+    bodies = [
+        context.prompt_body(history, context.notes_section(snippets), prompt)
+        for prompt, snippets in zip(prompts, notes)
+    ]
+    record_request(*_client_identity(http_request), sum(len(body) for body in bodies))
+
+    semaphore = asyncio.Semaphore(min(payload.concurrency or settings.batch_concurrency, len(bodies)))
+    finished: Dict[int, datetime] = {}
+
+    async def run(index: int) -> Tuple[int, Dict[str, Any]]:
+        async with semaphore:
+            try:
+                result = await generate_response(
+                    prompt=bodies[index],
+                    system_prompt=system_prompt,
+                    domain=domain,
+                    model_override=payload.model,
+                    question=prompts[index],
+                    profile=profile,
+                    key_policy=key_policy,
+                )
+            except (httpx.HTTPError, HTTPException) as exc:
+                logger.warning("Batch item %s failed: %s", index, exc)
+                detail = exc.detail if isinstance(exc, HTTPException) else f"Upstream request failed: {exc}"
+                return index, {"index": index, "status": "error", "detail": detail}
+        finished[index] = datetime.now(timezone.utc)
+        return index, {"index": index, "status": "ok", **result}
+
+    async def stream() -> AsyncIterator[bytes]:
+        tasks = [asyncio.create_task(run(index)) for index in range(len(bodies))]
+        completed: List[Tuple[int, Dict[str, Any]]] = []
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                index, item = await next_done
+                if item["status"] == "ok":
+                    completed.append((index, item))
+                yield dumps(item) + b"\n"
+        finally:
+            for task in tasks:
+                task.cancel()
+            if completed:
+                await archive_responses(
+                    [item for _, item in completed],
+                    [prompts[index] for index, _ in completed],
+                    [finished[index] for index, _ in completed],
+                    domain,
+                )
+        summary = {"status": "done", "count": len(bodies), "failed": len(bodies) - len(completed)}
+        yield dumps(summary) + b"\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
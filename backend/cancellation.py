@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import sqlite3
+import time
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+
+from backend.config import get_settings
+from backend.storage import DATA_DIR
+from backend.telemetry import increment
+
+logger = logging.getLogger("backend.cancellation")
+
+T = TypeVar("T")
+
+CANCEL_DB = DATA_DIR / "cancellations.db"
+WATCH_INTERVAL = 0.25
+CANCEL_TTL_SECONDS = 600.0
+# Rows left behind by a worker that died mid-request.
+RUNNING_TTL_SECONDS = 86400.0
+
+
+class RequestCancelled(Exception):
+    def __init__(self, request_id: str, reason: str) -> None:
+        super().__init__(f"Request {request_id} cancelled ({reason}).")
+        self.request_id = request_id
+        self.reason = reason
+
+
+class InFlightRegistry:
+    """Generation tasks by request id, so they can be aborted before they finish.
+
+    Cancelling the task unwinds through the client's streaming call, which
+    closes the upstream connection and makes Ollama stop generating. With
+    several workers the cancel call may land on another process, so requests
+    are also recorded in a shared SQLite table that every watcher polls.
+
+    Each request remembers the key id that started it, and an explicit cancel
+    only applies when it comes from the same key.
+    """
+
+    def __init__(self) -> None:
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._reasons: Dict[str, str] = {}
+        self._owners: Dict[str, Optional[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def __contains__(self, request_id: object) -> bool:
+        return request_id in self._tasks
+
+    async def run(
+        self,
+        request_id: str,
+        work: Awaitable[T],
+        is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+        owner: Optional[str] = None,
+    ) -> T:
+        shared = get_settings().workers > 1
+        if shared:
+            await asyncio.to_thread(_record_running, request_id, owner)
+        task = asyncio.ensure_future(work)
+        self._tasks[request_id] = task
+        self._owners[request_id] = owner
+        watcher = asyncio.create_task(self._watch(request_id, task, is_disconnected))
+        try:
+            return await task
+        except asyncio.CancelledError:
+            reason = self._reasons.get(request_id)
+            if reason is None or not task.cancelled():
+                # The handler itself is being cancelled (server shutdown); pass it on.
+                task.cancel()
+                raise
+            increment(f"requests.cancelled.{reason}")
+            logger.info("Request %s cancelled (%s)", request_id, reason)
+            raise RequestCancelled(request_id, reason) from None
+        finally:
+            watcher.cancel()
+            self._tasks.pop(request_id, None)
+            self._reasons.pop(request_id, None)
+            self._owners.pop(request_id, None)
+            if shared:
+                await asyncio.to_thread(_forget_running, request_id)
+
+    def cancel(self, request_id: str, reason: str = "explicit", owner: Optional[str] = None) -> bool:
+        """Cancel a running request; with `owner`, only one started by that key."""
+
+        task = self._tasks.get(request_id)
+        if task is None or task.done():
+            return False
+        if owner is not None and self._owners.get(request_id) != owner:
+            return False
+        self._reasons.setdefault(request_id, reason)
+        task.cancel()
+        return True
+
+    async def _watch(
+        self,
+        request_id: str,
+        task: asyncio.Task,
+        is_disconnected: Optional[Callable[[], Awaitable[bool]]],
+    ) -> None:
+        shared = get_settings().workers > 1
+        while not task.done():
+            await asyncio.sleep(WATCH_INTERVAL)
+            if is_disconnected is not None and await is_disconnected():
+                self.cancel(request_id, "disconnect")
+                return
+            if shared and await asyncio.to_thread(_take_shared_cancel, request_id):
+                self.cancel(request_id, "explicit")
+                return
+
+
+registry = InFlightRegistry()
+
+
+def _connect() -> sqlite3.Connection:
+    CANCEL_DB.parent.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(CANCEL_DB, timeout=10.0)
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS cancellations (request_id TEXT PRIMARY KEY, requested_at REAL NOT NULL)"
+    )
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS running (request_id TEXT PRIMARY KEY, owner TEXT, started_at REAL NOT NULL)"
+    )
+    return connection
+
+
+def _record_running(request_id: str, owner: Optional[str]) -> None:
+    with _connect() as connection:
+        connection.execute("DELETE FROM running WHERE started_at < ?", (time.time() - RUNNING_TTL_SECONDS,))
+        connection.execute(
+            "INSERT OR REPLACE INTO running (request_id, owner, started_at) VALUES (?, ?, ?)",
+            (request_id, owner, time.time()),
+        )
+
+
+def _forget_running(request_id: str) -> None:
+    with _connect() as connection:
+        connection.execute("DELETE FROM running WHERE request_id = ?", (request_id,))
+
+
+def request_shared_cancel(request_id: str, owner: str) -> bool:
+    """Record a cancel for whichever worker runs `request_id`, if `owner` started it there."""
+
+    with _connect() as connection:
+        row = connection.execute("SELECT owner FROM running WHERE request_id = ?", (request_id,)).fetchone()
+        if row is None or row[0] != owner:
+            return False
+        connection.execute("DELETE FROM cancellations WHERE requested_at < ?", (time.time() - CANCEL_TTL_SECONDS,))
+        connection.execute(
+            "INSERT OR REPLACE INTO cancellations (request_id, requested_at) VALUES (?, ?)",
+            (request_id, time.time()),
+        )
+        return True
+
+
+def _take_shared_cancel(request_id: str) -> bool:
+    with _connect() as connection:
+        return connection.execute("DELETE FROM cancellations WHERE request_id = ?", (request_id,)).rowcount > 0
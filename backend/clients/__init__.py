@@ -1,3 +1,3 @@
-from . import ollama_client, openai_client  # noqa: F401
+"""LLM client modules; imported on first use so the backend starts without them."""
 
 __all__ = ["ollama_client", "openai_client"]
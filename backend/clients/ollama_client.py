@@ -1,24 +1,91 @@
 from __future__ import annotations
 
+import json
+import time
+from typing import Optional
+
 import httpx
 
+from backend.clients.streaming import ResponseCollector
 from backend.config import get_settings
+from backend.prompts_loader import GenerationProfile
+from backend.tracing import add_span, outgoing_headers
+
+
+def _options(profile: Optional[GenerationProfile]) -> dict[str, object]:
+    if profile is None:
+        return {}
+    options: dict[str, object] = {}
+    if profile.max_tokens is not None:
+        options["num_predict"] = profile.max_tokens
+    if profile.temperature is not None:
+        options["temperature"] = profile.temperature
+    if profile.stop:
+        options["stop"] = list(profile.stop)
+    if profile.num_ctx is not None:
+        options["num_ctx"] = profile.num_ctx
+    return options
 
 
-async def generate(prompt: str, model: str, images: list[str] | None = None) -> tuple[str, str]:
+async def generate(
+    prompt: str,
+    model: str,
+    images: list[str] | None = None,
+    profile: Optional[GenerationProfile] = None,
+) -> tuple[str, str]:
     settings = get_settings()
+    payload: dict[str, object] = {
+        "model": model,
+        "prompt": prompt,
+        "stream": True,
+    }
+    if images:
+        payload["images"] = images
+    options = _options(profile)
+    if options:
+        payload["options"] = options
+    collector = ResponseCollector(stop_after_answer=bool(profile and profile.stop_after_answer))
+    model_name = model
     async with httpx.AsyncClient(timeout=httpx.Timeout(30.0, read=120.0)) as client:
-        payload: dict[str, object] = {
-            "model": model,
-            "prompt": prompt,
-            "stream": False,
-        }
-        if images:
-            payload["images"] = images
-        response = await client.post(
-            settings.ollama_url,
-            json=payload,
-        )
+        # Leaving the stream early closes the connection, which makes Ollama stop generating.
+        requested = time.perf_counter()
+        async with client.stream("POST", settings.ollama_url, json=payload, headers=outgoing_headers()) as response:
+            add_span("upstream.ttfb", requested)
+            if response.is_error:
+                await response.aread()
+                response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.strip():
+                    continue
+                try:
+                    data = json.loads(line)
+                except ValueError as exc:
+                    raise httpx.HTTPError(f"Malformed Ollama stream line: {line[:200]!r}") from exc
+                if not isinstance(data, dict):
+                    raise httpx.HTTPError(f"Malformed Ollama stream line: {line[:200]!r}")
+                if "error" in data:
+                    raise httpx.HTTPError(f"Ollama error: {data['error']}")
+                model_name = data.get("model", model_name)
+                if collector.feed(data.get("response", "")) or data.get("done"):
+                    break
+    return model_name, collector.text
+
+
+async def warm_up(model: str, num_ctx: Optional[int] = None) -> None:
+    settings = get_settings()
+    payload: dict[str, object] = {"model": model, "stream": False}
+    if num_ctx is not None:
+        # Load the model with the context size requests will use, or the first request reloads it.
+        payload["options"] = {"num_ctx": num_ctx}
+    async with httpx.AsyncClient(timeout=httpx.Timeout(30.0, read=300.0)) as client:
+        response = await client.post(settings.ollama_url, json=payload)
+        response.raise_for_status()
+
+
+async def embed(text: str, model: str) -> list[float]:
+    settings = get_settings()
+    url = settings.ollama_url.rsplit("/api/", 1)[0] + "/api/embeddings"
+    async with httpx.AsyncClient(timeout=httpx.Timeout(10.0, read=30.0)) as client:
+        response = await client.post(url, json={"model": model, "prompt": text})
         response.raise_for_status()
-        data = response.json()
-        return data.get("model", model), data.get("response", "").strip()
+        return [float(value) for value in response.json().get("embedding", [])]
@@ -1,10 +1,16 @@
 from __future__ import annotations
 
+import json
+import time
+
 import httpx
 
 from typing import List, Optional
 
+from backend.clients.streaming import ResponseCollector
 from backend.config import get_settings
+from backend.prompts_loader import GenerationProfile
+from backend.tracing import add_span, outgoing_headers
 
 
 def _render_message_text(content: object) -> str:
@@ -26,6 +32,7 @@ async def generate(
     user_prompt: str,
     model: str,
     images: Optional[List[str]] = None,
+    profile: Optional[GenerationProfile] = None,
 ) -> tuple[str, str]:
     settings = get_settings()
     headers = {"Content-Type": "application/json"}
@@ -42,20 +49,60 @@ async def generate(
     else:
         user_content = user_prompt
 
-    payload = {
+    payload: dict[str, object] = {
         "model": model,
         "messages": [
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": user_content},
         ],
         "temperature": 0.3,
+        "stream": True,
     }
+    if profile is not None:
+        if profile.max_tokens is not None:
+            payload["max_tokens"] = profile.max_tokens
+        if profile.temperature is not None:
+            payload["temperature"] = profile.temperature
+        if profile.stop:
+            payload["stop"] = list(profile.stop)
+    collector = ResponseCollector(stop_after_answer=bool(profile and profile.stop_after_answer))
+    model_name = model
     url = settings.openai_base_url.rstrip("/") + "/chat/completions"
     async with httpx.AsyncClient(timeout=httpx.Timeout(30.0, read=120.0)) as client:
-        response = await client.post(url, json=payload, headers=headers)
+        requested = time.perf_counter()
+        async with client.stream("POST", url, json=payload, headers={**headers, **outgoing_headers()}) as response:
+            add_span("upstream.ttfb", requested)
+            if response.is_error:
+                await response.aread()
+                response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data_text = line[len("data:") :].strip()
+                if data_text == "[DONE]":
+                    break
+                try:
+                    data = json.loads(data_text)
+                except ValueError as exc:
+                    raise httpx.HTTPError(f"Malformed stream event: {data_text[:200]!r}") from exc
+                if not isinstance(data, dict):
+                    raise httpx.HTTPError(f"Malformed stream event: {data_text[:200]!r}")
+                model_name = data.get("model") or model_name
+                choices = data.get("choices") or [{}]
+                delta = choices[0].get("delta", {})
+                if collector.feed(_render_message_text(delta.get("content"))):
+                    break
+    return model_name, collector.text
+
+
+async def embed(text: str, model: str) -> List[float]:
+    settings = get_settings()
+    headers = {"Content-Type": "application/json"}
+    if settings.openai_api_key:
+        headers["Authorization"] = f"Bearer {settings.openai_api_key}"
+    url = settings.openai_base_url.rstrip("/") + "/embeddings"
+    async with httpx.AsyncClient(timeout=httpx.Timeout(10.0, read=30.0)) as client:
+        response = await client.post(url, json={"model": model, "input": text}, headers=headers)
         response.raise_for_status()
-        data = response.json()
-        first_choice = data.get("choices", [{}])[0]
-        message = first_choice.get("message", {})
-        content = _render_message_text(message.get("content"))
-        return data.get("model", model), content
+        data = response.json().get("data") or [{}]
+        return [float(value) for value in data[0].get("embedding", [])]
@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+import re
+
+_ANSWER_LINE = re.compile(r"^[ \t]*answer:[ \t]*\S[^\n]*\n", re.IGNORECASE | re.MULTILINE)
+
+
+class ResponseCollector:
+    """Accumulates streamed text and reports when generation can stop early.
+
+    With `stop_after_answer`, the response is complete once a line starting
+    with "Answer:" and carrying some text has been terminated by a newline;
+    anything after it is dropped and the caller closes the upstream stream.
+    A bare "Answer:" line is not enough, since the answer may follow on the
+    next lines.
+    """
+
+    def __init__(self, stop_after_answer: bool = False) -> None:
+        self.stop_after_answer = stop_after_answer
+        self.parts: list[str] = []
+        self.complete = False
+
+    def feed(self, chunk: str) -> bool:
+        """Add a chunk; returns True when no more text is needed."""
+
+        if not chunk:
+            return self.complete
+        self.parts.append(chunk)
+        if self.stop_after_answer and "\n" in chunk:
+            text = "".join(self.parts)
+            match = _ANSWER_LINE.search(text)
+            if match:
+                self.parts = [text[: match.end()]]
+                self.complete = True
+        return self.complete
+
+    @property
+    def text(self) -> str:
+        return "".join(self.parts).strip()
@@ -1,14 +1,18 @@
 from __future__ import annotations
 
+import os
+import socket
 from functools import lru_cache
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Optional
 
 from dotenv import dotenv_values
 from pydantic import BaseModel, Field, PositiveInt, ValidationError, model_validator
 
 
 ROOT = Path(__file__).resolve().parents[1]
+# Keys that launchers (run.py) may override through the process environment.
+ENV_OVERRIDES = ("BACKEND_WORKERS",)
 
 
 class Settings(BaseModel):
@@ -23,11 +27,57 @@ class Settings(BaseModel):
     openai_vision_model: str = Field(default="gpt-4o", alias="OPENAI_VISION_MODEL")
 
     api_key: str = Field(default="local-dev-key", alias="API_KEY")
+    api_keys_file: Optional[str] = Field(default=None, alias="API_KEYS_FILE")
+    rate_limit_per_minute: float = Field(default=60.0, alias="RATE_LIMIT_PER_MINUTE")
+    rate_limit_burst: PositiveInt = Field(default=10, alias="RATE_LIMIT_BURST")
+    key_max_concurrency: PositiveInt = Field(default=2, alias="KEY_MAX_CONCURRENCY")
+    llm_concurrency: PositiveInt = Field(default=2, alias="LLM_CONCURRENCY")
     host: str = Field(default="127.0.0.1", alias="HOST")
     port: PositiveInt = Field(default=8000, alias="PORT")
+    workers: PositiveInt = Field(default=1, alias="BACKEND_WORKERS")
+    backend_socket: Optional[str] = Field(default=None, alias="BACKEND_SOCKET")
+    backend_socket_mode: str = Field(default="600", alias="BACKEND_SOCKET_MODE")
+    backend_tcp: bool = Field(default=True, alias="BACKEND_TCP")
     question_domain: str = Field(default="", alias="QUESTION_DOMAIN")
     notes_path: Optional[str] = Field(default=None, alias="NOTES_PATH")
+    notes_index: bool = Field(default=False, alias="NOTES_INDEX")
+    notes_index_refresh: float = Field(default=30.0, alias="NOTES_INDEX_REFRESH")
+    notes_link_neighbours: int = Field(default=2, ge=0, alias="NOTES_LINK_NEIGHBOURS")
     vision_enabled: bool = Field(default=False, alias="VISION_ENABLED")
+    prompts_reload_interval: float = Field(default=1.0, alias="PROMPTS_RELOAD_INTERVAL")
+    model_warmup: bool = Field(default=True, alias="MODEL_WARMUP")
+    batch_concurrency: PositiveInt = Field(default=2, alias="BATCH_CONCURRENCY")
+    batch_max_prompts: PositiveInt = Field(default=100, alias="BATCH_MAX_PROMPTS")
+    history_mode: str = Field(default="relevance", alias="HISTORY_MODE")
+    history_limit: PositiveInt = Field(default=5, alias="HISTORY_LIMIT")
+    history_window_hours: float = Field(default=168.0, alias="HISTORY_WINDOW_HOURS")
+    history_budget_chars: PositiveInt = Field(default=4000, alias="HISTORY_BUDGET_CHARS")
+    history_followup_seconds: float = Field(default=120.0, alias="HISTORY_FOLLOWUP_SECONDS")
+    logs_clear_on_start: bool = Field(default=True, alias="LOGS_CLEAR_ON_START")
+    archive_segment_mb: float = Field(default=8.0, alias="ARCHIVE_SEGMENT_MB")
+    archive_segment_hours: float = Field(default=24.0, alias="ARCHIVE_SEGMENT_HOURS")
+    archive_retention_days: float = Field(default=30.0, alias="ARCHIVE_RETENTION_DAYS")
+    archive_max_mb: float = Field(default=512.0, alias="ARCHIVE_MAX_MB")
+    archive_parquet: bool = Field(default=False, alias="ARCHIVE_PARQUET")
+    archive_check_interval: float = Field(default=60.0, alias="ARCHIVE_CHECK_INTERVAL")
+    solvers_enabled: bool = Field(default=True, alias="SOLVERS_ENABLED")
+    semantic_cache: bool = Field(default=False, alias="SEMANTIC_CACHE")
+    semantic_cache_size: PositiveInt = Field(default=500, alias="SEMANTIC_CACHE_SIZE")
+    semantic_cache_threshold: float = Field(default=0.92, alias="SEMANTIC_CACHE_THRESHOLD")
+    semantic_cache_domain_thresholds: str = Field(default="", alias="SEMANTIC_CACHE_DOMAIN_THRESHOLDS")
+    ollama_embed_model: str = Field(default="nomic-embed-text", alias="OLLAMA_EMBED_MODEL")
+    openai_embed_model: str = Field(default="text-embedding-3-small", alias="OPENAI_EMBED_MODEL")
+    prefetch_enabled: bool = Field(default=True, alias="PREFETCH_ENABLED")
+    prefetch_ttl_seconds: float = Field(default=120.0, alias="PREFETCH_TTL_SECONDS")
+    prefetch_warm_interval: float = Field(default=60.0, alias="PREFETCH_WARM_INTERVAL")
+    tracing_enabled: bool = Field(default=False, alias="TRACING_ENABLED")
+    profiler_enabled: bool = Field(default=False, alias="PROFILER_ENABLED")
+    profiler_max_seconds: float = Field(default=120.0, gt=0, alias="PROFILER_MAX_SECONDS")
+    vision_cache: bool = Field(default=False, alias="VISION_CACHE")
+    vision_cache_size: PositiveInt = Field(default=200, alias="VISION_CACHE_SIZE")
+    vision_cache_disk_entries: PositiveInt = Field(default=2000, alias="VISION_CACHE_DISK_ENTRIES")
+    vision_cache_distance: int = Field(default=0, ge=0, alias="VISION_CACHE_DISTANCE")
+    vision_cache_hash_width: int = Field(default=256, ge=8, multiple_of=8, alias="VISION_CACHE_HASH_WIDTH")
 
     model_config = {"populate_by_name": True, "extra": "ignore"}
 
@@ -38,15 +88,40 @@ class Settings(BaseModel):
             raise ValueError("AI_BACKEND must be 'ollama' or 'openai_compatible'")
         self.ai_backend = backend
         self.question_domain = self.question_domain.strip()
+        self.history_mode = self.history_mode.lower().strip()
+        if self.history_mode not in {"relevance", "recent"}:
+            raise ValueError("HISTORY_MODE must be 'relevance' or 'recent'")
         if self.notes_path:
             self.notes_path = self.notes_path.strip()
             if not self.notes_path:
                 self.notes_path = None
         return self
 
+    def socket_path(self) -> Optional[Path]:
+        """Unix domain socket to serve on, or None when not configured or unsupported (Windows)."""
+
+        if not self.backend_socket or not self.backend_socket.strip() or not hasattr(socket, "AF_UNIX"):
+            return None
+        path = Path(self.backend_socket.strip())
+        return path if path.is_absolute() else ROOT / path
+
+    def domain_thresholds(self) -> Dict[str, float]:
+        """Parse SEMANTIC_CACHE_DOMAIN_THRESHOLDS, e.g. ``subnetting=0.97,sql=0.9``."""
+
+        thresholds: Dict[str, float] = {}
+        for item in self.semantic_cache_domain_thresholds.split(","):
+            name, _, value = item.partition("=")
+            if name.strip() and value.strip():
+                thresholds[name.strip()] = float(value)
+        return thresholds
+
 
 def _load_raw_env() -> dict[str, Optional[str]]:
-    return {k: v for k, v in dotenv_values(ROOT / ".env").items() if v is not None}
+    raw = {k: v for k, v in dotenv_values(ROOT / ".env").items() if v is not None}
+    for key in ENV_OVERRIDES:
+        if os.environ.get(key):
+            raw[key] = os.environ[key]
+    return raw
 
 
 @lru_cache(maxsize=1)
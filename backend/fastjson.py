@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, List, Type, TypeVar
+
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, ValidationError
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+M = TypeVar("M", bound=BaseModel)
+
+
+def dumps(content: Any) -> bytes:
+    """Compact UTF-8 JSON, through orjson when it is installed."""
+
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def parse_body(model: Type[M], body: bytes) -> M:
+    """Validate a model straight from request bytes in a single pydantic-core pass.
+
+    Errors are reported the way FastAPI reports body validation errors (422,
+    locations prefixed with "body"), so clients see no difference.
+    """
+
+    try:
+        return model.model_validate_json(body)
+    except ValidationError as exc:
+        errors: List[Dict[str, Any]] = []
+        for error in exc.errors(include_url=False):
+            error = {**error, "loc": ("body", *error["loc"])}
+            if error["type"] == "json_invalid":
+                # Do not echo a multi-megabyte body back to the caller.
+                error["input"] = {}
+            errors.append(error)
+        raise RequestValidationError(errors) from None
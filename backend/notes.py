@@ -1,29 +1,61 @@
 from __future__ import annotations
 
+import heapq
+import logging
+import os
 import re
+import threading
+import time
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import List
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple, TypeVar
 
 from backend.config import get_settings
 
 MARKDOWN_EXTENSIONS = {".md", ".markdown", ".mdx"}
 MAX_NOTE_CHARS = 1200
+MAX_LINKED_NOTE_CHARS = 400
+WIKILINK = re.compile(r"\[\[([^\]|#]+)(?:#[^\]|]*)?(?:\|[^\]]*)?\]\]")
 
+K = TypeVar("K", bound=Hashable)
 
-def gather_relevant_notes(query: str, limit: int = 3) -> List[str]:
-    settings = get_settings()
-    notes_root = settings.notes_path
-    if not notes_root:
-        return []
+logger = logging.getLogger("backend.notes")
 
-    base_path = (Path(notes_root) if Path(notes_root).is_absolute() else Path(__file__).resolve().parents[1] / notes_root)
+
+def resolve_notes_root() -> Optional[Path]:
+    notes_root = get_settings().notes_path
+    if not notes_root:
+        return None
+    base_path = Path(notes_root) if Path(notes_root).is_absolute() else Path(__file__).resolve().parents[1] / notes_root
     if not base_path.exists() or not base_path.is_dir():
+        return None
+    return base_path
+
+
+def gather_relevant_notes(
+    query: str,
+    limit: int = 3,
+    *,
+    notes_root: Optional[Path] = None,
+    use_index: Optional[bool] = None,
+) -> List[str]:
+    base_path = notes_root if notes_root is not None else resolve_notes_root()
+    if base_path is None:
         return []
 
     query_terms = _tokenize(query)
     if not query_terms:
         return []
 
+    settings = get_settings()
+    if use_index is None:
+        use_index = settings.notes_index
+    if use_index:
+        return get_notes_index(base_path).search(query_terms, limit, neighbours=settings.notes_link_neighbours)
+    return scan_notes(base_path, query_terms, limit)
+
+
+def scan_notes(base_path: Path, query_terms: set[str], limit: int) -> List[str]:
     scored: list[tuple[int, Path]] = []
     for path in base_path.rglob("*"):
         if path.is_file() and path.suffix.lower() in MARKDOWN_EXTENSIONS:
@@ -38,16 +70,322 @@ def gather_relevant_notes(query: str, limit: int = 3) -> List[str]:
             content = path.read_text(encoding="utf-8")
         except OSError:
             continue
-        snippets = content.strip().splitlines()
-        snippet_text = "\n".join(snippets[: MAX_NOTE_CHARS // 80])
-        excerpts.append(f"### Note: {path.name}\n{snippet_text[:MAX_NOTE_CHARS].strip()}")
+        excerpts.append(_format_excerpt(path, content))
     return excerpts
 
 
+@dataclass
+class NoteDocument:
+    path: Path
+    mtime_ns: int
+    size: int
+    excerpt: str
+    term_counts: Dict[str, int]
+    links: Dict[str, int] = field(default_factory=dict)
+
+
+@dataclass
+class NotesIndex:
+    """In-memory inverted index over a notes folder.
+
+    Files are read once when indexed; queries only touch the postings. `refresh`
+    re-stats the tree and re-reads files whose size or mtime changed, then swaps
+    the changes in under `_lock`, which every read also holds. Once built, a
+    stale index is refreshed on a background thread while queries keep using
+    the current postings. Obsidian
+    `[[wikilinks]]` are collected at the same time into an undirected, weighted
+    adjacency used to add linked neighbours of the top hits.
+    """
+
+    root: Path
+    refresh_interval: float = 30.0
+    documents: Dict[str, NoteDocument] = field(default_factory=dict)
+    postings: Dict[str, Dict[str, int]] = field(default_factory=dict)
+    adjacency: Dict[str, Dict[str, int]] = field(default_factory=dict)
+    built_at: float = 0.0
+    # Bumped whenever postings change, so incremental queries know to start over.
+    generation: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+    # Serialises refreshes. Only a refresh writes the index, so it can walk the
+    # tree and read files holding this lock alone and take `_lock` to apply.
+    _refresh_lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def refresh(self) -> None:
+        started = time.perf_counter()
+        with self._refresh_lock:
+            updated: Dict[str, NoteDocument] = {}
+            seen: set[str] = set()
+            for path in iter_markdown_files(self.root):
+                key = str(path)
+                seen.add(key)
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                current = self.documents.get(key)
+                if current is not None and current.mtime_ns == stat.st_mtime_ns and current.size == stat.st_size:
+                    continue
+                try:
+                    content = path.read_text(encoding="utf-8")
+                except (OSError, UnicodeDecodeError):
+                    continue
+                updated[key] = NoteDocument(
+                    path=path,
+                    mtime_ns=stat.st_mtime_ns,
+                    size=stat.st_size,
+                    excerpt=_format_excerpt(path, content),
+                    term_counts=_count_terms(content),
+                    links=_extract_links(content),
+                )
+            removed = [key for key in self.documents if key not in seen]
+            adjacency = self.adjacency
+            if updated or removed:
+                documents = {key: document for key, document in self.documents.items() if key in seen}
+                documents.update(updated)
+                adjacency = build_adjacency(documents)
+            with self._lock:
+                for key in removed:
+                    self._drop(key)
+                for key, document in updated.items():
+                    self._drop(key)
+                    self.documents[key] = document
+                    for term, count in document.term_counts.items():
+                        self.postings.setdefault(term, {})[key] = count
+                if updated or removed:
+                    self.adjacency = adjacency
+                    self.generation += 1
+                self.built_at = time.monotonic()
+        logger.debug(
+            "Indexed %s notes under %s in %.1f ms",
+            len(self.documents),
+            self.root,
+            (time.perf_counter() - started) * 1000,
+        )
+
+    def search(self, terms: set[str], limit: int, neighbours: int = 0) -> List[str]:
+        self.ensure_fresh()
+        with self._lock:
+            scores: Dict[str, int] = {}
+            for term in terms:
+                for key, count in self.postings.get(term, {}).items():
+                    scores[key] = scores.get(key, 0) + count
+            return self._rank(scores, limit, neighbours)
+
+    def ensure_fresh(self) -> None:
+        """Build the index on first use; after that, refresh it in the background when stale."""
+
+        if not self.built_at:
+            self.refresh()
+        elif time.monotonic() - self.built_at > self.refresh_interval:
+            refresh_in_background(self)
+
+    def rank(self, scores: Dict[str, int], limit: int, neighbours: int = 0) -> List[str]:
+        with self._lock:
+            return self._rank(scores, limit, neighbours)
+
+    def _rank(self, scores: Dict[str, int], limit: int, neighbours: int) -> List[str]:
+        # Ties go to the lower path so results do not depend on dict insertion
+        # order; MappedNotesIndex numbers documents in path order and matches.
+        # Scores kept across a refresh may name notes that have since been removed.
+        candidates = [(key, score) for key, score in scores.items() if key in self.documents]
+        hits = [key for key, _ in heapq.nsmallest(limit, candidates, key=lambda item: (-item[1], item[0]))]
+        excerpts = [self.documents[key].excerpt for key in hits]
+        adjacency = self.adjacency
+        for key in pick_neighbours(hits, lambda hit: adjacency.get(hit, {}).items(), neighbours):
+            excerpts.append(linked_excerpt(self.documents[key].excerpt))
+        return excerpts
+
+    def _drop(self, key: str) -> None:
+        document = self.documents.pop(key, None)
+        if document is None:
+            return
+        for term in document.term_counts:
+            bucket = self.postings.get(term)
+            if bucket is None:
+                continue
+            bucket.pop(key, None)
+            if not bucket:
+                del self.postings[term]
+
+
+_INDEXES: Dict[Path, Any] = {}
+_INDEXES_LOCK = threading.Lock()
+_REFRESHING: set[int] = set()
+
+
+def refresh_in_background(index: Any) -> None:
+    """Run `index.refresh()` on a daemon thread unless one is already running for it."""
+
+    with _INDEXES_LOCK:
+        if id(index) in _REFRESHING:
+            return
+        _REFRESHING.add(id(index))
+
+    def run() -> None:
+        try:
+            index.refresh()
+        except Exception:  # pragma: no cover - logged, retried on the next stale query
+            logger.exception("Background refresh of the notes index under %s failed", index.root)
+        finally:
+            with _INDEXES_LOCK:
+                _REFRESHING.discard(id(index))
+
+    threading.Thread(target=run, name="notes-refresh", daemon=True).start()
+
+
+def get_notes_index(base_path: Path):
+    """Return the index for `base_path`: per-process, or mmap-shared when running several workers."""
+
+    with _INDEXES_LOCK:
+        index = _INDEXES.get(base_path)
+        if index is None:
+            settings = get_settings()
+            if settings.workers > 1:
+                from backend.notes_store import MappedNotesIndex
+
+                index = MappedNotesIndex(root=base_path, refresh_interval=settings.notes_index_refresh)
+            else:
+                index = NotesIndex(root=base_path, refresh_interval=settings.notes_index_refresh)
+            _INDEXES[base_path] = index
+    return index
+
+
+class IncrementalNotesQuery:
+    """Notes retrieval for a prompt that is still being typed.
+
+    Scores are additive over query terms, so each update only walks the
+    postings of terms that appeared or disappeared since the previous text.
+    The result always equals a fresh `NotesIndex.search` on the same text.
+    """
+
+    def __init__(self, index: NotesIndex) -> None:
+        self.index = index
+        self.terms: set[str] = set()
+        self.scores: Dict[str, int] = {}
+        self._generation = -1
+
+    def update(self, text: str) -> None:
+        self.index.ensure_fresh()
+        terms = _tokenize(text)
+        with self.index._lock:
+            if self._generation != self.index.generation:
+                self.terms, self.scores = set(), {}
+                self._generation = self.index.generation
+            for term, sign in [(term, 1) for term in terms - self.terms] + [(term, -1) for term in self.terms - terms]:
+                for key, count in self.index.postings.get(term, {}).items():
+                    score = self.scores.get(key, 0) + sign * count
+                    if score:
+                        self.scores[key] = score
+                    else:
+                        self.scores.pop(key, None)
+        self.terms = terms
+
+    def results(self, limit: int = 3) -> List[str]:
+        if not self.terms:
+            return []
+        return self.index.rank(self.scores, limit, neighbours=get_settings().notes_link_neighbours)
+
+
+def incremental_notes_query() -> Optional[IncrementalNotesQuery]:
+    """An incremental query over the in-memory index, when one is in use."""
+
+    base_path = resolve_notes_root()
+    if base_path is None or not get_settings().notes_index:
+        return None
+    index = get_notes_index(base_path)
+    return IncrementalNotesQuery(index) if isinstance(index, NotesIndex) else None
+
+
+def reset_notes_indexes() -> None:
+    with _INDEXES_LOCK:
+        _INDEXES.clear()
+
+
+def iter_markdown_files(base_path: Path):
+    for dirpath, _dirnames, filenames in os.walk(base_path):
+        for name in filenames:
+            if os.path.splitext(name)[1].lower() in MARKDOWN_EXTENSIONS:
+                yield Path(dirpath) / name
+
+
+def _format_excerpt(path: Path, content: str) -> str:
+    snippets = content.strip().splitlines()
+    snippet_text = "\n".join(snippets[: MAX_NOTE_CHARS // 80])
+    return f"### Note: {path.name}\n{snippet_text[:MAX_NOTE_CHARS].strip()}"
+
+
+def link_names(path: Path) -> List[str]:
+    """Names a wikilink may use for `path`: the stem, and the part after a "Topic – " prefix."""
+
+    stem = path.stem
+    names = [_normalise_link(stem)]
+    for separator in (" – ", " - "):
+        if separator in stem:
+            names.append(_normalise_link(stem.split(separator, 1)[1]))
+    return names
+
+
+def _normalise_link(name: str) -> str:
+    return re.sub(r"[\W_]+", "", name.lower())
+
+
+def _extract_links(content: str) -> Dict[str, int]:
+    counts: Dict[str, int] = {}
+    for match in WIKILINK.finditer(content):
+        name = _normalise_link(match.group(1))
+        if name:
+            counts[name] = counts.get(name, 0) + 1
+    return counts
+
+
+def build_adjacency(documents: Dict[str, NoteDocument]) -> Dict[str, Dict[str, int]]:
+    resolve: Dict[str, str] = {}
+    for key in sorted(documents):
+        for name in link_names(documents[key].path):
+            resolve.setdefault(name, key)
+    adjacency: Dict[str, Dict[str, int]] = {}
+    for key, document in documents.items():
+        for name, count in document.links.items():
+            target = resolve.get(name)
+            if target is None or target == key:
+                continue
+            # Links count in both directions, so backlinks pull a note in as strongly as outgoing links.
+            for source, other in ((key, target), (target, key)):
+                edges = adjacency.setdefault(source, {})
+                edges[other] = edges.get(other, 0) + count
+    return adjacency
+
+
+def pick_neighbours(hits: List[K], edges: Callable[[K], Iterable[Tuple[K, int]]], limit: int) -> List[K]:
+    if limit <= 0 or not hits:
+        return []
+    exclude = set(hits)
+    weights: Dict[K, int] = {}
+    for hit in hits:
+        for other, weight in edges(hit):
+            if other not in exclude:
+                weights[other] = weights.get(other, 0) + weight
+    return [key for key, _ in heapq.nsmallest(limit, weights.items(), key=lambda item: (-item[1], item[0]))]
+
+
+def linked_excerpt(excerpt: str) -> str:
+    heading, _, body = excerpt.partition("\n")
+    heading = heading.replace("### Note:", "### Linked note:", 1)
+    return f"{heading}\n{body[:MAX_LINKED_NOTE_CHARS].strip()}"
+
+
 def _tokenize(text: str) -> set[str]:
     return {token for token in re.split(r"\W+", text.lower()) if token}
 
 
+def _count_terms(text: str) -> Dict[str, int]:
+    counts: Dict[str, int] = {}
+    for token in re.split(r"\W+", text.lower()):
+        if token:
+            counts[token] = counts.get(token, 0) + 1
+    return counts
+
+
 def _score_file(path: Path, terms: set[str]) -> int:
     try:
         content = path.read_text(encoding="utf-8")
@@ -0,0 +1,234 @@
+from __future__ import annotations
+
+import hashlib
+import heapq
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from backend.locking import file_lock
+from backend.notes import NotesIndex, iter_markdown_files, linked_excerpt, pick_neighbours, refresh_in_background
+from backend.storage import DATA_DIR
+
+logger = logging.getLogger("backend.notes_store")
+
+MAGIC = b"AHNIDX02"
+# magic, doc count, term count, docs/terms/postings/edges/strings offsets, tree signature
+HEADER = struct.Struct("<8sIIQQQQQ32s")
+# path offset, path length, excerpt offset, excerpt length (offsets into the strings blob),
+# first edge, edge count
+DOC = struct.Struct("<QIQIII")
+# term offset, term length, first posting, posting count; sorted by term bytes
+TERM = struct.Struct("<QIQI")
+# doc id, occurrences
+POSTING = struct.Struct("<II")
+# linked doc id, link count in either direction
+EDGE = struct.Struct("<II")
+
+
+def tree_signature(root: Path) -> bytes:
+    digest = hashlib.sha256()
+    entries: List[Tuple[str, int, int]] = []
+    for path in iter_markdown_files(root):
+        try:
+            stat = path.stat()
+        except OSError:
+            continue
+        entries.append((str(path), stat.st_mtime_ns, stat.st_size))
+    for name, mtime_ns, size in sorted(entries):
+        digest.update(f"{name}\0{mtime_ns}\0{size}\n".encode("utf-8"))
+    return digest.digest()
+
+
+def write_index_file(index: NotesIndex, signature: bytes, target: Path) -> None:
+    keys = sorted(index.documents)
+    doc_ids = {key: doc_id for doc_id, key in enumerate(keys)}
+    strings = bytearray()
+
+    def intern(text: str) -> Tuple[int, int]:
+        encoded = text.encode("utf-8")
+        offset = len(strings)
+        strings.extend(encoded)
+        return offset, len(encoded)
+
+    docs = bytearray()
+    edges = bytearray()
+    edge_count = 0
+    for key in keys:
+        path_offset, path_length = intern(key)
+        excerpt_offset, excerpt_length = intern(index.documents[key].excerpt)
+        linked = index.adjacency.get(key, {})
+        docs.extend(DOC.pack(path_offset, path_length, excerpt_offset, excerpt_length, edge_count, len(linked)))
+        for other, weight in linked.items():
+            edges.extend(EDGE.pack(doc_ids[other], weight))
+        edge_count += len(linked)
+
+    terms = bytearray()
+    postings = bytearray()
+    posting_count = 0
+    for term in sorted(index.postings, key=lambda value: value.encode("utf-8")):
+        bucket = index.postings[term]
+        term_offset, term_length = intern(term)
+        terms.extend(TERM.pack(term_offset, term_length, posting_count, len(bucket)))
+        for key, count in bucket.items():
+            postings.extend(POSTING.pack(doc_ids[key], count))
+        posting_count += len(bucket)
+
+    docs_offset = HEADER.size
+    terms_offset = docs_offset + len(docs)
+    postings_offset = terms_offset + len(terms)
+    edges_offset = postings_offset + len(postings)
+    strings_offset = edges_offset + len(edges)
+    header = HEADER.pack(
+        MAGIC,
+        len(keys),
+        len(index.postings),
+        docs_offset,
+        terms_offset,
+        postings_offset,
+        edges_offset,
+        strings_offset,
+        signature,
+    )
+    tmp_path = target.with_name(f"{target.name}.{os.getpid()}.tmp")
+    with tmp_path.open("wb") as stream:
+        for chunk in (header, docs, terms, postings, edges, strings):
+            stream.write(chunk)
+        stream.flush()
+        os.fsync(stream.fileno())
+    os.replace(tmp_path, target)
+
+
+class MappedNotesIndex:
+    """Read-only notes index shared between worker processes through mmap.
+
+    The first worker to find the file missing or stale rebuilds it under a file
+    lock; every worker maps the same file, so the postings live in the page
+    cache once instead of once per process.
+    """
+
+    def __init__(self, root: Path, refresh_interval: float = 30.0, path: Optional[Path] = None) -> None:
+        self.root = root
+        self.refresh_interval = refresh_interval
+        digest = hashlib.sha1(str(root).encode("utf-8")).hexdigest()[:10]
+        self.path = path or DATA_DIR / f"notes_index-{digest}.bin"
+        self.lock_path = self.path.with_suffix(".lock")
+        self.built_at = 0.0
+        self._mapped: Optional[_Mapping] = None
+        self._mapped_stat: Optional[Tuple[int, int]] = None
+        self._lock = threading.Lock()
+
+    def refresh(self) -> None:
+        with self._lock:
+            started = time.perf_counter()
+            signature = tree_signature(self.root)
+            with file_lock(self.lock_path):
+                if self._stored_signature() != signature:
+                    index = NotesIndex(root=self.root)
+                    index.refresh()
+                    write_index_file(index, signature, self.path)
+                    logger.info(
+                        "Built shared notes index (%s notes) in %.1f ms",
+                        len(index.documents),
+                        (time.perf_counter() - started) * 1000,
+                    )
+                self._remap()
+            self.built_at = time.monotonic()
+
+    def search(self, terms: set[str], limit: int, neighbours: int = 0) -> List[str]:
+        self.ensure_fresh()
+        mapping = self._mapped
+        if mapping is None:
+            return []
+        scores: Dict[int, int] = {}
+        for term in terms:
+            for doc_id, hits in mapping.postings(term):
+                scores[doc_id] = scores.get(doc_id, 0) + hits
+        # Doc ids follow path order, so this breaks ties like NotesIndex.rank.
+        hits = [doc_id for doc_id, _ in heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1], item[0]))]
+        excerpts = [mapping.excerpt(doc_id) for doc_id in hits]
+        for doc_id in pick_neighbours(hits, mapping.neighbours, neighbours):
+            excerpts.append(linked_excerpt(mapping.excerpt(doc_id)))
+        return excerpts
+
+    def ensure_fresh(self) -> None:
+        if not self.built_at:
+            self.refresh()
+        elif time.monotonic() - self.built_at > self.refresh_interval:
+            refresh_in_background(self)
+
+    def _stored_signature(self) -> Optional[bytes]:
+        try:
+            with self.path.open("rb") as stream:
+                raw = stream.read(HEADER.size)
+        except OSError:
+            return None
+        if len(raw) < HEADER.size:
+            return None
+        fields = HEADER.unpack(raw)
+        if fields[0] != MAGIC:
+            return None
+        return fields[-1]
+
+    def _remap(self) -> None:
+        stat = self.path.stat()
+        current = (stat.st_ino, stat.st_mtime_ns)
+        if self._mapped is not None and self._mapped_stat == current:
+            return
+        with self.path.open("rb") as stream:
+            mapped = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+        # The previous mapping is released once in-flight searches drop their reference.
+        self._mapped = _Mapping(mapped)
+        self._mapped_stat = current
+
+
+class _Mapping:
+    def __init__(self, mapped: mmap.mmap) -> None:
+        self.mapped = mapped
+        (
+            _,
+            self.doc_count,
+            self.term_count,
+            self.docs_offset,
+            self.terms_offset,
+            self.postings_offset,
+            self.edges_offset,
+            self.strings_offset,
+            _,
+        ) = HEADER.unpack_from(mapped, 0)
+
+    def string(self, offset: int, length: int) -> bytes:
+        start = self.strings_offset + offset
+        return self.mapped[start : start + length]
+
+    def postings(self, term: str):
+        needle = term.encode("utf-8")
+        low, high = 0, self.term_count - 1
+        while low <= high:
+            middle = (low + high) // 2
+            term_offset, term_length, first, count = TERM.unpack_from(
+                self.mapped, self.terms_offset + middle * TERM.size
+            )
+            candidate = self.string(term_offset, term_length)
+            if candidate == needle:
+                start = self.postings_offset + first * POSTING.size
+                return POSTING.iter_unpack(self.mapped[start : start + count * POSTING.size])
+            if candidate < needle:
+                low = middle + 1
+            else:
+                high = middle - 1
+        return iter(())
+
+    def excerpt(self, doc_id: int) -> str:
+        _, _, excerpt_offset, excerpt_length, _, _ = DOC.unpack_from(self.mapped, self.docs_offset + doc_id * DOC.size)
+        return self.string(excerpt_offset, excerpt_length).decode("utf-8")
+
+    def neighbours(self, doc_id: int):
+        *_, first, count = DOC.unpack_from(self.mapped, self.docs_offset + doc_id * DOC.size)
+        start = self.edges_offset + first * EDGE.size
+        return EDGE.iter_unpack(self.mapped[start : start + count * EDGE.size])
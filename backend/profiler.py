@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import dataclass
+from types import CodeType, FrameType
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+Stack = Tuple[str, ...]
+
+MAX_DEPTH = 128
+# Leaf frames of threads with nothing to do: the event loop blocked in select()
+# and pool workers waiting for a job. Left out unless idle samples are requested.
+IDLE_LEAVES = {("selectors.py", "select"), ("thread.py", "_worker")}
+
+
+class ProfilerBusy(RuntimeError):
+    pass
+
+
+@dataclass
+class _Request:
+    started: float
+    ended: Optional[float] = None
+
+
+class SamplingProfiler:
+    """Wall-clock sampling profiler over every thread of the process.
+
+    A daemon thread reads `sys._current_frames()` every `interval` seconds and
+    counts each thread's Python stack, so `asyncio.to_thread` workers
+    (storage, notes, history) show up next to the event loop. Nothing is
+    installed in the profiled threads; the cost is one stack walk per thread
+    per sample.
+
+    With `slow_ms`, samples are kept only while requests are in flight and
+    counted only if a request that ran longer than `slow_ms` was in flight
+    when they were taken. Concurrent requests share the samples of the time
+    they overlap.
+    """
+
+    def __init__(self, interval: float = 0.005, include_idle: bool = False, slow_ms: Optional[float] = None) -> None:
+        self.interval = interval
+        self.include_idle = include_idle
+        self.slow_ms = slow_ms
+        self.samples = 0
+        self.stacks: Counter = Counter()
+        self.requests = 0
+        self.slow_requests = 0
+        self._labels: Dict[CodeType, str] = {}
+        self._pending: Deque[Tuple[float, List[Tuple[str, Stack]]]] = deque()
+        self._active: List[_Request] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self.started = 0.0
+        self.elapsed = 0.0
+
+    def start(self) -> None:
+        self.started = time.perf_counter()
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.elapsed = time.perf_counter() - self.started
+
+    # Slow-request mode ------------------------------------------------------
+
+    def begin_request(self) -> _Request:
+        request = _Request(time.perf_counter())
+        with self._lock:
+            self._active.append(request)
+        return request
+
+    def end_request(self, request: _Request) -> None:
+        request.ended = time.perf_counter()
+        with self._lock:
+            self._active.remove(request)
+            self.requests += 1
+            if self.slow_ms is not None and (request.ended - request.started) * 1000 >= self.slow_ms:
+                self.slow_requests += 1
+                for taken, stacks in self._pending:
+                    if request.started <= taken <= request.ended:
+                        self._count(stacks)
+                # A sample is counted once even if several slow requests cover it.
+                self._pending = deque(
+                    item for item in self._pending if not request.started <= item[0] <= request.ended
+                )
+            oldest = min((active.started for active in self._active), default=request.ended)
+            while self._pending and self._pending[0][0] < oldest:
+                self._pending.popleft()
+
+    # Sampling -----------------------------------------------------------------
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            taken = time.perf_counter()
+            stacks = [
+                (names.get(ident, f"thread-{ident}"), self._stack(frame))
+                for ident, frame in sys._current_frames().items()
+                if ident != own
+            ]
+            stacks = [(name, stack) for name, stack in stacks if stack and (self.include_idle or not self._idle(stack))]
+            with self._lock:
+                if self.slow_ms is None:
+                    self._count(stacks)
+                elif self._active:
+                    self._pending.append((taken, stacks))
+
+    def _count(self, stacks: List[Tuple[str, Stack]]) -> None:
+        self.samples += 1
+        for thread_name, stack in stacks:
+            self.stacks[(thread_name, stack)] += 1
+
+    def _stack(self, frame: Optional[FrameType]) -> Stack:
+        labels: List[str] = []
+        while frame is not None and len(labels) < MAX_DEPTH:
+            code = frame.f_code
+            label = self._labels.get(code)
+            if label is None:
+                label = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+                self._labels[code] = label
+            labels.append(label)
+            frame = frame.f_back
+        labels.reverse()
+        return tuple(labels)
+
+    @staticmethod
+    def _idle(stack: Stack) -> bool:
+        name, _, location = stack[-1].partition(" (")
+        return (location.split(":", 1)[0], name) in IDLE_LEAVES
+
+    # Results ------------------------------------------------------------------
+
+    def collapsed(self) -> str:
+        """Stacks in the folded format of flamegraph.pl and speedscope: `thread;root;...;leaf count`."""
+
+        lines = [
+            ";".join((thread_name.replace(";", "_"), *stack)) + f" {count}"
+            for (thread_name, stack), count in self.stacks.most_common()
+        ]
+        return "\n".join(lines) + ("\n" if lines else "")
+
+    def top(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Functions by samples spent in them (self) and under them (total)."""
+
+        own: Counter = Counter()
+        total: Counter = Counter()
+        for (_thread_name, stack), count in self.stacks.items():
+            own[stack[-1]] += count
+            for label in set(stack):
+                total[label] += count
+        weight = sum(self.stacks.values()) or 1
+        return [
+            {
+                "function": label,
+                "self": own[label],
+                "total": count,
+                "self_pct": round(own[label] * 100 / weight, 1),
+                "total_pct": round(count * 100 / weight, 1),
+            }
+            for label, count in sorted(total.items(), key=lambda item: (-own[item[0]], -item[1]))[:limit]
+        ]
+
+    def summary(self, limit: int = 20) -> Dict[str, Any]:
+        threads: Counter = Counter()
+        for (thread_name, _stack), count in self.stacks.items():
+            threads[thread_name] += count
+        summary: Dict[str, Any] = {
+            "seconds": round(self.elapsed, 3),
+            "interval_ms": self.interval * 1000,
+            "samples": self.samples,
+            "threads": dict(threads.most_common()),
+            "top": self.top(limit),
+            "collapsed": self.collapsed(),
+        }
+        if self.slow_ms is not None:
+            summary.update(slow_ms=self.slow_ms, requests=self.requests, slow_requests=self.slow_requests)
+        return summary
+
+
+_ACTIVE: Optional[SamplingProfiler] = None
+_active_lock = threading.Lock()
+
+
+def start_profiler(profiler: SamplingProfiler) -> None:
+    global _ACTIVE
+    with _active_lock:
+        if _ACTIVE is not None:
+            raise ProfilerBusy("A profile is already being recorded.")
+        _ACTIVE = profiler
+    profiler.start()
+
+
+def stop_profiler(profiler: SamplingProfiler) -> None:
+    global _ACTIVE
+    profiler.stop()
+    with _active_lock:
+        if _ACTIVE is profiler:
+            _ACTIVE = None
+
+
+class SlowRequestMiddleware:
+    """Reports request boundaries to a running slow-request profile; a no-op otherwise."""
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        profiler = _ACTIVE
+        if scope["type"] != "http" or profiler is None or profiler.slow_ms is None:
+            await self.app(scope, receive, send)
+            return
+        request = profiler.begin_request()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            profiler.end_request(request)
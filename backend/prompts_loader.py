@@ -1,27 +1,167 @@
 from __future__ import annotations
 
+import hashlib
+import logging
+import threading
+import time
+from dataclasses import dataclass, field, fields, replace
 from pathlib import Path
-from typing import Dict
-
-import yaml
+from typing import Any, Dict, Mapping, Optional, Tuple
 
 SERVER_DIR = Path(__file__).resolve().parent
 PROMPTS_DIR = SERVER_DIR / "prompts"
 BASE_PROMPT_FILE = PROMPTS_DIR / "base.md"
 DOMAINS_FILE = PROMPTS_DIR / "domains.yaml"
+PROFILES_FILE = PROMPTS_DIR / "profiles.yaml"
+DEFAULT_BASE_PROMPT = "You are a helpful AI assistant."
+
+logger = logging.getLogger("backend.prompts")
 
 
 def load_base_prompt() -> str:
     if BASE_PROMPT_FILE.exists():
         return BASE_PROMPT_FILE.read_text(encoding="utf-8").strip()
-    return "You are a helpful AI assistant."
+    return DEFAULT_BASE_PROMPT
 
 
 def load_domain_prompts() -> Dict[str, str]:
     if not DOMAINS_FILE.exists():
         return {}
-    data = yaml.safe_load(DOMAINS_FILE.read_text(encoding="utf-8"))
+    return _parse_domains(DOMAINS_FILE.read_text(encoding="utf-8"))
+
+
+def _parse_domains(text: str) -> Dict[str, str]:
+    import yaml
+
+    data = yaml.safe_load(text)
     if not isinstance(data, dict):
         return {}
     return {str(k): str(v) for k, v in data.items()}
 
+
+@dataclass(frozen=True)
+class GenerationProfile:
+    """Upstream sampling limits for one domain; None leaves the model default."""
+
+    max_tokens: Optional[int] = None
+    temperature: Optional[float] = None
+    stop: Tuple[str, ...] = ()
+    num_ctx: Optional[int] = None
+    stop_after_answer: bool = False
+
+    def merged(self, overrides: Mapping[str, Any]) -> "GenerationProfile":
+        known = {item.name for item in fields(self)}
+        values = {key: value for key, value in overrides.items() if key in known and value is not None}
+        if "stop" in values:
+            values["stop"] = tuple(str(item) for item in values["stop"])
+        return replace(self, **values)
+
+
+def _parse_profiles(text: str) -> Dict[str, GenerationProfile]:
+    import yaml
+
+    data = yaml.safe_load(text) if text.strip() else None
+    if not isinstance(data, dict):
+        data = {}
+    default = GenerationProfile().merged(data.get("default") or {})
+    profiles = {"": default}
+    for key, values in data.items():
+        if key != "default" and isinstance(values, dict):
+            profiles[str(key)] = default.merged(values)
+    return profiles
+
+
+@dataclass(frozen=True)
+class PromptSet:
+    version: str
+    domains: Tuple[str, ...]
+    system_prompts: Dict[str, str]
+    profiles: Dict[str, GenerationProfile] = field(default_factory=lambda: {"": GenerationProfile()})
+
+    def system_prompt(self, domain_key: Optional[str]) -> str:
+        return self.system_prompts.get(domain_key or "", self.system_prompts[""])
+
+    def profile(self, domain_key: Optional[str]) -> GenerationProfile:
+        return self.profiles.get(domain_key or "", self.profiles[""])
+
+
+def compile_prompts(base_text: str, domains_text: str, suffix: str, profiles_text: str = "") -> PromptSet:
+    base_prompt = base_text.strip() or DEFAULT_BASE_PROMPT
+    domain_prompts = _parse_domains(domains_text) if domains_text.strip() else {}
+    system_prompts = {"": "\n\n".join([base_prompt, suffix])}
+    for key, prompt in domain_prompts.items():
+        parts = [base_prompt]
+        if prompt.strip():
+            parts.append(prompt.strip())
+        parts.append(suffix)
+        system_prompts[key] = "\n\n".join(parts)
+    digest = hashlib.sha256()
+    for chunk in (base_text, domains_text, suffix, profiles_text):
+        digest.update(chunk.encode("utf-8"))
+        digest.update(b"\0")
+    return PromptSet(
+        version=digest.hexdigest()[:12],
+        domains=tuple(domain_prompts),
+        system_prompts=system_prompts,
+        profiles=_parse_profiles(profiles_text),
+    )
+
+
+class PromptRegistry:
+    """Compiled system prompts and generation profiles, rebuilt when their files change.
+
+    `current` stats the prompt files at most once per `check_interval` seconds. A
+    rebuild produces a new `PromptSet` that replaces the old one in a single
+    assignment, so readers never observe a half-built set. If the new files
+    fail to parse, the previous set stays active.
+    """
+
+    def __init__(self, suffix: str, check_interval: float = 1.0) -> None:
+        self.suffix = suffix
+        self.check_interval = check_interval
+        self._current: Optional[PromptSet] = None
+        self._signature: Optional[tuple] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def current(self) -> PromptSet:
+        current = self._current
+        if current is not None and time.monotonic() - self._checked_at < self.check_interval:
+            return current
+        with self._lock:
+            self._checked_at = time.monotonic()
+            signature = _signature()
+            if self._current is None or signature != self._signature:
+                self._reload(signature)
+            assert self._current is not None
+            return self._current
+
+    def _reload(self, signature: tuple) -> None:
+        try:
+            base_text = BASE_PROMPT_FILE.read_text(encoding="utf-8") if BASE_PROMPT_FILE.exists() else ""
+            domains_text = DOMAINS_FILE.read_text(encoding="utf-8") if DOMAINS_FILE.exists() else ""
+            profiles_text = PROFILES_FILE.read_text(encoding="utf-8") if PROFILES_FILE.exists() else ""
+            compiled = compile_prompts(base_text, domains_text, self.suffix, profiles_text)
+        except Exception as exc:
+            if self._current is None:
+                raise
+            logger.warning("Prompt reload failed, keeping version %s: %s", self._current.version, exc)
+            self._signature = signature
+            return
+        previous = self._current
+        self._current = compiled
+        self._signature = signature
+        if previous is not None and previous.version != compiled.version:
+            logger.info("Reloaded prompts: version %s -> %s", previous.version, compiled.version)
+
+
+def _signature() -> tuple:
+    parts = []
+    for path in (BASE_PROMPT_FILE, DOMAINS_FILE, PROFILES_FILE):
+        try:
+            stat = path.stat()
+        except OSError:
+            parts.append(None)
+        else:
+            parts.append((stat.st_mtime_ns, stat.st_size))
+    return tuple(parts)
@@ -0,0 +1,288 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import hmac
+import itertools
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+from backend.config import ROOT, get_settings
+from backend.telemetry import increment
+
+logger = logging.getLogger("backend.ratelimit")
+
+
+def hash_key(raw_key: str) -> str:
+    """Short, stable identifier for a key that is safe to log and export."""
+
+    if not raw_key:
+        return "none"
+    return hashlib.sha256(raw_key.encode("utf-8")).hexdigest()[:12]
+
+
+@dataclass(frozen=True)
+class KeyPolicy:
+    name: str
+    key_id: str
+    digest: bytes
+    rate_per_minute: float
+    burst: int
+    max_concurrency: int
+    weight: float
+    admin: bool = False
+
+
+@dataclass
+class TokenBucket:
+    rate: float  # tokens per second
+    capacity: int
+    tokens: float = -1.0
+    updated_at: float = field(default_factory=time.monotonic)
+
+    def __post_init__(self) -> None:
+        if self.tokens < 0:
+            self.tokens = float(self.capacity)
+
+    def take(self, cost: int = 1) -> Tuple[bool, float]:
+        """Spend `cost` tokens if available; returns (allowed, seconds until that many are available)."""
+
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return True, 0.0
+        if self.rate <= 0 or cost > self.capacity:
+            return False, float("inf")
+        return False, (cost - self.tokens) / self.rate
+
+
+class KeyRegistry:
+    """API keys with their rate limits, from API_KEYS_FILE or the single API_KEY.
+
+    Only SHA-256 digests of the keys are kept after loading. Buckets live in
+    this process, so with several workers each worker enforces the limits on
+    the requests it receives.
+    """
+
+    def __init__(self, policies: List[KeyPolicy]) -> None:
+        self.policies = policies
+        self._buckets: Dict[str, TokenBucket] = {
+            policy.key_id: TokenBucket(rate=policy.rate_per_minute / 60.0, capacity=policy.burst)
+            for policy in policies
+            if policy.rate_per_minute > 0
+        }
+
+    def lookup(self, raw_key: Optional[str]) -> Optional[KeyPolicy]:
+        if not raw_key:
+            return None
+        digest = hashlib.sha256(raw_key.encode("utf-8")).digest()
+        match: Optional[KeyPolicy] = None
+        for policy in self.policies:
+            if hmac.compare_digest(policy.digest, digest):
+                match = policy
+        return match
+
+    def take(self, policy: KeyPolicy, cost: int = 1) -> Dict[str, Any]:
+        """Charge a request to the key's bucket and return its quota state."""
+
+        bucket = self._buckets.get(policy.key_id)
+        if bucket is None:
+            return {"allowed": True}
+        allowed, retry_after = bucket.take(cost)
+        if not allowed:
+            increment(f"ratelimit.{policy.key_id}.throttled")
+        refill = (bucket.capacity - bucket.tokens) / bucket.rate if bucket.rate > 0 else 0.0
+        return {
+            "allowed": allowed,
+            "limit": policy.burst,
+            "remaining": int(bucket.tokens),
+            "reset": max(0, int(refill + 0.999)),
+            "retry_after": retry_after,
+        }
+
+
+def load_registry() -> KeyRegistry:
+    settings = get_settings()
+    defaults = {
+        "rate_per_minute": settings.rate_limit_per_minute,
+        "burst": settings.rate_limit_burst,
+        "max_concurrency": settings.key_max_concurrency,
+        "weight": 1.0,
+    }
+    entries: Dict[str, Dict[str, Any]] = {}
+    if settings.api_keys_file:
+        import yaml
+
+        path = Path(settings.api_keys_file)
+        if not path.is_absolute():
+            path = ROOT / path
+        data = yaml.safe_load(path.read_text(encoding="utf-8")) or {}
+        entries = {str(name): dict(values or {}) for name, values in (data.get("keys") or {}).items()}
+    if not entries:
+        # The single API_KEY is the operator's own key.
+        entries = {"default": {"key": settings.api_key, "admin": True}}
+
+    policies: List[KeyPolicy] = []
+    for name, values in entries.items():
+        raw_key = str(values.get("key") or "")
+        if not raw_key:
+            logger.warning("API key '%s' has no key value; skipping.", name)
+            continue
+        merged = {**defaults, **{key: value for key, value in values.items() if key in defaults}}
+        policies.append(
+            KeyPolicy(
+                name=name,
+                key_id=hash_key(raw_key),
+                digest=hashlib.sha256(raw_key.encode("utf-8")).digest(),
+                rate_per_minute=float(merged["rate_per_minute"]),
+                burst=max(1, int(merged["burst"])),
+                max_concurrency=max(1, int(merged["max_concurrency"])),
+                weight=max(0.01, float(merged["weight"])),
+                admin=bool(values.get("admin", False)),
+            )
+        )
+    return KeyRegistry(policies)
+
+
+class FairScheduler:
+    """Weighted fair queuing of upstream LLM calls across API keys.
+
+    Each waiting call gets a virtual finish tag of max(now, key's last tag) +
+    1 / weight; a free slot goes to the smallest tag among keys that are under
+    their concurrency cap. A key sending a burst therefore queues behind its
+    own earlier calls instead of in front of everybody else's.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = max(1, capacity)
+        self.active = 0
+        self._virtual_time = 0.0
+        self._last_tag: Dict[str, float] = {}
+        self._in_flight: Dict[str, int] = {}
+        self._waiting: Dict[str, Deque[Tuple[float, int, asyncio.Future]]] = {}
+        self._policies: Dict[str, KeyPolicy] = {}
+        self._sequence = itertools.count()
+
+    def queued(self) -> int:
+        return sum(len(queue) for queue in self._waiting.values())
+
+    @asynccontextmanager
+    async def slot(self, policy: Optional[KeyPolicy]) -> AsyncIterator[None]:
+        if policy is None:
+            yield
+            return
+        await self._acquire(policy)
+        try:
+            yield
+        finally:
+            self._release(policy)
+
+    async def _acquire(self, policy: KeyPolicy) -> None:
+        key = policy.key_id
+        self._policies[key] = policy
+        tag = max(self._virtual_time, self._last_tag.get(key, 0.0)) + 1.0 / policy.weight
+        self._last_tag[key] = tag
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        entry = (tag, next(self._sequence), future)
+        self._waiting.setdefault(key, deque()).append(entry)
+        self._dispatch()
+        if future.done():
+            return
+        increment(f"ratelimit.{key}.queued")
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted just as we were cancelled: hand the slot on.
+                self._release(policy)
+            else:
+                self._waiting[key].remove(entry)
+            raise
+
+    def _grant(self, key: str, tag: float) -> None:
+        self.active += 1
+        self._in_flight[key] = self._in_flight.get(key, 0) + 1
+        self._virtual_time = max(self._virtual_time, tag)
+
+    def _release(self, policy: KeyPolicy) -> None:
+        self.active -= 1
+        self._in_flight[policy.key_id] -= 1
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        while self.active < self.capacity:
+            best: Optional[Tuple[float, int, str]] = None
+            for key, queue in self._waiting.items():
+                if not queue or self._in_flight.get(key, 0) >= self._policies[key].max_concurrency:
+                    continue
+                tag, sequence, _ = queue[0]
+                if best is None or (tag, sequence) < best[:2]:
+                    best = (tag, sequence, key)
+            if best is None:
+                return
+            tag, _, future = self._waiting[best[2]].popleft()
+            self._grant(best[2], tag)
+            future.set_result(None)
+
+
+_REGISTRY: Optional[KeyRegistry] = None
+_SCHEDULER: Optional[FairScheduler] = None
+
+
+def get_registry() -> KeyRegistry:
+    global _REGISTRY
+    if _REGISTRY is None:
+        _REGISTRY = load_registry()
+    return _REGISTRY
+
+
+def get_scheduler() -> FairScheduler:
+    global _SCHEDULER
+    if _SCHEDULER is None:
+        _SCHEDULER = FairScheduler(get_settings().llm_concurrency)
+    return _SCHEDULER
+
+
+def quota_headers(quota: Dict[str, Any]) -> List[Tuple[bytes, bytes]]:
+    if "limit" not in quota:
+        return []
+    headers = [
+        (b"x-ratelimit-limit", str(quota["limit"]).encode()),
+        (b"x-ratelimit-remaining", str(quota["remaining"]).encode()),
+        (b"x-ratelimit-reset", str(quota["reset"]).encode()),
+    ]
+    if not quota["allowed"] and quota["retry_after"] != float("inf"):
+        headers.append((b"retry-after", str(int(quota["retry_after"] + 0.999)).encode()))
+    return headers
+
+
+class QuotaHeadersMiddleware:
+    """Adds the quota computed by the rate-limit dependency to every response.
+
+    Plain ASGI rather than BaseHTTPMiddleware so streaming responses and
+    disconnect detection pass through untouched.
+    """
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_quota(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                quota = scope.get("state", {}).get("quota")
+                if quota:
+                    message = {**message, "headers": [*message.get("headers", []), *quota_headers(quota)]}
+            await send(message)
+
+        await self.app(scope, receive, send_with_quota)
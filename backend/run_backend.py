@@ -11,12 +11,14 @@ if str(ROOT) not in sys.path:
 
 from backend.storage import clear_logs
 from run import (
-    ensure_ollama_installed,
-    ensure_ollama_model,
-    ensure_ollama_running,
+    backend_socket_path,
+    BootTimings,
+    OllamaBootstrap,
     ensure_venv,
+    env_flag,
     install_dependencies,
     apply_env_defaults,
+    parse_args,
     parse_env_file,
     start_backend,
     terminate_process,
@@ -28,27 +30,40 @@ ENV_FILE = ROOT / ".env"
 
 
 def main() -> int:
+    args = parse_args()
+    timings = BootTimings()
     env_values = parse_env_file(ENV_FILE)
     apply_env_defaults(env_values)
-    ensure_venv(VENV_DIR)
+    if args.workers is not None:
+        env_values["BACKEND_WORKERS"] = str(args.workers)
+    with timings.step("venv"):
+        ensure_venv(VENV_DIR)
     python_executable = venv_python(VENV_DIR)
     if not python_executable.exists():
         raise FileNotFoundError(f"Virtual environment Python not found at {python_executable}")
 
-    install_dependencies(python_executable)
-    clear_logs()
-    ensure_ollama_installed(env_values)
-    ollama_proc = ensure_ollama_running(env_values)
-    ensure_ollama_model(env_values)
+    with timings.step("dependencies"):
+        install_dependencies(python_executable, force=args.reinstall)
+    if env_flag(env_values, "LOGS_CLEAR_ON_START", True):
+        with timings.step("clear logs"):
+            clear_logs()
 
-    backend_proc = start_backend(python_executable, env_values)
+    backend_proc = None
+    ollama = OllamaBootstrap(env_values, timings)
+    ollama.start()
 
     try:
-        wait_for_status(
-            env_values.get("HOST", "127.0.0.1"),
-            env_values.get("PORT", "8000"),
-            process=backend_proc,
-        )
+        with timings.step("backend spawn"):
+            backend_proc = start_backend(python_executable, env_values)
+        with timings.step("backend ready"):
+            wait_for_status(
+                env_values.get("HOST", "127.0.0.1"),
+                env_values.get("PORT", "8000"),
+                process=backend_proc,
+                socket_path=backend_socket_path(env_values),
+            )
+        ollama.wait()
+        timings.report()
         print("Backend is running. Press Ctrl+C to stop.")
         while True:
             time.sleep(1.0)
@@ -58,7 +73,7 @@ def main() -> int:
         print("\nStopping backend...")
     finally:
         terminate_process(backend_proc, "backend")
-        terminate_process(ollama_proc, "ollama daemon")
+        ollama.stop()
     return 0
 
 
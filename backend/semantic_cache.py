@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import hashlib
+import math
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from backend.config import get_settings
+
+# Numbers, dotted addresses, CIDR prefixes and masks, times: "/23" vs "/24" or
+# two IPs barely move an embedding but change the answer.
+_NUMBER = re.compile(r"\d+(?:[.:/]\d+)*")
+
+
+def normalise(vector: List[float]) -> List[float]:
+    norm = math.sqrt(sum(value * value for value in vector))
+    if not norm:
+        return []
+    return [value / norm for value in vector]
+
+
+def cache_scope(question: str, system_prompt: str, profile: Any = None) -> str:
+    """Everything besides meaning that must be identical for a hit.
+
+    That is the numbers in the question, in order, the composed system prompt
+    (which changes with the prompt files) and the resolved generation profile
+    including per-request options.
+    """
+
+    numbers = " ".join(_NUMBER.findall(question))
+    text = f"{system_prompt}\n{profile!r}\n{numbers}"
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+@dataclass
+class _DomainBucket:
+    """Unit vectors for one domain and scope, keyed by log id."""
+
+    vectors: "OrderedDict[str, List[float]]" = field(default_factory=OrderedDict)
+    _matrix: Any = None
+    _ids: Optional[List[str]] = None
+
+    def invalidate(self) -> None:
+        self._matrix = None
+        self._ids = None
+
+    def nearest(self, query: List[float]) -> Optional[Tuple[str, float]]:
+        if not self.vectors:
+            return None
+        try:
+            import numpy as np
+        except ImportError:
+            np = None
+        if np is None:
+            best_id, best_score = "", -1.0
+            for entry_id, vector in self.vectors.items():
+                if len(vector) != len(query):
+                    continue
+                score = sum(a * b for a, b in zip(vector, query))
+                if score > best_score:
+                    best_id, best_score = entry_id, score
+            return (best_id, best_score) if best_id else None
+        if self._matrix is None:
+            self._ids = [entry_id for entry_id, vector in self.vectors.items() if len(vector) == len(query)]
+            self._matrix = np.asarray([self.vectors[entry_id] for entry_id in self._ids], dtype=np.float32)
+        if not self._ids or self._matrix.shape[1] != len(query):
+            return None
+        scores = self._matrix @ np.asarray(query, dtype=np.float32)
+        position = int(scores.argmax())
+        return self._ids[position], float(scores[position])
+
+
+class SemanticCache:
+    """Nearest-neighbour cache from prompt embeddings to archived answers.
+
+    Vectors are unit-normalised, so cosine similarity is a dot product; with
+    numpy installed each domain is searched as one matrix-vector product.
+    Entries point at rows in the `logs` table rather than holding answers, and
+    the least recently used entry is evicted once `max_entries` is reached.
+    Only entries with the same `cache_scope` are compared.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 500,
+        threshold: float = 0.92,
+        domain_thresholds: Optional[Dict[str, float]] = None,
+    ) -> None:
+        self.max_entries = max(1, max_entries)
+        self.threshold = threshold
+        self.domain_thresholds = dict(domain_thresholds or {})
+        self._buckets: Dict[str, _DomainBucket] = {}
+        # Global recency order across buckets: log id -> bucket key.
+        self._order: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def threshold_for(self, domain: Optional[str]) -> float:
+        return self.domain_thresholds.get(domain or "", self.threshold)
+
+    def lookup(self, domain: Optional[str], vector: List[float], scope: str = "") -> Optional[Tuple[str, float]]:
+        key = f"{domain or ''}\n{scope}"
+        with self._lock:
+            bucket = self._buckets.get(key)
+            match = bucket.nearest(vector) if bucket is not None else None
+            if match is None or match[1] < self.threshold_for(domain):
+                return None
+            self._order.move_to_end(match[0])
+            return match
+
+    def add(self, domain: Optional[str], entry_id: str, vector: List[float], scope: str = "") -> int:
+        """Store a vector and return how many entries were evicted to make room."""
+
+        if not vector:
+            return 0
+        key = f"{domain or ''}\n{scope}"
+        evicted = 0
+        with self._lock:
+            bucket = self._buckets.setdefault(key, _DomainBucket())
+            bucket.vectors[entry_id] = vector
+            bucket.invalidate()
+            self._order[entry_id] = key
+            self._order.move_to_end(entry_id)
+            while len(self._order) > self.max_entries:
+                oldest_id, oldest_key = self._order.popitem(last=False)
+                self._discard(oldest_key, oldest_id)
+                evicted += 1
+        return evicted
+
+    def _discard(self, key: str, entry_id: str) -> None:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            return
+        bucket.vectors.pop(entry_id, None)
+        bucket.invalidate()
+        if not bucket.vectors:
+            del self._buckets[key]
+
+
+_CACHE: Optional[SemanticCache] = None
+
+
+def get_semantic_cache() -> Optional[SemanticCache]:
+    global _CACHE
+    settings = get_settings()
+    if not settings.semantic_cache:
+        return None
+    if _CACHE is None:
+        _CACHE = SemanticCache(
+            max_entries=settings.semantic_cache_size,
+            threshold=settings.semantic_cache_threshold,
+            domain_thresholds=settings.domain_thresholds(),
+        )
+    return _CACHE
+
+
+async def embed_prompt(text: str) -> List[float]:
+    settings = get_settings()
+    if settings.ai_backend == "ollama":
+        from backend.clients import ollama_client
+
+        vector = await ollama_client.embed(text, settings.ollama_embed_model)
+    else:
+        from backend.clients import openai_client
+
+        vector = await openai_client.embed(text, settings.openai_embed_model)
+    return normalise(vector)
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""Serve the backend on TCP, a Unix domain socket, or both.
+
+`uvicorn --uds` replaces the TCP listener; this entry point binds both
+sockets itself and hands them to uvicorn, so local clients can use the socket
+while remote ones keep using HOST:PORT.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import signal
+import socket
+import sys
+from pathlib import Path
+from typing import List
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import uvicorn
+from uvicorn.supervisors import Multiprocess
+
+from backend.config import get_settings
+
+
+def socket_in_use(path: Path) -> bool:
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(str(path))
+    except OSError:
+        return False
+    finally:
+        probe.close()
+    return True
+
+
+def bind_unix_socket(path: Path, mode: int) -> socket.socket:
+    """Bind `path` with permissions `mode`; only processes allowed by it can connect."""
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.exists():
+        if socket_in_use(path):
+            raise RuntimeError(f"Another backend is already serving {path}.")
+        # Left behind by a backend that did not shut down cleanly.
+        path.unlink()
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    # The umask applies at bind time, so the socket never exists with wider permissions.
+    previous = os.umask(0o777 & ~mode)
+    try:
+        sock.bind(str(path))
+    finally:
+        os.umask(previous)
+    os.chmod(path, mode)
+    sock.set_inheritable(True)
+    return sock
+
+
+def bind_tcp_socket(host: str, port: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    # An explicit IPPROTO_TCP matters: asyncio only sets TCP_NODELAY on accepted
+    # connections whose listener says so, and without it small responses wait
+    # ~40 ms on delayed ACKs.
+    sock = socket.socket(family, socket.SOCK_STREAM, socket.IPPROTO_TCP)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.set_inheritable(True)
+    logging.getLogger("uvicorn.error").info("Uvicorn running on http://%s:%d", host, port)
+    return sock
+
+
+def _exit_on_sigterm(signum, frame) -> None:
+    # uvicorn re-raises the signal after a graceful shutdown; exiting through
+    # SystemExit instead of the default handler lets main() remove the socket.
+    raise SystemExit(0)
+
+
+def main() -> int:
+    settings = get_settings()
+    socket_path = settings.socket_path()
+    config = uvicorn.Config("backend.backend:app", host=settings.host, port=settings.port, workers=settings.workers)
+    sockets: List[socket.socket] = []
+    if settings.backend_tcp or socket_path is None:
+        sockets.append(bind_tcp_socket(settings.host, settings.port))
+    if socket_path is not None:
+        sockets.append(bind_unix_socket(socket_path, int(settings.backend_socket_mode, 8)))
+        logging.getLogger("uvicorn.error").info("Uvicorn running on unix socket %s", socket_path)
+    server = uvicorn.Server(config)
+    signal.signal(signal.SIGTERM, _exit_on_sigterm)
+    try:
+        if settings.workers > 1:
+            Multiprocess(config, target=server.run, sockets=sockets).run()
+        else:
+            server.run(sockets=sockets)
+    finally:
+        for sock in sockets:
+            sock.close()
+        if socket_path is not None:
+            socket_path.unlink(missing_ok=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from backend.config import get_settings
+from backend.storage import get_recent_entries, get_relevant_entries
+
+HISTORY_HEADER = "Here is the recent conversation history between the user and assistant:\n"
+NOTES_HEADER = "Relevant notes extracted from the knowledge base:\n"
+REQUEST_HEADER = "Respond to the user's latest request while referencing prior context when helpful:\n"
+
+
+def resolve_domain(question_type: Optional[str]) -> Optional[str]:
+    domain = (question_type or "").strip() or None
+    if not domain:
+        domain = get_settings().question_domain or None
+    return domain
+
+
+def join_prompt(prompt: str, prefix: Optional[str] = None) -> str:
+    parts: List[str] = []
+    if prefix:
+        parts.append(prefix.strip())
+    parts.append(prompt.strip())
+    return "\n\n".join(part for part in parts if part)
+
+
+def select_history(prompt: str, domain: Optional[str]) -> List[Dict[str, str]]:
+    """Pick the exchanges worth resending with `prompt`, oldest first, within the character budget.
+
+    In relevance mode, earlier exchanges are ranked against the prompt through
+    the full-text index, limited to the same domain and the recency window.
+    The latest exchange is always kept when it is recent enough to be the
+    subject of a follow-up ("and the broadcast?").
+    """
+
+    settings = get_settings()
+    if settings.history_mode == "recent":
+        ranked = list(reversed(get_recent_entries(limit=settings.history_limit)))
+    else:
+        now = datetime.now(timezone.utc)
+        ranked = get_relevant_entries(
+            prompt,
+            domain=domain,
+            since=now - timedelta(hours=settings.history_window_hours),
+            limit=settings.history_limit,
+        )
+        latest = get_recent_entries(limit=1)
+        if latest and all(item["created_at"] != latest[0]["created_at"] for item in ranked):
+            age = now - datetime.fromisoformat(latest[0]["created_at"])
+            if age.total_seconds() <= settings.history_followup_seconds:
+                ranked.insert(0, latest[0])
+    return sorted(_within_budget(ranked, settings.history_budget_chars), key=lambda item: item["created_at"])
+
+
+def _within_budget(ranked: List[Dict[str, str]], budget: int) -> List[Dict[str, str]]:
+    kept: List[Dict[str, str]] = []
+    used = 0
+    for item in ranked:
+        size = len(item["prompt"]) + len(item["response"])
+        if used + size <= budget:
+            kept.append(item)
+            used += size
+    return kept
+
+
+def history_section(entries: List[Dict[str, str]]) -> str:
+    if not entries:
+        return ""
+    blocks = [f"User: {item['prompt'].strip()}\nAssistant: {item['response'].strip()}" for item in entries]
+    return HISTORY_HEADER + "\n\n".join(blocks) + "\n\n"
+
+
+def notes_section(snippets: List[str]) -> str:
+    if not snippets:
+        return ""
+    return NOTES_HEADER + "\n\n".join(snippets) + "\n\n"
+
+
+def prompt_body(history: str, notes: str, prompt: str) -> str:
+    return history + notes + REQUEST_HEADER + prompt.strip()
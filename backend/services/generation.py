@@ -1,5 +1,8 @@
 from __future__ import annotations
 
+import asyncio
+import logging
+import sqlite3
 import time
 import uuid
 from datetime import datetime, timezone
@@ -7,9 +10,17 @@ from typing import Dict, Optional, Tuple, List
 
 from fastapi import HTTPException
 
-from backend.clients import ollama_client, openai_client
 from backend.config import get_settings
-from backend.storage import LogEntry, persist
+from backend.prompts_loader import GenerationProfile
+from backend.ratelimit import KeyPolicy, get_scheduler
+from backend.semantic_cache import cache_scope, embed_prompt, get_semantic_cache
+from backend.services.solvers import solve
+from backend.storage import LogEntry, get_entry, persist, persist_many
+from backend.telemetry import increment
+from backend.tracing import add_span, span
+from backend.vision_cache import ImageHash, ImageHashError, VisionCache, VisionEntry, get_vision_cache, hash_images, prompt_key
+
+logger = logging.getLogger("backend.generation")
 
 
 def extract_final_answer(text: str) -> Optional[str]:
@@ -21,26 +32,45 @@ def extract_final_answer(text: str) -> Optional[str]:
     return final_line
 
 
+def resolve_model(model_override: Optional[str], vision: bool) -> str:
+    settings = get_settings()
+    if model_override:
+        return model_override
+    if settings.ai_backend == "ollama":
+        return settings.ollama_vision_model if vision else settings.ollama_model
+    return settings.openai_vision_model if vision else settings.openai_model
+
+
 async def invoke_llm(
     prompt: str,
     system_prompt: str,
     model_override: Optional[str],
     images: Optional[List[str]] = None,
+    profile: Optional[GenerationProfile] = None,
 ) -> Tuple[str, str]:
     settings = get_settings()
     backend = settings.ai_backend
     vision_active = bool(images) and settings.vision_enabled
+    model = resolve_model(model_override, vision_active)
     if backend == "ollama":
-        model = model_override or (settings.ollama_vision_model if vision_active else settings.ollama_model)
+        from backend.clients import ollama_client
+
         user_prompt = f"{system_prompt}\n\nUser:\n{prompt.strip()}\n"
-        return await ollama_client.generate(user_prompt, model, images=images if vision_active else None)
+        return await ollama_client.generate(
+            user_prompt,
+            model,
+            images=images if vision_active else None,
+            profile=profile,
+        )
     if backend == "openai_compatible":
-        model = model_override or (settings.openai_vision_model if vision_active else settings.openai_model)
+        from backend.clients import openai_client
+
         return await openai_client.generate(
             system_prompt,
             prompt.strip(),
             model,
             images=images if vision_active else None,
+            profile=profile,
         )
     raise HTTPException(status_code=500, detail=f"Unsupported backend '{backend}'")
 
@@ -70,6 +100,46 @@ async def archive_response(
     await persist(log_entry)
 
 
+async def archive_responses(
+    results: List[Dict], prompts: List[str], finished: List[datetime], domain: Optional[str]
+) -> None:
+    """Archive several answers in one write, each stamped with the time it finished."""
+
+    backend = get_settings().ai_backend
+    entries = [
+        LogEntry(
+            id=result["id"],
+            created_at=created_at,
+            backend=backend,
+            model=result["model"],
+            prompt=prompt,
+            response=result["response"],
+            final_answer=result["final_answer"],
+            elapsed_ms=result["elapsed_ms"],
+            domain=domain,
+        )
+        for result, prompt, created_at in zip(results, prompts, finished)
+    ]
+    await persist_many(entries)
+
+
+def _vision_lookup(
+    cache: VisionCache, images: List[str], key: str
+) -> Tuple[Optional[Tuple[ImageHash, ...]], Optional[Tuple[VisionEntry, int, str]]]:
+    try:
+        hashes = hash_images(images, get_settings().vision_cache_hash_width)
+    except ImageHashError as exc:
+        logger.warning("Vision cache skipped: %s", exc)
+        return None, None
+    if hashes is None:
+        return None, None
+    try:
+        return hashes, cache.lookup(key, hashes)
+    except sqlite3.Error as exc:
+        logger.warning("Vision cache lookup failed: %s", exc)
+        return hashes, None
+
+
 async def generate_response(
     *,
     prompt: str,
@@ -77,12 +147,93 @@ async def generate_response(
     domain: Optional[str],
     model_override: Optional[str],
     images: Optional[List[str]] = None,
+    question: Optional[str] = None,
+    profile: Optional[GenerationProfile] = None,
+    key_policy: Optional[KeyPolicy] = None,
 ) -> Dict:
     request_id = str(uuid.uuid4())
     started = time.perf_counter()
-    model_name, response_text = await invoke_llm(prompt, system_prompt, model_override, images=images)
+
+    if question and not images and get_settings().solvers_enabled:
+        solved = solve(domain, question)
+        if solved is not None:
+            increment(f"solver.{domain}")
+            return {
+                "id": request_id,
+                "model": f"solver:{domain}",
+                "response": solved,
+                "final_answer": extract_final_answer(solved),
+                "elapsed_ms": int((time.perf_counter() - started) * 1000),
+            }
+
+    # Only plain text prompts on the default model are comparable across requests.
+    cache = get_semantic_cache() if question and not images and not model_override else None
+    vector: List[float] = []
+    scope = ""
+    if cache is not None:
+        scope = cache_scope(question or "", system_prompt, profile)
+        with span("semantic_cache"):
+            vector = await _embed_for_cache(question or "")
+            cached = await _cached_answer(cache.lookup(domain, vector, scope)) if vector else None
+        if cached is not None:
+            increment("semantic_cache.hits")
+            return {
+                "id": request_id,
+                "model": cached["model"],
+                "response": cached["response"],
+                "final_answer": cached["final_answer"],
+                "elapsed_ms": int((time.perf_counter() - started) * 1000),
+                "cached_from": cached["id"],
+                "similarity": cached["similarity"],
+            }
+        increment("semantic_cache.misses")
+
+    vision_cache = get_vision_cache() if question and images else None
+    vision_key = ""
+    hashes: Optional[Tuple[ImageHash, ...]] = None
+    if vision_cache is not None:
+        vision_key = prompt_key(resolve_model(model_override, vision=True), question or "", domain, system_prompt)
+        with span("vision_cache"):
+            hashes, match = await asyncio.to_thread(_vision_lookup, vision_cache, images or [], vision_key)
+        if match is not None:
+            entry, distance, tier = match
+            increment("vision_cache.hits")
+            increment(f"vision_cache.{tier}_hits")
+            return {
+                "id": request_id,
+                "model": entry.model,
+                "response": entry.response,
+                "final_answer": entry.final_answer,
+                "elapsed_ms": int((time.perf_counter() - started) * 1000),
+                "cached_from": entry.id,
+                "image_distance": distance,
+            }
+        increment("vision_cache.misses" if hashes is not None else "vision_cache.errors")
+
+    # Solver and cache hits above never wait for an upstream slot.
+    queued = time.perf_counter()
+    async with get_scheduler().slot(key_policy):
+        add_span("queue", queued)
+        with span("upstream"):
+            model_name, response_text = await invoke_llm(
+                prompt,
+                system_prompt,
+                model_override,
+                images=images,
+                profile=profile,
+            )
     elapsed_ms = int((time.perf_counter() - started) * 1000)
     final_answer = extract_final_answer(response_text)
+    if cache is not None and vector:
+        evicted = cache.add(domain, request_id, vector, scope)
+        if evicted:
+            increment("semantic_cache.evictions", evicted)
+    if vision_cache is not None and hashes is not None:
+        entry = VisionEntry(request_id, vision_key, hashes, model_name, response_text, final_answer)
+        try:
+            await asyncio.to_thread(vision_cache.add, entry)
+        except sqlite3.Error as exc:
+            logger.warning("Vision cache write failed: %s", exc)
     return {
         "id": request_id,
         "model": model_name,
@@ -90,3 +241,24 @@ async def generate_response(
         "final_answer": final_answer,
         "elapsed_ms": elapsed_ms,
     }
+
+
+async def _embed_for_cache(text: str) -> List[float]:
+    import httpx
+
+    try:
+        return await embed_prompt(text)
+    except httpx.HTTPError as exc:
+        # A missing embedding model must not fail generation; the request just bypasses the cache.
+        logger.warning("Embedding request failed, skipping semantic cache: %s", exc)
+        increment("semantic_cache.errors")
+        return []
+
+
+async def _cached_answer(match: Optional[Tuple[str, float]]) -> Optional[Dict]:
+    if match is None:
+        return None
+    entry = await asyncio.to_thread(get_entry, match[0])
+    if entry is None:
+        return None
+    return {**entry, "similarity": round(match[1], 4)}
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+
+from backend.config import get_settings
+from backend.notes import IncrementalNotesQuery, gather_relevant_notes, incremental_notes_query
+from backend.services import context
+from backend.telemetry import increment
+
+logger = logging.getLogger("backend.prefetch")
+
+MAX_SESSIONS = 256
+
+
+@dataclass
+class PrefetchSession:
+    """Context gathered for a prompt the user is still typing."""
+
+    domain: Optional[str]
+    text: str = ""
+    history: Optional[str] = None
+    notes: Optional[str] = None
+    notes_query: Optional[IncrementalNotesQuery] = None
+    updated_at: float = field(default_factory=time.monotonic)
+
+
+class PrefetchCache:
+    """Short-lived sessions keyed by the listener's capture id.
+
+    Sessions expire after `ttl` seconds and are removed when `/generate`
+    consumes them. Each worker has its own cache; a `/generate` that lands on
+    a different worker than its prefetches simply gathers context itself.
+    """
+
+    def __init__(self, ttl: float) -> None:
+        self.ttl = ttl
+        self._sessions: Dict[str, PrefetchSession] = {}
+        self._lock = threading.Lock()
+
+    def session(self, session_id: str, domain: Optional[str]) -> PrefetchSession:
+        with self._lock:
+            self._prune()
+            current = self._sessions.get(session_id)
+            if current is None or current.domain != domain:
+                current = PrefetchSession(domain=domain, notes_query=incremental_notes_query())
+                self._sessions[session_id] = current
+                while len(self._sessions) > MAX_SESSIONS:
+                    self._sessions.pop(next(iter(self._sessions)))
+            current.updated_at = time.monotonic()
+            return current
+
+    def take(self, session_id: str) -> Optional[PrefetchSession]:
+        with self._lock:
+            self._prune()
+            return self._sessions.pop(session_id, None)
+
+    def _prune(self) -> None:
+        cutoff = time.monotonic() - self.ttl
+        for session_id in [key for key, value in self._sessions.items() if value.updated_at < cutoff]:
+            del self._sessions[session_id]
+
+
+_CACHE: Optional[PrefetchCache] = None
+_last_warm_up = 0.0
+
+
+def get_prefetch_cache() -> PrefetchCache:
+    global _CACHE
+    if _CACHE is None:
+        _CACHE = PrefetchCache(get_settings().prefetch_ttl_seconds)
+    return _CACHE
+
+
+def _warm_model(num_ctx: Optional[int]) -> bool:
+    """Start loading the default model in the background, at most once per interval."""
+
+    global _last_warm_up
+    settings = get_settings()
+    if settings.ai_backend != "ollama" or time.monotonic() - _last_warm_up < settings.prefetch_warm_interval:
+        return False
+    _last_warm_up = time.monotonic()
+
+    async def warm() -> None:
+        import httpx
+
+        from backend.clients import ollama_client
+
+        try:
+            await ollama_client.warm_up(settings.ollama_model, num_ctx=num_ctx)
+        except httpx.HTTPError as exc:
+            logger.warning("Prefetch warm-up failed: %s", exc)
+
+    asyncio.create_task(warm())
+    return True
+
+
+async def prefetch(session_id: str, text: str, domain: Optional[str], num_ctx: Optional[int]) -> Dict[str, object]:
+    """Warm the model and gather history and notes for the partial prompt `text`."""
+
+    started = time.perf_counter()
+    increment("prefetch.requests")
+    warming = _warm_model(num_ctx)
+    session = get_prefetch_cache().session(session_id, domain)
+    text = text.strip()
+    if text and text != session.text:
+        session.history = context.history_section(await asyncio.to_thread(context.select_history, text, domain))
+        if session.notes_query is not None:
+            session.notes_query.update(text)
+            session.notes = context.notes_section(session.notes_query.results())
+        else:
+            session.notes = context.notes_section(gather_relevant_notes(text))
+        session.text = text
+    return {
+        "session_id": session_id,
+        "warming": warming,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+    }
+
+
+def consume(session_id: str, prompt: str, domain: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """Return the (history, notes) sections prefetched for `prompt`, or None for each part that must be rebuilt.
+
+    Notes come from the incremental query brought up to date with the final
+    prompt, which only touches the terms typed since the last prefetch.
+    History ranking depends on the whole prompt in relevance mode, so it is
+    only reused when the prefetched text is the final prompt.
+    """
+
+    session = get_prefetch_cache().take(session_id)
+    if session is None or session.domain != domain or not session.text:
+        increment("prefetch.misses")
+        return None, None
+    prompt = prompt.strip()
+    history = session.history if session.text == prompt or get_settings().history_mode == "recent" else None
+    if session.text == prompt:
+        notes = session.notes
+    elif session.notes_query is not None:
+        session.notes_query.update(prompt)
+        notes = context.notes_section(session.notes_query.results())
+    else:
+        notes = None
+    reused = (history is not None) + (notes is not None)
+    increment({2: "prefetch.hits", 1: "prefetch.partial_hits", 0: "prefetch.misses"}[reused])
+    return history, notes
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import ipaddress
+import re
+from typing import Callable, Dict, List, Optional
+
+# A solver receives the user's question and returns a complete response in the
+# same shape the model is asked to produce (steps, then an "Answer:" line), or
+# None when the question is outside what it can answer exactly.
+Solver = Callable[[str], Optional[str]]
+
+SOLVERS: Dict[str, List[Solver]] = {}
+
+
+def register(domain: str) -> Callable[[Solver], Solver]:
+    def decorator(solver: Solver) -> Solver:
+        SOLVERS.setdefault(domain, []).append(solver)
+        return solver
+
+    return decorator
+
+
+def solve(domain: Optional[str], question: str) -> Optional[str]:
+    for solver in SOLVERS.get(domain or "", []):
+        try:
+            response = solver(question)
+        except ValueError:
+            response = None
+        if response:
+            return response
+    return None
+
+
+# Subnetting -----------------------------------------------------------------
+
+_OCTET = r"(?:25[0-5]|2[0-4]\d|1?\d?\d)"
+_ADDRESS = rf"{_OCTET}(?:\.{_OCTET}){{3}}"
+_CIDR = re.compile(rf"(?<![\d.])({_ADDRESS})\s*/\s*(3[0-2]|[12]?\d)(?![\d.])")
+_DOTTED = re.compile(rf"(?<![\d.])({_ADDRESS})(?![\d.])")
+# Questions about splitting, summarising or counting subnets need more than one network's arithmetic.
+_UNSUPPORTED = re.compile(
+    r"\b(vlsm|divide|split|summar\w*|supernet\w*|aggregat\w*|subnets|borrow\w*|ipv6|wildcard|"
+    r"next|previous|class|same)\b",
+    re.I,
+)
+# Yes/no questions ("Is 10.1.3.255 a usable host in ...?") are checks, not lookups.
+_YES_NO = re.compile(r"^\s*(is|are|can|does|do|will|would|could|should)\b", re.I)
+# What the question asks for; the solver answers only when it recognises at least one.
+_INTENTS = {
+    "network": re.compile(r"\b(network|subnet)\s+(address|id|number)\b|\bwhich\s+(network|subnet)\b", re.I),
+    "range": re.compile(
+        r"\b(first|last|lowest|highest)\s+(usable\s+|valid\s+)?(host|address|ip)\b|\b(host|address|ip|usable)\s+range\b",
+        re.I,
+    ),
+    "broadcast": re.compile(r"\bbroadcast\b", re.I),
+    "count": re.compile(
+        r"\bhow\s+many\s+(usable\s+|valid\s+)?(hosts|addresses|ips)\b|\bnumber\s+of\s+(usable\s+|valid\s+)?(hosts|addresses)\b",
+        re.I,
+    ),
+}
+
+
+def _parse_network(question: str) -> Optional[ipaddress.IPv4Interface]:
+    cidrs = _CIDR.findall(question)
+    if len(cidrs) == 1:
+        address, prefix = cidrs[0]
+        return ipaddress.IPv4Interface(f"{address}/{prefix}")
+    if cidrs:
+        return None
+    addresses = _DOTTED.findall(question)
+    masks = [value for value in addresses if _is_mask(value)]
+    hosts = [value for value in addresses if value not in masks]
+    if len(hosts) == 1 and len(masks) == 1:
+        return ipaddress.IPv4Interface(f"{hosts[0]}/{masks[0]}")
+    return None
+
+
+def _is_mask(value: str) -> bool:
+    bits = int(ipaddress.IPv4Address(value))
+    inverted = ~bits & 0xFFFFFFFF
+    return bits != 0 and inverted & (inverted + 1) == 0
+
+
+@register("subnetting")
+def solve_ipv4_subnet(question: str) -> Optional[str]:
+    if _UNSUPPORTED.search(question) or _YES_NO.search(question):
+        return None
+    intents = [name for name, pattern in _INTENTS.items() if pattern.search(question)]
+    if not intents:
+        return None
+    interface = _parse_network(question)
+    if interface is None:
+        return None
+    network = interface.network
+    prefix = network.prefixlen
+    if prefix == 32:
+        first = last = network.network_address
+        usable = 1
+    elif prefix == 31:
+        # RFC 3021 point-to-point links use both addresses.
+        first, last = network.network_address, network.broadcast_address
+        usable = 2
+    else:
+        first, last = network.network_address + 1, network.broadcast_address - 1
+        usable = network.num_addresses - 2
+    host_bits = 32 - prefix
+    answers = {
+        "network": f"network {network.network_address}/{prefix}",
+        "range": f"first host {first}/{prefix}, last host {last}/{prefix}",
+        "broadcast": f"broadcast {network.broadcast_address}/{prefix}",
+        "count": f"{usable} usable host{'s' if usable != 1 else ''}",
+    }
+    answer = ", ".join(answers[name] for name in intents)
+    return "\n".join(
+        [
+            f"1. {interface.ip}/{prefix} has a subnet mask of {network.netmask} "
+            f"({prefix} network bits, {host_bits} host bits).",
+            f"2. AND the address with the mask to get the network address: {network.network_address}.",
+            f"3. Set all {host_bits} host bits to 1 to get the broadcast address: {network.broadcast_address}.",
+            f"4. Usable hosts: {first} - {last} ({usable} address{'es' if usable != 1 else ''}).",
+            f"Answer: {answer[0].upper()}{answer[1:]}",
+        ]
+    )
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger("backend.startup")
+
+PROCESS_STARTED = time.perf_counter()
+
+
+@dataclass
+class StartupPhase:
+    name: str
+    required: bool
+    status: str = "pending"
+    started_ms: Optional[float] = None
+    duration_ms: Optional[float] = None
+    error: Optional[str] = None
+
+    def snapshot(self) -> Dict[str, object]:
+        return {
+            "name": self.name,
+            "required": self.required,
+            "status": self.status,
+            "started_ms": self.started_ms,
+            "duration_ms": self.duration_ms,
+            "error": self.error,
+        }
+
+
+class StartupTimeline:
+    """Runs deferred startup work in parallel and records when each phase ran.
+
+    Offsets are milliseconds since `backend.startup` was imported, which is the
+    first thing the app module does. Requests that need the required phases
+    await `wait_until_ready`; optional phases (warm-up, indexing) never block.
+    """
+
+    def __init__(self) -> None:
+        self.phases: List[StartupPhase] = []
+        self.serving_ms: Optional[float] = None
+        self.ready_ms: Optional[float] = None
+        self.completed_ms: Optional[float] = None
+        self._ready: Optional[asyncio.Event] = None
+        self._failed: Optional[str] = None
+
+    def _offset_ms(self) -> float:
+        return round((time.perf_counter() - PROCESS_STARTED) * 1000, 2)
+
+    def start(self, phases: List[tuple[str, bool, Callable[[], Awaitable[None]]]]) -> asyncio.Task:
+        self.serving_ms = self._offset_ms()
+        self._ready = asyncio.Event()
+        self.phases = [StartupPhase(name=name, required=required) for name, required, _ in phases]
+        runners = [runner for _, _, runner in phases]
+        return asyncio.create_task(self._run(runners))
+
+    async def _run(self, runners: List[Callable[[], Awaitable[None]]]) -> None:
+        required = [
+            self._run_phase(phase, runner) for phase, runner in zip(self.phases, runners) if phase.required
+        ]
+        optional = [
+            asyncio.create_task(self._run_phase(phase, runner))
+            for phase, runner in zip(self.phases, runners)
+            if not phase.required
+        ]
+        await asyncio.gather(*required)
+        failed = [phase for phase in self.phases if phase.required and phase.status == "failed"]
+        if failed:
+            self._failed = ", ".join(f"{phase.name}: {phase.error}" for phase in failed)
+        self.ready_ms = self._offset_ms()
+        assert self._ready is not None
+        self._ready.set()
+        logger.info("Backend ready in %.1f ms (%s)", self.ready_ms, self._failed or "all required phases ok")
+        await asyncio.gather(*optional)
+        self.completed_ms = self._offset_ms()
+
+    async def _run_phase(self, phase: StartupPhase, runner: Callable[[], Awaitable[None]]) -> None:
+        phase.status = "running"
+        phase.started_ms = self._offset_ms()
+        started = time.perf_counter()
+        try:
+            await runner()
+        except Exception as exc:
+            phase.status = "failed"
+            phase.error = str(exc) or exc.__class__.__name__
+            logger.warning("Startup phase '%s' failed: %s", phase.name, phase.error)
+        else:
+            phase.status = "done"
+        phase.duration_ms = round((time.perf_counter() - started) * 1000, 2)
+
+    @property
+    def ready(self) -> bool:
+        return self._ready is not None and self._ready.is_set() and self._failed is None
+
+    async def wait_until_ready(self) -> None:
+        if self._ready is None:
+            raise RuntimeError("Startup has not begun.")
+        await self._ready.wait()
+        if self._failed:
+            raise RuntimeError(f"Startup failed: {self._failed}")
+
+    def snapshot(self) -> Dict[str, object]:
+        return {
+            "ready": self.ready,
+            "serving_ms": self.serving_ms,
+            "ready_ms": self.ready_ms,
+            "completed_ms": self.completed_ms,
+            "phases": [phase.snapshot() for phase in self.phases],
+        }
+
+
+timeline = StartupTimeline()
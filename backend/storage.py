@@ -3,16 +3,22 @@ from __future__ import annotations
 import asyncio
 import json
 import logging
+import re
+import shutil
 import sqlite3
 from dataclasses import asdict, dataclass
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional, Tuple
+
+from backend.locking import file_lock
 
 BACKEND_ROOT = Path(__file__).resolve().parent
 DATA_DIR = BACKEND_ROOT / "data"
 LOG_FILE = DATA_DIR / "ai_output.jsonl"
 DB_PATH = DATA_DIR / "ai_logs.db"
+LOG_LOCK = DATA_DIR / "ai_output.lock"
+ARCHIVE_DIR = DATA_DIR / "archive"
 
 logger = logging.getLogger("backend.storage")
 
@@ -47,49 +53,194 @@ async def persist(entry: LogEntry) -> None:
     )
 
 
+async def persist_many(entries: List[LogEntry]) -> None:
+    """Archive a batch with one JSONL append and one SQLite transaction."""
+
+    if not entries:
+        return
+    await asyncio.gather(
+        asyncio.to_thread(_write_jsonl_many, entries),
+        asyncio.to_thread(_safe_write_sqlite_many, entries),
+    )
+
+
 def clear_logs() -> None:
     if LOG_FILE.exists():
         LOG_FILE.unlink()
-    if DB_PATH.exists():
-        DB_PATH.unlink()
+    for path in (DB_PATH, DB_PATH.with_name(DB_PATH.name + "-wal"), DB_PATH.with_name(DB_PATH.name + "-shm")):
+        if path.exists():
+            path.unlink()
+    if ARCHIVE_DIR.exists():
+        shutil.rmtree(ARCHIVE_DIR)
     ensure_data_paths()
 
 
+def connect() -> sqlite3.Connection:
+    # Workers share the database; wait for the write lock instead of failing with "database is locked".
+    return sqlite3.connect(DB_PATH, timeout=30.0)
+
+
 def get_recent_entries(limit: int = 5) -> list[dict[str, str]]:
     if not DB_PATH.exists():
         return []
     results: list[dict[str, str]] = []
-    with sqlite3.connect(DB_PATH) as connection:
+    with connect() as connection:
         connection.row_factory = sqlite3.Row
         rows = connection.execute(
-            "SELECT prompt, response FROM logs ORDER BY created_at DESC LIMIT ?",
+            "SELECT prompt, response, created_at FROM logs ORDER BY created_at DESC LIMIT ?",
             (limit,),
         ).fetchall()
         for row in reversed(rows):
-            results.append({"prompt": row["prompt"], "response": row["response"]})
+            results.append({"prompt": row["prompt"], "response": row["response"], "created_at": row["created_at"]})
     return results
 
 
-def _write_jsonl(entry: LogEntry) -> None:
+def get_relevant_entries(
+    text: str,
+    *,
+    domain: Optional[str],
+    since: datetime,
+    limit: int = 5,
+) -> list[dict[str, str]]:
+    """Best-matching exchanges in the same domain since `since`, most relevant first."""
+
+    terms = {term for term in re.findall(r"\w+", text.lower()) if len(term) > 1}
+    if not terms or not DB_PATH.exists():
+        return []
+    # Any shared word qualifies; BM25 ranks exchanges sharing rarer words higher.
+    match = " OR ".join(f'"{term}"' for term in sorted(terms))
+    with connect() as connection:
+        connection.row_factory = sqlite3.Row
+        try:
+            rows = connection.execute(
+                """
+                SELECT logs.prompt, logs.response, logs.created_at
+                FROM logs_fts JOIN logs ON logs.rowid = logs_fts.rowid
+                WHERE logs_fts MATCH ? AND logs.domain IS ? AND logs.created_at >= ?
+                ORDER BY bm25(logs_fts, 2.0, 1.0)
+                LIMIT ?
+                """,
+                (match, domain, _as_utc(since).isoformat(), limit),
+            ).fetchall()
+        except sqlite3.OperationalError as exc:
+            logger.warning("Relevant history lookup failed: %s", exc)
+            return []
+    return [dict(row) for row in rows]
+
+
+def get_entry(entry_id: str) -> Optional[dict[str, Optional[str]]]:
+    if not DB_PATH.exists():
+        return None
+    with connect() as connection:
+        connection.row_factory = sqlite3.Row
+        row = connection.execute(
+            "SELECT id, model, response, final_answer FROM logs WHERE id = ?",
+            (entry_id,),
+        ).fetchone()
+    return dict(row) if row else None
+
+
+class SearchUnavailable(RuntimeError):
+    """The SQLite build has no FTS5 or the history index has not been created."""
+
+
+def fts_query(text: str) -> str:
+    """Quote each word so free text never trips FTS5 query syntax; words are ANDed."""
+
+    terms = [term.replace('"', '""') for term in text.split()]
+    return " ".join(f'"{term}"' for term in terms if term.strip('"'))
+
+
+def search_entries(
+    query: str,
+    *,
+    domain: Optional[str] = None,
+    model: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = 20,
+    offset: int = 0,
+) -> Tuple[List[dict[str, object]], bool]:
+    """Return one page of ranked matches and whether another page follows."""
+
+    match = fts_query(query)
+    if not match or not DB_PATH.exists():
+        return [], False
+    clauses = ["logs_fts MATCH ?"]
+    params: List[object] = [match]
+    if domain:
+        clauses.append("logs.domain = ?")
+        params.append(domain)
+    if model:
+        clauses.append("logs.model = ?")
+        params.append(model)
+    if since:
+        clauses.append("logs.created_at >= ?")
+        params.append(_as_utc(since).isoformat())
+    if until:
+        clauses.append("logs.created_at < ?")
+        params.append(_as_utc(until).isoformat())
+    params.extend([limit + 1, offset])
+    sql = f"""
+        SELECT logs.id, logs.created_at, logs.domain, logs.model, logs.prompt, logs.final_answer,
+               snippet(logs_fts, -1, '<mark>', '</mark>', '…', 24) AS snippet,
+               bm25(logs_fts, 2.0, 1.0) AS score
+        FROM logs_fts JOIN logs ON logs.rowid = logs_fts.rowid
+        WHERE {" AND ".join(clauses)}
+        ORDER BY score
+        LIMIT ? OFFSET ?
+    """
+    with connect() as connection:
+        connection.row_factory = sqlite3.Row
+        try:
+            rows = connection.execute(sql, params).fetchall()
+        except sqlite3.OperationalError as exc:
+            if "no such table" in str(exc) or "no such module" in str(exc):
+                raise SearchUnavailable(str(exc)) from exc
+            raise
+    results = [{**dict(row), "score": round(-row["score"], 4)} for row in rows[:limit]]
+    return results, len(rows) > limit
+
+
+def _as_utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def _jsonl_line(entry: LogEntry) -> str:
     payload = asdict(entry)
     payload["created_at"] = entry.created_at.isoformat()
+    return json.dumps(payload, ensure_ascii=False) + "\n"
+
+
+def _write_jsonl(entry: LogEntry) -> None:
+    _write_jsonl_many([entry])
+
+
+def _write_jsonl_many(entries: List[LogEntry]) -> None:
     LOG_FILE.parent.mkdir(parents=True, exist_ok=True)
-    with LOG_FILE.open("a", encoding="utf-8") as stream:
-        stream.write(json.dumps(payload, ensure_ascii=False) + "\n")
+    lines = "".join(_jsonl_line(entry) for entry in entries)
+    with file_lock(LOG_LOCK), LOG_FILE.open("a", encoding="utf-8") as stream:
+        stream.write(lines)
 
 
 def _safe_write_sqlite(entry: LogEntry) -> None:
+    _safe_write_sqlite_many([entry])
+
+
+def _safe_write_sqlite_many(entries: List[LogEntry]) -> None:
     try:
-        _write_sqlite(entry)
+        _write_sqlite(entries)
     except sqlite3.OperationalError as exc:
         logger.warning("SQLite write failed (will continue with JSONL only): %s", exc)
     except sqlite3.DatabaseError as exc:  # pragma: no cover
         logger.warning("SQLite database error: %s", exc)
 
 
-def _write_sqlite(entry: LogEntry) -> None:
+def _write_sqlite(entries: List[LogEntry]) -> None:
     LOG_FILE.parent.mkdir(parents=True, exist_ok=True)
-    with sqlite3.connect(DB_PATH) as connection:
+    with connect() as connection:
         connection.execute(
             """
             CREATE TABLE IF NOT EXISTS logs (
@@ -105,9 +256,9 @@ def _write_sqlite(entry: LogEntry) -> None:
             )
             """
         )
-        connection.execute(
+        connection.executemany(
             """
-            INSERT OR REPLACE INTO logs (
+            INSERT INTO logs (
                 id,
                 created_at,
                 backend,
@@ -118,25 +269,40 @@ def _write_sqlite(entry: LogEntry) -> None:
                 elapsed_ms,
                 domain
             ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(id) DO UPDATE SET
+                created_at = excluded.created_at,
+                backend = excluded.backend,
+                model = excluded.model,
+                prompt = excluded.prompt,
+                response = excluded.response,
+                final_answer = excluded.final_answer,
+                elapsed_ms = excluded.elapsed_ms,
+                domain = excluded.domain
             """,
-            (
-                entry.id,
-                entry.created_at.isoformat(),
-                entry.backend,
-                entry.model,
-                entry.prompt,
-                entry.response,
-                entry.final_answer,
-                entry.elapsed_ms,
-                entry.domain,
-            ),
+            [
+                (
+                    entry.id,
+                    entry.created_at.isoformat(),
+                    entry.backend,
+                    entry.model,
+                    entry.prompt,
+                    entry.response,
+                    entry.final_answer,
+                    entry.elapsed_ms,
+                    entry.domain,
+                )
+                for entry in entries
+            ],
         )
         connection.commit()
 
 
 def _ensure_sqlite_schema() -> None:
     LOG_FILE.parent.mkdir(parents=True, exist_ok=True)
-    with sqlite3.connect(DB_PATH) as connection:
+    with connect() as connection:
+        # Lets retention hand freed pages back with `PRAGMA incremental_vacuum`; only applies to new files.
+        connection.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        connection.execute("PRAGMA journal_mode=WAL")
         connection.execute(
             """
             CREATE TABLE IF NOT EXISTS logs (
@@ -152,7 +318,39 @@ def _ensure_sqlite_schema() -> None:
             )
             """
         )
+        connection.execute("CREATE INDEX IF NOT EXISTS logs_created_at ON logs (created_at)")
         columns = {row[1] for row in connection.execute("PRAGMA table_info('logs')")}
         if "final_answer" not in columns:
             connection.execute("ALTER TABLE logs ADD COLUMN final_answer TEXT")
+        try:
+            _ensure_fts_schema(connection)
+        except sqlite3.OperationalError as exc:
+            logger.warning("SQLite FTS5 unavailable; history search disabled: %s", exc)
         connection.commit()
+
+
+def _ensure_fts_schema(connection: sqlite3.Connection) -> None:
+    # External-content index: the text lives once, in `logs`; triggers keep the index in step.
+    exists = connection.execute("SELECT 1 FROM sqlite_master WHERE name = 'logs_fts'").fetchone()
+    connection.executescript(
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS logs_fts USING fts5(
+            prompt, response, content='logs', content_rowid='rowid', tokenize='porter unicode61'
+        );
+        CREATE TRIGGER IF NOT EXISTS logs_fts_insert AFTER INSERT ON logs BEGIN
+            INSERT INTO logs_fts (rowid, prompt, response) VALUES (new.rowid, new.prompt, new.response);
+        END;
+        CREATE TRIGGER IF NOT EXISTS logs_fts_delete AFTER DELETE ON logs BEGIN
+            INSERT INTO logs_fts (logs_fts, rowid, prompt, response)
+            VALUES ('delete', old.rowid, old.prompt, old.response);
+        END;
+        CREATE TRIGGER IF NOT EXISTS logs_fts_update AFTER UPDATE OF prompt, response ON logs BEGIN
+            INSERT INTO logs_fts (logs_fts, rowid, prompt, response)
+            VALUES ('delete', old.rowid, old.prompt, old.response);
+            INSERT INTO logs_fts (rowid, prompt, response) VALUES (new.rowid, new.prompt, new.response);
+        END;
+        CREATE INDEX IF NOT EXISTS logs_domain_created_at ON logs (domain, created_at);
+        """
+    )
+    if not exists:
+        connection.execute("INSERT INTO logs_fts (logs_fts) VALUES ('rebuild')")
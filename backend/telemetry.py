@@ -1,22 +1,30 @@
 from __future__ import annotations
 
 import asyncio
+import json
 import logging
+import os
+import sqlite3
+import time
 from collections import deque
 from dataclasses import dataclass, field
 from datetime import datetime, timezone
-from typing import Deque, Dict, Optional
+from typing import Deque, Dict, List, Optional
 
-import psutil
+from backend.config import get_settings
+from backend.storage import DATA_DIR
 
 logger = logging.getLogger("backend.telemetry")
 
+TELEMETRY_DB = DATA_DIR / "telemetry.db"
+WORKER_STALE_SECONDS = 60.0
+
 
 @dataclass
 class RequestEvent:
     timestamp: datetime
     client_ip: str
-    api_key: str
+    key_id: str
     prompt_length: int
 
 
@@ -29,6 +37,7 @@ class TelemetryState:
     memory_percent: float = 0.0
     memory_used_mb: float = 0.0
     disk_percent: float = 0.0
+    counters: Dict[str, int] = field(default_factory=dict)
 
     def snapshot(self) -> Dict[str, object]:
         return {
@@ -38,7 +47,7 @@ class TelemetryState:
                 {
                     "timestamp": event.timestamp.isoformat(),
                     "client_ip": event.client_ip,
-                    "api_key": event.api_key,
+                    "key_id": event.key_id,
                     "prompt_length": event.prompt_length,
                 }
                 for event in list(self.events)
@@ -47,20 +56,44 @@ class TelemetryState:
             "memory_percent": self.memory_percent,
             "memory_used_mb": round(self.memory_used_mb, 2),
             "disk_percent": self.disk_percent,
+            "counters": dict(self.counters),
+            "hit_rates": hit_rates(self.counters),
         }
 
 
+def hit_rates(counters: Dict[str, int]) -> Dict[str, float]:
+    """Hit rate of every cache that counts `<name>.hits` and `<name>.misses`."""
+
+    rates: Dict[str, float] = {}
+    for name, hits in counters.items():
+        if not name.endswith(".hits"):
+            continue
+        prefix = name[: -len(".hits")]
+        lookups = hits + counters.get(f"{prefix}.misses", 0)
+        if lookups:
+            rates[prefix] = round(hits / lookups, 4)
+    return rates
+
+
 state = TelemetryState()
 
 
-def record_request(client_ip: str, api_key: str, prompt_length: int) -> None:
+def record_request(client_ip: str, key_id: str, prompt_length: int) -> None:
+    """Record a request; `key_id` is the hashed key id, never the key itself."""
+
     state.total_requests += 1
     state.last_request_at = datetime.now(timezone.utc)
-    state.events.append(RequestEvent(state.last_request_at, client_ip, api_key, prompt_length))
-    logger.info("Telemetry | request #%s from %s (key=%s) length=%s", state.total_requests, client_ip, api_key or "<none>", prompt_length)
+    state.events.append(RequestEvent(state.last_request_at, client_ip, key_id, prompt_length))
+    logger.info("Telemetry | request #%s from %s (key=%s) length=%s", state.total_requests, client_ip, key_id, prompt_length)
+
+
+def increment(name: str, amount: int = 1) -> None:
+    state.counters[name] = state.counters.get(name, 0) + amount
 
 
 async def monitor_resources(interval: float = 10.0) -> None:
+    import psutil
+
     process = psutil.Process()
     while True:
         try:
@@ -79,4 +112,96 @@ async def monitor_resources(interval: float = 10.0) -> None:
 
 
 def get_metrics() -> Dict[str, object]:
-    return state.snapshot()
+    if get_settings().workers <= 1:
+        return state.snapshot()
+    publish_snapshot()
+    return aggregate_snapshots(collect_snapshots())
+
+
+# Multi-worker aggregation ---------------------------------------------------
+#
+# With several uvicorn workers each process keeps its own `state`. Workers
+# publish their snapshot into a small SQLite table keyed by pid, and
+# `/telemetry` merges whatever rows were refreshed recently.
+
+
+def _connect_telemetry() -> sqlite3.Connection:
+    TELEMETRY_DB.parent.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(TELEMETRY_DB, timeout=10.0)
+    connection.execute(
+        """
+        CREATE TABLE IF NOT EXISTS worker_metrics (
+            pid INTEGER PRIMARY KEY,
+            updated_at REAL NOT NULL,
+            snapshot TEXT NOT NULL
+        )
+        """
+    )
+    return connection
+
+
+def publish_snapshot() -> None:
+    with _connect_telemetry() as connection:
+        connection.execute(
+            """
+            INSERT INTO worker_metrics (pid, updated_at, snapshot) VALUES (?, ?, ?)
+            ON CONFLICT(pid) DO UPDATE SET updated_at = excluded.updated_at, snapshot = excluded.snapshot
+            """,
+            (os.getpid(), time.time(), json.dumps(state.snapshot())),
+        )
+
+
+def collect_snapshots() -> List[Dict[str, object]]:
+    cutoff = time.time() - WORKER_STALE_SECONDS
+    with _connect_telemetry() as connection:
+        connection.execute("DELETE FROM worker_metrics WHERE updated_at < ?", (cutoff,))
+        rows = connection.execute("SELECT pid, updated_at, snapshot FROM worker_metrics ORDER BY updated_at").fetchall()
+    snapshots: List[Dict[str, object]] = []
+    for pid, updated_at, raw in rows:
+        snapshot = json.loads(raw)
+        snapshot["pid"] = pid
+        snapshot["updated_at"] = updated_at
+        snapshots.append(snapshot)
+    return snapshots
+
+
+def aggregate_snapshots(snapshots: List[Dict[str, object]]) -> Dict[str, object]:
+    if not snapshots:
+        return state.snapshot()
+    latest = snapshots[-1]
+    counters: Dict[str, int] = {}
+    events: List[Dict[str, object]] = []
+    for snapshot in snapshots:
+        for name, value in snapshot.get("counters", {}).items():
+            counters[name] = counters.get(name, 0) + value
+        events.extend(snapshot.get("recent_requests", []))
+    events.sort(key=lambda event: event["timestamp"])
+    last_seen = [snapshot["last_request_at"] for snapshot in snapshots if snapshot.get("last_request_at")]
+    return {
+        "total_requests": sum(snapshot.get("total_requests", 0) for snapshot in snapshots),
+        "last_request_at": max(last_seen) if last_seen else None,
+        "recent_requests": events[-state.events.maxlen :],
+        "cpu_percent": latest.get("cpu_percent", 0.0),
+        "memory_percent": latest.get("memory_percent", 0.0),
+        "memory_used_mb": latest.get("memory_used_mb", 0.0),
+        "disk_percent": latest.get("disk_percent", 0.0),
+        "counters": counters,
+        "hit_rates": hit_rates(counters),
+        "workers": [
+            {
+                "pid": snapshot["pid"],
+                "updated_at": datetime.fromtimestamp(snapshot["updated_at"], timezone.utc).isoformat(),
+                "total_requests": snapshot.get("total_requests", 0),
+            }
+            for snapshot in snapshots
+        ],
+    }
+
+
+async def publish_metrics(interval: float = 5.0) -> None:
+    while True:
+        try:
+            await asyncio.to_thread(publish_snapshot)
+        except sqlite3.Error as exc:  # pragma: no cover
+            logger.warning("Telemetry publish failed: %s", exc)
+        await asyncio.sleep(interval)
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from backend.config import get_settings
+from backend.fastjson import dumps
+from backend.locking import file_lock
+from backend.storage import DATA_DIR
+
+logger = logging.getLogger("backend.tracing")
+
+TRACE_HEADER = "x-trace-id"
+TRACE_FILE = DATA_DIR / "traces.jsonl"
+TRACE_LOCK = DATA_DIR / "traces.lock"
+_TRACE_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+Span = Tuple[str, float, float]
+
+
+class Trace:
+    """Stage timings of one request, as (name, offset ms, duration ms) from its arrival."""
+
+    def __init__(self, trace_id: str, path: str) -> None:
+        self.trace_id = trace_id
+        self.path = path
+        self.start_ns = time.time_ns()
+        self.origin = time.perf_counter()
+        self.spans: List[Span] = []
+
+    def add(self, name: str, started: float) -> None:
+        self.spans.append((name, (started - self.origin) * 1000, (time.perf_counter() - started) * 1000))
+
+    def server_timing(self) -> str:
+        return ", ".join(f"{name};dur={duration:.2f}" for name, _offset, duration in self.spans)
+
+    def record(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "source": "backend",
+            "path": self.path,
+            "start_ns": self.start_ns,
+            "spans": [[name, round(offset, 3), round(duration, 3)] for name, offset, duration in self.spans],
+        }
+
+
+_current: ContextVar[Optional[Trace]] = ContextVar("trace", default=None)
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Time the enclosed block as a stage of the current request, if it is traced."""
+
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(name, started)
+
+
+def add_span(name: str, started: float) -> None:
+    """Record a stage that began at `started` (a `time.perf_counter()` value) and ends now."""
+
+    trace = _current.get()
+    if trace is not None:
+        trace.add(name, started)
+
+
+def outgoing_headers() -> Dict[str, str]:
+    """Headers that carry the trace id to the upstream model server."""
+
+    trace = _current.get()
+    return {TRACE_HEADER: trace.trace_id} if trace is not None else {}
+
+
+def _append(record: Dict[str, Any]) -> None:
+    TRACE_FILE.parent.mkdir(parents=True, exist_ok=True)
+    with file_lock(TRACE_LOCK), TRACE_FILE.open("ab") as stream:
+        stream.write(dumps(record) + b"\n")
+
+
+class TracingMiddleware:
+    """Traces requests that carry an `x-trace-id` header.
+
+    Stages timed with `span()` during the request are returned in a
+    `Server-Timing` header and appended to `data/traces.jsonl` once the
+    response has been sent. Untraced requests pay only the header lookup.
+    """
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http" or not get_settings().tracing_enabled:
+            await self.app(scope, receive, send)
+            return
+        trace_id = next(
+            (value.decode("latin-1") for key, value in scope.get("headers", []) if key == TRACE_HEADER.encode()),
+            None,
+        )
+        if trace_id is None or not _TRACE_ID.match(trace_id):
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace(trace_id, scope.get("path", ""))
+        token = _current.set(trace)
+
+        async def send_with_timing(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                trace.add("total", trace.origin)
+                headers = [*message.get("headers", []), (b"server-timing", trace.server_timing().encode("latin-1"))]
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+        try:
+            await asyncio.to_thread(_append, trace.record())
+        except OSError as exc:
+            logger.warning("Could not write trace %s: %s", trace_id, exc)
@@ -0,0 +1,325 @@
+from __future__ import annotations
+
+import base64
+import binascii
+import hashlib
+import io
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from backend.config import get_settings
+from backend.storage import DATA_DIR
+
+logger = logging.getLogger("backend.vision_cache")
+
+VISION_CACHE_DB = DATA_DIR / "vision_cache.db"
+# Brightness steps two neighbouring cells must differ by to set a bit; keeps
+# compression noise in flat regions from flipping bits.
+GRADIENT_THRESHOLD = 8
+
+_warned_missing_pillow = False
+
+
+class ImageHashError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class ImageHash:
+    """Difference hash of one image: a bit per horizontal gradient cell.
+
+    `digest` is a SHA-256 of the decoded pixels, used when only identical
+    images may match.
+    """
+
+    width: int
+    height: int
+    bits: int
+    digest: str = ""
+
+    @property
+    def shape(self) -> str:
+        return f"{self.width}x{self.height}"
+
+    def distance(self, other: "ImageHash") -> int:
+        # bin().count() rather than int.bit_count(), which needs Python 3.10.
+        return bin(self.bits ^ other.bits).count("1")
+
+
+def _decode(data: bytes):
+    from PIL import Image
+
+    try:
+        image = Image.open(io.BytesIO(data))
+        image.load()
+    except (OSError, Image.DecompressionBombError) as exc:
+        raise ImageHashError(f"Unreadable image: {exc}") from exc
+    return image
+
+
+def _pixel_digest(image) -> str:
+    digest = hashlib.sha256(f"{image.mode} {image.width}x{image.height}\n".encode("ascii"))
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+def _preprocess(image, width: int):
+    from PIL import Image
+
+    height = max(1, round(width * image.height / max(1, image.width)))
+    # BOX averaging over a fixed grid makes the hash independent of resolution
+    # and smooths anti-aliasing, cursor blink and JPEG noise.
+    return image.convert("L").resize((width + 1, height), Image.Resampling.BOX)
+
+
+def perceptual_hash(data: bytes, width: int = 256) -> ImageHash:
+    from PIL import ImageChops
+
+    image = _decode(data)
+    grey = _preprocess(image, width)
+    left = grey.crop((0, 0, width, grey.height))
+    right = grey.crop((1, 0, width + 1, grey.height))
+    # subtract() clips at zero, so this keeps only "right is brighter" steps.
+    rising = ImageChops.subtract(right, left).point(lambda value: 255 if value > GRADIENT_THRESHOLD else 0)
+    packed = rising.convert("1").tobytes()
+    return ImageHash(
+        width=width, height=grey.height, bits=int.from_bytes(packed, "big"), digest=_pixel_digest(image)
+    )
+
+
+def hash_images(images: List[str], width: int) -> Optional[Tuple[ImageHash, ...]]:
+    """Hash base64 images, or return None when Pillow is not installed."""
+
+    global _warned_missing_pillow
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        if not _warned_missing_pillow:
+            logger.warning("Pillow is not installed; the vision cache is disabled.")
+            _warned_missing_pillow = True
+        return None
+    hashes = []
+    for encoded in images:
+        try:
+            data = base64.b64decode(encoded, validate=True)
+        except (binascii.Error, ValueError) as exc:
+            raise ImageHashError(f"Invalid base64 image: {exc}") from exc
+        hashes.append(perceptual_hash(data, width))
+    return tuple(hashes)
+
+
+def prompt_key(model: str, question: str, domain: Optional[str] = None, system_prompt: str = "") -> str:
+    """Cache key for everything besides the images that shapes the answer.
+
+    The system prompt is part of it, so editing the prompt files or switching
+    domain never serves an answer written under different instructions.
+    """
+
+    text = f"{model}\n{domain or ''}\n{system_prompt}\n{question.strip()}"
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class VisionEntry:
+    id: str
+    key: str
+    hashes: Tuple[ImageHash, ...]
+    model: str
+    response: str
+    final_answer: Optional[str]
+
+    @property
+    def shape(self) -> str:
+        return ",".join(image_hash.shape for image_hash in self.hashes)
+
+    @property
+    def digests(self) -> str:
+        return ",".join(image_hash.digest for image_hash in self.hashes)
+
+
+def _same_pixels(left: Tuple[ImageHash, ...], right: Tuple[ImageHash, ...]) -> bool:
+    return len(left) == len(right) and all(a.digest and a.digest == b.digest for a, b in zip(left, right))
+
+
+def _distance(left: Tuple[ImageHash, ...], right: Tuple[ImageHash, ...]) -> Optional[int]:
+    """Largest per-image distance, or None when the image sets are not comparable."""
+
+    if len(left) != len(right) or any(a.shape != b.shape for a, b in zip(left, right)):
+        return None
+    return max(a.distance(b) for a, b in zip(left, right))
+
+
+class VisionCache:
+    """Answers to image prompts keyed by perceptual hash, prompt and model.
+
+    A small in-memory LRU sits in front of a SQLite table that survives
+    restarts and is shared by workers. With `max_distance` 0 (the default) a
+    lookup matches only images with identical pixels. A one-digit change in a
+    screenshot can leave the difference hash unchanged, so the hash alone
+    cannot tell it apart from a re-capture. With a positive `max_distance`,
+    every image only has to be within that many bits of the stored hash.
+    Re-captures with JPEG noise or a blinking cursor then hit, at the risk of
+    serving the answer to a slightly different question.
+    """
+
+    def __init__(self, max_entries: int = 200, disk_entries: int = 2000, max_distance: int = 0) -> None:
+        self.max_entries = max(1, max_entries)
+        self.disk_entries = max(self.max_entries, disk_entries)
+        self.max_distance = max(0, max_distance)
+        self._entries: "OrderedDict[str, VisionEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def lookup(self, key: str, hashes: Tuple[ImageHash, ...]) -> Optional[Tuple[VisionEntry, int, str]]:
+        """Return (entry, distance, tier) for the closest match within tolerance."""
+
+        with self._lock:
+            match = self._closest((entry for entry in self._entries.values() if entry.key == key), hashes)
+            if match is not None:
+                self._entries.move_to_end(match[0].id)
+                return match[0], match[1], "memory"
+        match = self._closest(self._load(key, ",".join(image_hash.shape for image_hash in hashes)), hashes)
+        if match is None:
+            return None
+        self._remember(match[0])
+        self._touch(match[0].id)
+        return match[0], match[1], "disk"
+
+    def add(self, entry: VisionEntry) -> None:
+        self._remember(entry)
+        with self._connect() as connection:
+            connection.execute(
+                """
+                INSERT OR REPLACE INTO vision_cache
+                    (id, key, shape, hashes, digests, model, response, final_answer, last_used)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    entry.id,
+                    entry.key,
+                    entry.shape,
+                    b"".join(_hash_bytes(image_hash) for image_hash in entry.hashes),
+                    entry.digests,
+                    entry.model,
+                    entry.response,
+                    entry.final_answer,
+                    time.time(),
+                ),
+            )
+            connection.execute(
+                "DELETE FROM vision_cache WHERE id NOT IN (SELECT id FROM vision_cache ORDER BY last_used DESC LIMIT ?)",
+                (self.disk_entries,),
+            )
+
+    def _closest(self, entries, hashes: Tuple[ImageHash, ...]) -> Optional[Tuple[VisionEntry, int]]:
+        best: Optional[Tuple[VisionEntry, int]] = None
+        for entry in entries:
+            if self.max_distance == 0 and not _same_pixels(entry.hashes, hashes):
+                continue
+            distance = _distance(entry.hashes, hashes)
+            if distance is not None and distance <= self.max_distance and (best is None or distance < best[1]):
+                best = (entry, distance)
+        return best
+
+    def _remember(self, entry: VisionEntry) -> None:
+        with self._lock:
+            self._entries[entry.id] = entry
+            self._entries.move_to_end(entry.id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _connect(self) -> sqlite3.Connection:
+        VISION_CACHE_DB.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(VISION_CACHE_DB, timeout=10.0)
+        connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS vision_cache (
+                id TEXT PRIMARY KEY,
+                key TEXT NOT NULL,
+                shape TEXT NOT NULL,
+                hashes BLOB NOT NULL,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                final_answer TEXT,
+                last_used REAL NOT NULL,
+                digests TEXT NOT NULL DEFAULT ''
+            )
+            """
+        )
+        columns = {row[1] for row in connection.execute("PRAGMA table_info('vision_cache')")}
+        if "digests" not in columns:
+            connection.execute("ALTER TABLE vision_cache ADD COLUMN digests TEXT NOT NULL DEFAULT ''")
+        connection.execute("CREATE INDEX IF NOT EXISTS vision_cache_key ON vision_cache(key, shape)")
+        return connection
+
+    def _load(self, key: str, shape: str) -> List[VisionEntry]:
+        if not VISION_CACHE_DB.exists():
+            return []
+        with self._connect() as connection:
+            rows = connection.execute(
+                "SELECT id, hashes, digests, model, response, final_answer FROM vision_cache "
+                "WHERE key = ? AND shape = ?",
+                (key, shape),
+            ).fetchall()
+        return [
+            VisionEntry(
+                id=entry_id,
+                key=key,
+                hashes=_split_hashes(blob, shape, digests),
+                model=model,
+                response=response,
+                final_answer=final_answer,
+            )
+            for entry_id, blob, digests, model, response, final_answer in rows
+        ]
+
+    def _touch(self, entry_id: str) -> None:
+        with self._connect() as connection:
+            connection.execute("UPDATE vision_cache SET last_used = ? WHERE id = ?", (time.time(), entry_id))
+
+
+def _hash_size(width: int, height: int) -> int:
+    # Pillow pads each row of a 1-bit image to a whole byte.
+    return (width + 7) // 8 * height
+
+
+def _hash_bytes(image_hash: ImageHash) -> bytes:
+    return image_hash.bits.to_bytes(_hash_size(image_hash.width, image_hash.height), "big")
+
+
+def _split_hashes(blob: bytes, shape: str, digests: str = "") -> Tuple[ImageHash, ...]:
+    hashes = []
+    offset = 0
+    items = shape.split(",")
+    # Rows written before pixel digests were stored have none; they never match exactly.
+    digest_list = digests.split(",") if digests else [""] * len(items)
+    for item, digest in zip(items, digest_list):
+        width, height = (int(value) for value in item.split("x"))
+        size = _hash_size(width, height)
+        hashes.append(ImageHash(width, height, int.from_bytes(blob[offset : offset + size], "big"), digest))
+        offset += size
+    return tuple(hashes)
+
+
+_CACHE: Optional[VisionCache] = None
+
+
+def get_vision_cache() -> Optional[VisionCache]:
+    global _CACHE
+    settings = get_settings()
+    if not settings.vision_cache or not settings.vision_enabled:
+        return None
+    if _CACHE is None:
+        _CACHE = VisionCache(
+            max_entries=settings.vision_cache_size,
+            disk_entries=settings.vision_cache_disk_entries,
+            max_distance=settings.vision_cache_distance,
+        )
+    return _CACHE
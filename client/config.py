@@ -1,12 +1,16 @@
 from __future__ import annotations
 
+import socket
 from dataclasses import dataclass
 from pathlib import Path
+from typing import Optional
 
 from dotenv import dotenv_values
 
 ROOT = Path(__file__).resolve().parents[1]
 ENV_FILE = ROOT / ".env"
+DATA_DIR = ROOT / "client" / "data"
+OUTBOX_FILE = DATA_DIR / "outbox.db"
 
 
 def _bool(value: str | None, default: bool = False) -> bool:
@@ -29,10 +33,18 @@ def _int(value: str | None, default: int) -> int:
         return default
 
 
+def _socket_path(value: str | None) -> Optional[Path]:
+    if not value or not value.strip() or not hasattr(socket, "AF_UNIX"):
+        return None
+    path = Path(value.strip())
+    return path if path.is_absolute() else ROOT / path
+
+
 @dataclass(frozen=True)
 class ClientConfig:
     host: str
     port: int
+    socket_path: Optional[Path]
     api_key: str
     start_key: str
     exit_key: str
@@ -44,6 +56,15 @@ class ClientConfig:
     overlay_duration: float
     overlay_opacity: float
     overlay_width: int
+    max_concurrency: int
+    cancel_on_new_prompt: bool
+    request_timeout: float
+    outbox_enabled: bool
+    outbox_max_entries: int
+    outbox_batch_size: int
+    prefetch_enabled: bool
+    prefetch_debounce: float
+    tracing_enabled: bool
 
 
 def load_client_config() -> ClientConfig:
@@ -51,6 +72,7 @@ def load_client_config() -> ClientConfig:
     return ClientConfig(
         host=data.get("HOST", "127.0.0.1"),
         port=_int(data.get("PORT"), 8000),
+        socket_path=_socket_path(data.get("BACKEND_SOCKET")),
         api_key=data.get("API_KEY", "local-dev-key"),
         start_key=data.get("START_KEY", "`"),
         exit_key=data.get("EXIT_KEY", "ESC"),
@@ -62,4 +84,13 @@ def load_client_config() -> ClientConfig:
         overlay_duration=_float(data.get("OVERLAY_DURATION"), 15.0),
         overlay_opacity=_float(data.get("OVERLAY_OPACITY"), 0.9),
         overlay_width=_int(data.get("OVERLAY_WIDTH"), 480),
+        max_concurrency=_int(data.get("CLIENT_CONCURRENCY"), 2),
+        cancel_on_new_prompt=_bool(data.get("CANCEL_ON_NEW_PROMPT"), False),
+        request_timeout=_float(data.get("REQUEST_TIMEOUT"), 60.0),
+        outbox_enabled=_bool(data.get("OUTBOX_ENABLED"), True),
+        outbox_max_entries=_int(data.get("OUTBOX_MAX_ENTRIES"), 50),
+        outbox_batch_size=_int(data.get("OUTBOX_BATCH_SIZE"), 5),
+        prefetch_enabled=_bool(data.get("PREFETCH_ENABLED"), True),
+        prefetch_debounce=_float(data.get("PREFETCH_DEBOUNCE"), 0.3),
+        tracing_enabled=_bool(data.get("TRACING_ENABLED"), False),
     )
@@ -0,0 +1,368 @@
+from __future__ import annotations
+
+import asyncio
+import itertools
+import json
+import random
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from client.config import OUTBOX_FILE, ClientConfig
+from client.outbox import Outbox
+from client.tracing import TRACE_HEADER, ClientTrace, write_trace
+
+ResultHandler = Callable[[int, dict, Optional[ClientTrace]], None]
+
+# Only "still starting"; a 502 means the model call itself failed, and resending repeats it.
+RETRYABLE_STATUS = {503}
+# While the user keeps typing, still prefetch at least this often.
+PREFETCH_MAX_WAIT = 1.0
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 30.0
+MAX_DELIVERY_ATTEMPTS = 10
+
+
+def _backoff(attempts: int) -> float:
+    """Jittered exponential delay before retrying an entry that has failed `attempts` times."""
+
+    ceiling = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2**attempts)
+    return random.uniform(ceiling / 2, ceiling)
+
+
+class BackendUnavailable(Exception):
+    """The backend answered, but only to say it cannot serve the request yet."""
+
+
+class RequestDispatcher:
+    """Sends payloads to the backend concurrently from a private event loop.
+
+    At most `config.max_concurrency` requests are in flight; the rest wait on a
+    semaphore. Every request runs as its own task, so results are handed to
+    `on_result` in completion order and any request can be cancelled, which
+    closes its HTTP connection. Requests submitted as `supersedable` (typed
+    prompts) are the ones `cancel_superseded` drops when a new capture starts.
+
+    Requests that fail because the backend is unreachable or still starting go
+    to the durable outbox. The drain task probes `/status` with jittered
+    exponential backoff and resubmits queued payloads in batches once the
+    backend is healthy again.
+    """
+
+    def __init__(self, config: ClientConfig, on_result: ResultHandler) -> None:
+        self.config = config
+        self._on_result = on_result
+        self._ids = itertools.count(1)
+        self._tasks: Dict[int, asyncio.Task] = {}
+        self._supersedable: set[int] = set()
+        self._superseded: set[int] = set()
+        self.outbox: Optional[Outbox] = (
+            Outbox(OUTBOX_FILE, config.outbox_max_entries) if config.outbox_enabled else None
+        )
+        self._outbox_in_flight: set[int] = set()
+        self._outbox_wake: Optional[asyncio.Event] = None
+        # Debounced prefetches by session id: (timer, time the first pending update arrived).
+        self._prefetch_timers: Dict[str, Tuple[asyncio.TimerHandle, float]] = {}
+        self._loop = asyncio.new_event_loop()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="dispatcher", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+
+    @property
+    def base_url(self) -> str:
+        if self.config.socket_path is not None:
+            # The transport connects to the socket; the host only fills the Host header.
+            return "http://localhost"
+        return f"http://{self.config.host}:{self.config.port}"
+
+    @property
+    def url(self) -> str:
+        return f"{self.base_url}/generate"
+
+    def submit(self, payload: dict, trace: Optional[ClientTrace] = None, supersedable: bool = False) -> int:
+        request_id = next(self._ids)
+        self._loop.call_soon_threadsafe(self._start, request_id, payload, None, trace, supersedable)
+        return request_id
+
+    def prefetch(self, session_id: str, text: str) -> None:
+        """Tell the backend what the user has typed so far (debounced, best effort)."""
+
+        if self.config.prefetch_enabled:
+            self._loop.call_soon_threadsafe(self._schedule_prefetch, session_id, text)
+
+    def cancel_superseded(self) -> None:
+        """Cancel in-flight typed prompts without waiting; clipboard and screenshot requests keep running."""
+
+        self._loop.call_soon_threadsafe(self._cancel_superseded)
+
+    def cancel_pending(self) -> int:
+        future = asyncio.run_coroutine_threadsafe(self._cancel_all(), self._loop)
+        return future.result(timeout=5)
+
+    def in_flight(self) -> int:
+        return len(self._tasks)
+
+    def close(self) -> None:
+        if not self._loop.is_running():
+            return
+        try:
+            self.cancel_pending()
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+
+    # Event loop side ------------------------------------------------------
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self._loop)
+        self._semaphore = asyncio.Semaphore(max(1, self.config.max_concurrency))
+        transport = (
+            httpx.AsyncHTTPTransport(uds=str(self.config.socket_path)) if self.config.socket_path is not None else None
+        )
+        self._client = httpx.AsyncClient(
+            timeout=httpx.Timeout(10.0, read=self.config.request_timeout),
+            transport=transport,
+        )
+        self._ready.set()
+        drain: Optional[asyncio.Task] = None
+        if self.outbox is not None:
+            self._outbox_wake = asyncio.Event()
+            drain = self._loop.create_task(self._drain_outbox())
+            if len(self.outbox):
+                print(f"[client] {len(self.outbox)} queued request(s) from a previous session will be resent.")
+                self._outbox_wake.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            if drain is not None:
+                drain.cancel()
+                self._loop.run_until_complete(asyncio.gather(drain, return_exceptions=True))
+            self._loop.run_until_complete(self._client.aclose())
+            if self.outbox is not None:
+                self.outbox.close()
+            self._loop.close()
+
+    def _start(
+        self,
+        request_id: int,
+        payload: dict,
+        outbox_id: Optional[int] = None,
+        trace: Optional[ClientTrace] = None,
+        supersedable: bool = False,
+    ) -> asyncio.Task:
+        self._drop_prefetch(payload.get("session_id"))
+        task = self._loop.create_task(self._process(request_id, payload, outbox_id, trace))
+        self._tasks[request_id] = task
+        if supersedable:
+            self._supersedable.add(request_id)
+        task.add_done_callback(lambda _task: self._forget(request_id))
+        return task
+
+    def _forget(self, request_id: int) -> None:
+        self._tasks.pop(request_id, None)
+        self._supersedable.discard(request_id)
+        self._superseded.discard(request_id)
+
+    def _cancel_superseded(self) -> None:
+        superseded = [
+            request_id
+            for request_id in self._supersedable
+            if request_id in self._tasks and not self._tasks[request_id].done()
+        ]
+        self._superseded.update(superseded)
+        tasks = [self._tasks[request_id] for request_id in superseded]
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            print(f"[client] Cancelled {len(tasks)} stale request(s).")
+
+    async def _cancel_all(self) -> int:
+        tasks = [task for task in self._tasks.values() if not task.done()]
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        return len(tasks)
+
+    async def _process(
+        self,
+        request_id: int,
+        payload: dict,
+        outbox_id: Optional[int] = None,
+        trace: Optional[ClientTrace] = None,
+    ) -> bool:
+        """Send one payload; returns True when the backend answered it."""
+
+        assert self._semaphore is not None and self._client is not None
+        headers = {"x-api-key": self.config.api_key, "content-type": "application/json"}
+        body = json.dumps(payload).encode("utf-8")
+        if trace is not None:
+            headers[TRACE_HEADER] = trace.trace_id
+            trace.mark("encoded")
+        try:
+            async with self._semaphore:
+                if trace is not None:
+                    trace.mark("sent")
+                async with self._client.stream("POST", self.url, content=body, headers=headers) as response:
+                    if trace is not None:
+                        trace.mark("first_byte")
+                    await response.aread()
+                if trace is not None:
+                    trace.mark("last_byte")
+                    trace.server_timing = response.headers.get("server-timing")
+                if response.status_code in RETRYABLE_STATUS and self.outbox is not None:
+                    raise BackendUnavailable(f"HTTP {response.status_code}")
+                response.raise_for_status()
+                data = response.json()
+        except asyncio.CancelledError:
+            print(f"[client] Request #{request_id} cancelled.")
+            if request_id in self._superseded:
+                self._settle(outbox_id)
+            elif outbox_id is not None:
+                # Cancelled by shutdown: the entry stays queued for the next start.
+                self._outbox_in_flight.discard(outbox_id)
+            raise
+        except (httpx.ConnectError, httpx.ConnectTimeout, httpx.RemoteProtocolError, BackendUnavailable) as exc:
+            if self.outbox is None:
+                print(f"[error] Request #{request_id} failed: {exc}")
+                return False
+            self._defer(request_id, payload, outbox_id, exc)
+            return False
+        except httpx.HTTPError as exc:
+            print(f"[error] Request #{request_id} failed: {exc}")
+            self._settle(outbox_id)
+            return False
+        except ValueError:
+            print("[error] Backend returned invalid JSON.")
+            self._settle(outbox_id)
+            return False
+        self._settle(outbox_id)
+        await asyncio.to_thread(self._deliver, request_id, data, trace)
+        return True
+
+    def _deliver(self, request_id: int, data: dict, trace: Optional[ClientTrace]) -> None:
+        self._on_result(request_id, data, trace)
+        if trace is not None:
+            trace.mark("handled")
+            write_trace(trace.record())
+
+    # Prefetch -------------------------------------------------------------
+
+    def _schedule_prefetch(self, session_id: str, text: str) -> None:
+        if not text:
+            # Capture just started: go out at once so the model starts loading.
+            self._drop_prefetch(session_id)
+            self._fire_prefetch(session_id, text)
+            return
+        now = self._loop.time()
+        first = now
+        pending = self._prefetch_timers.pop(session_id, None)
+        if pending is not None:
+            pending[0].cancel()
+            first = pending[1]
+        delay = max(0.0, min(self.config.prefetch_debounce, first + PREFETCH_MAX_WAIT - now))
+        handle = self._loop.call_later(delay, self._fire_prefetch, session_id, text)
+        self._prefetch_timers[session_id] = (handle, first)
+
+    def _drop_prefetch(self, session_id: Optional[str]) -> None:
+        pending = self._prefetch_timers.pop(session_id, None) if session_id else None
+        if pending is not None:
+            pending[0].cancel()
+
+    def _fire_prefetch(self, session_id: str, text: str) -> None:
+        self._prefetch_timers.pop(session_id, None)
+        self._loop.create_task(self._send_prefetch(session_id, text))
+
+    async def _send_prefetch(self, session_id: str, text: str) -> None:
+        assert self._client is not None
+        payload: dict = {"session_id": session_id, "text": text}
+        if self.config.question_domain:
+            payload["context"] = {"question_type": self.config.question_domain}
+        try:
+            # Not behind the semaphore: a prefetch must never wait for generations.
+            await self._client.post(
+                f"{self.base_url}/prefetch",
+                json=payload,
+                headers={"x-api-key": self.config.api_key},
+                timeout=5.0,
+            )
+        except httpx.HTTPError:
+            pass
+
+    # Outbox ---------------------------------------------------------------
+
+    def _settle(self, outbox_id: Optional[int]) -> None:
+        if outbox_id is None or self.outbox is None:
+            return
+        self.outbox.remove(outbox_id)
+        self._outbox_in_flight.discard(outbox_id)
+
+    def _defer(self, request_id: int, payload: dict, outbox_id: Optional[int], exc: Exception) -> None:
+        assert self.outbox is not None and self._outbox_wake is not None
+        if outbox_id is None:
+            evicted = self.outbox.add(payload)
+            print(
+                f"[client] Backend unavailable ({exc}); request #{request_id} saved to the outbox "
+                f"({len(self.outbox)} pending)."
+            )
+            if evicted:
+                print(f"[client] Outbox full; dropped {evicted} oldest request(s).")
+        else:
+            self._outbox_in_flight.discard(outbox_id)
+            attempts = self.outbox.record_attempt(outbox_id)
+            if attempts >= MAX_DELIVERY_ATTEMPTS:
+                self.outbox.remove(outbox_id)
+                print(f"[error] Giving up on request #{request_id} after {MAX_DELIVERY_ATTEMPTS} attempts: {exc}")
+            else:
+                self.outbox.postpone(outbox_id, _backoff(attempts))
+        self._outbox_wake.set()
+
+    async def _backend_healthy(self) -> bool:
+        assert self._client is not None
+        try:
+            response = await self._client.get(f"{self.base_url}/status", timeout=2.0)
+        except httpx.HTTPError:
+            return False
+        return response.status_code == 200
+
+    async def _drain_outbox(self) -> None:
+        assert self.outbox is not None and self._outbox_wake is not None
+        while True:
+            await self._outbox_wake.wait()
+            self._outbox_wake.clear()
+            delay = RETRY_BASE_DELAY
+            while len(self.outbox):
+                due_in = self.outbox.next_due(self._outbox_in_flight)
+                if due_in is None:
+                    break
+                if due_in > 0:
+                    # Every entry is backing off; a newly deferred one wakes us early.
+                    try:
+                        await asyncio.wait_for(self._outbox_wake.wait(), timeout=due_in)
+                    except asyncio.TimeoutError:
+                        pass
+                    self._outbox_wake.clear()
+                    continue
+                # Full jitter keeps several listeners from hammering a restarting backend in lockstep.
+                await asyncio.sleep(random.uniform(0, delay))
+                if not await self._backend_healthy():
+                    delay = min(delay * 2, RETRY_MAX_DELAY)
+                    continue
+                entries = self.outbox.batch(self.config.outbox_batch_size, exclude=self._outbox_in_flight)
+                if not entries:
+                    continue
+                print(f"[client] Backend is back; resending {len(entries)} queued request(s).")
+                tasks: List[asyncio.Task] = []
+                for entry_id, _attempts, payload in entries:
+                    self._outbox_in_flight.add(entry_id)
+                    tasks.append(self._start(next(self._ids), payload, entry_id))
+                results = await asyncio.gather(*tasks, return_exceptions=True)
+                # Only a delivery proves the backend is serving again; /status alone does not.
+                if any(result is True for result in results):
+                    delay = RETRY_BASE_DELAY
+                else:
+                    delay = min(delay * 2, RETRY_MAX_DELAY)
@@ -2,20 +2,21 @@
 from __future__ import annotations
 
 import base64
-import json
-import queue
 import threading
 import time
+import uuid
 from dataclasses import dataclass
 from typing import Optional, Tuple, Union
 
-import requests
 import pyperclip
 from pyperclip import PyperclipException
 from pynput import keyboard
 
 from client.config import ClientConfig, load_client_config
-from client.overlay import OverlayAppearance, show_overlay
+from client.dispatcher import RequestDispatcher
+from client.overlay import OverlayAppearance, OverlayProcess
+from client.pipeline import CALLBACK_BUDGET_MS, CallbackTimer, CommandPipeline
+from client.tracing import ClientTrace
 from client.utils import ScreenshotError, capture_screenshot
 
 
@@ -78,22 +79,44 @@ class HotkeyClient:
         self.config = config
         self.collecting = False
         self.buffer: list[str] = []
-        self.queue: "queue.Queue[Optional[dict]]" = queue.Queue()
+        self.session_id: Optional[str] = None
         self.running = True
         self.start_binding = parse_binding(config.start_key)
         self.exit_binding = parse_binding(config.exit_key)
         self.clipboard_binding = parse_binding(config.clipboard_key)
         self.screenshot_binding = parse_binding(config.screenshot_key)
-        self._session = requests.Session()
-        self.worker = threading.Thread(target=self._worker_loop, daemon=True)
-        self.worker.start()
+        self._output_lock = threading.Lock()
+        self.overlay: Optional[OverlayProcess] = None
+        if config.overlay_enabled:
+            # Start the overlay before any threads exist so a forked child stays clean.
+            self.overlay = OverlayProcess(
+                OverlayAppearance(
+                    width=config.overlay_width,
+                    opacity=config.overlay_opacity,
+                    duration=config.overlay_duration,
+                )
+            )
+            self.overlay.start()
+        self.dispatcher = RequestDispatcher(config, on_result=self._handle_result)
+        self.pipeline = CommandPipeline()
+        self.callback_timer = CallbackTimer()
 
     def stop(self) -> None:
         self.running = False
-        try:
-            self.queue.put_nowait(None)
-        except queue.Full:
-            pass
+
+    def close(self) -> None:
+        # Let commands from the last key presses (e.g. a final submit) finish first.
+        self.pipeline.close()
+        self.dispatcher.close()
+        if self.overlay is not None:
+            self.overlay.close()
+
+    def submit(self, payload: dict, trace: Optional[ClientTrace] = None, supersedable: bool = False) -> None:
+        request_id = self.dispatcher.submit(payload, trace, supersedable)
+        print(f"[client] Queued request #{request_id}.")
+
+    def _trace(self, kind: str) -> Optional[ClientTrace]:
+        return ClientTrace(kind) if self.config.tracing_enabled else None
 
     def _build_base_payload(self, prompt: str) -> dict:
         payload = {"prompt": prompt, "context": {}}
@@ -101,7 +124,7 @@ class HotkeyClient:
             payload["context"]["question_type"] = self.config.question_domain
         return payload
 
-    def _handle_screenshot(self) -> None:
+    def _handle_screenshot(self, trace: Optional[ClientTrace] = None) -> None:
         try:
             path = capture_screenshot()
         except ScreenshotError as exc:
@@ -122,83 +145,116 @@ class HotkeyClient:
         if not data:
             print("[client] Screenshot was empty; nothing sent.")
             return
+        if trace is not None:
+            trace.mark("captured")
 
         encoded = base64.b64encode(data).decode("ascii")
         payload = self._build_base_payload(self.config.screenshot_prompt)
         payload["images"] = [encoded]
         payload["prompt_prefix"] = "Screenshot captured via hotkey."
         print("\n[client] Screenshot captured; sending to backend.")
-        self.queue.put(payload)
+        self.submit(payload, trace)
+
+    def _send_clipboard(self, trace: Optional[ClientTrace] = None) -> None:
+        try:
+            clip_text = (pyperclip.paste() or "").strip()
+        except PyperclipException as exc:
+            print(f"[client] Clipboard read failed: {exc}")
+            return
+        if not clip_text:
+            print("[client] Clipboard is empty; nothing to send.")
+            return
+        if trace is not None:
+            trace.mark("captured")
+        preview = clip_text if len(clip_text) <= 80 else clip_text[:77] + "..."
+        print(f"\n[client] Sending clipboard: {preview}")
+        self.submit(self._build_base_payload(clip_text), trace)
+
+    def _send_prompt(
+        self, text: str, session_id: Optional[str] = None, trace: Optional[ClientTrace] = None
+    ) -> None:
+        preview = text if len(text) <= 80 else text[:77] + "..."
+        print(f"\n[client] Sending prompt: {preview}")
+        payload = self._build_base_payload(text)
+        if session_id:
+            payload["session_id"] = session_id
+        self.submit(payload, trace, supersedable=True)
+
+    def _start_capture(self) -> None:
+        print("\nCapture started. Type your prompt and press Enter to send.")
+        if self.config.cancel_on_new_prompt:
+            self.dispatcher.cancel_superseded()
 
     # Listener callbacks --------------------------------------------------
+    #
+    # These run on pynput's thread, inside the OS key hook. They only classify
+    # the key and update the prompt buffer; anything that can block (clipboard
+    # tools, screenshot subprocesses, encoding, cancelling requests, even
+    # printing) is posted to the command pipeline.
 
     def on_press(self, key: Union[keyboard.Key, keyboard.KeyCode]) -> Optional[bool]:
+        started = time.perf_counter_ns()
+        try:
+            return self._classify(key)
+        finally:
+            self.callback_timer.record(time.perf_counter_ns() - started)
+
+    def _classify(self, key: Union[keyboard.Key, keyboard.KeyCode]) -> Optional[bool]:
         if matches(self.exit_binding, key):
-            print("Exit key detected. Quitting listener.")
+            self.pipeline.post(print, "Exit key detected. Quitting listener.")
             self.stop()
             return False
 
         if matches(self.screenshot_binding, key):
-            self._handle_screenshot()
+            self.pipeline.post(self._handle_screenshot, self._trace("screenshot"))
             return True
 
         if matches(self.clipboard_binding, key):
-            try:
-                clip_text = (pyperclip.paste() or "").strip()
-            except PyperclipException as exc:
-                print(f"[client] Clipboard read failed: {exc}")
-                return True
-            if clip_text:
-                preview = clip_text if len(clip_text) <= 80 else clip_text[:77] + "..."
-                print(f"\n[client] Sending clipboard: {preview}")
-                self.collecting = False
-                self.buffer.clear()
-                payload = self._build_base_payload(clip_text)
-                self.queue.put(payload)
-            else:
-                print("[client] Clipboard is empty; nothing to send.")
+            self.collecting = False
+            self.session_id = None
+            self.buffer.clear()
+            self.pipeline.post(self._send_clipboard, self._trace("clipboard"))
             return True
 
         if not self.collecting:
             if matches(self.start_binding, key):
                 self.collecting = True
                 self.buffer.clear()
-                print("\nCapture started. Type your prompt and press Enter to send.")
+                self.session_id = uuid.uuid4().hex
+                self.pipeline.post(self._start_capture)
+                self.pipeline.post(self.dispatcher.prefetch, self.session_id, "")
             return True
 
         if matches(self.start_binding, key):
             return True
 
         if key == keyboard.Key.enter:
+            trace = self._trace("prompt")
             text = "".join(self.buffer).strip()
             self.buffer.clear()
             self.collecting = False
+            session_id, self.session_id = self.session_id, None
             if text:
-                preview = text if len(text) <= 80 else text[:77] + "..."
-                print(f"\n[client] Sending prompt: {preview}")
-                payload = self._build_base_payload(text)
-                self.queue.put(payload)
+                if trace is not None:
+                    trace.mark("captured")
+                self.pipeline.post(self._send_prompt, text, session_id, trace)
             else:
-                print("Prompt was empty, ignoring.")
+                self.pipeline.post(print, "Prompt was empty, ignoring.")
             return True
 
         if key == keyboard.Key.backspace:
             if self.buffer:
                 self.buffer.pop()
-            return True
-
-        if key == keyboard.Key.space:
+        elif key == keyboard.Key.space:
             self.buffer.append(" ")
-            return True
-
-        if key == keyboard.Key.tab:
+        elif key == keyboard.Key.tab:
             self.buffer.append("\t")
-            return True
-
-        if isinstance(key, keyboard.KeyCode) and key.char:
+        elif isinstance(key, keyboard.KeyCode) and key.char:
             self.buffer.append(key.char)
+        else:
             return True
-
+        if self.session_id:
+            self.pipeline.post(self.dispatcher.prefetch, self.session_id, "".join(self.buffer))
         return True
 
     def on_release(self, key: Union[keyboard.Key, keyboard.KeyCode]) -> Optional[bool]:
@@ -206,36 +262,15 @@ class HotkeyClient:
             return False
         return True
 
-    # Worker ---------------------------------------------------------------
-
-    def _worker_loop(self) -> None:
-        while self.running:
-            try:
-                payload = self.queue.get(timeout=0.5)
-            except queue.Empty:
-                continue
-            if not payload:
-                continue
-            self._dispatch_payload(payload)
-
-    def _dispatch_payload(self, payload: dict) -> None:
-        url = f"http://{self.config.host}:{self.config.port}/generate"
-        headers = {"x-api-key": self.config.api_key}
-        try:
-            response = self._session.post(url, json=payload, headers=headers, timeout=60)
-            response.raise_for_status()
-            data = response.json()
-        except requests.RequestException as exc:
-            print(f"[error] Request failed: {exc}")
-            return
-        except json.JSONDecodeError:
-            print("[error] Backend returned invalid JSON.")
-            return
+    # Results --------------------------------------------------------------
 
+    def _handle_result(self, request_id: int, data: dict, trace: Optional[ClientTrace] = None) -> None:
         result = self._parse_result(data)
-        self._print_to_console(result)
-        if self.config.overlay_enabled:
-            self._show_overlay(result)
+        with self._output_lock:
+            print(f"\n[client] Response for request #{request_id}:")
+            self._print_to_console(result)
+        if self.overlay is not None:
+            self._show_overlay(result, trace.trace_id if trace is not None else None)
 
     def _parse_result(self, data: dict) -> PromptResult:
         final_line = data.get("final_answer")
@@ -256,16 +291,11 @@ class HotkeyClient:
             print(result.final_line)
         print("-------------------------------------------------------\n")
 
-    def _show_overlay(self, result: PromptResult) -> None:
+    def _show_overlay(self, result: PromptResult, trace_id: Optional[str] = None) -> None:
         text = result.overlay_text()
-        if not text:
+        if not text or self.overlay is None:
             return
-        appearance = OverlayAppearance(
-            width=self.config.overlay_width,
-            opacity=self.config.overlay_opacity,
-            duration=self.config.overlay_duration,
-        )
-        show_overlay(text, appearance)
+        self.overlay.show(text, trace_id)
 
 
 def main() -> int:
@@ -277,9 +307,19 @@ def main() -> int:
         "Press the exit key at any time to quit."
     )
     client = HotkeyClient(config)
-    with keyboard.Listener(on_press=client.on_press, on_release=client.on_release) as listener:
-        while client.running and listener.running:
-            time.sleep(0.2)
+    try:
+        with keyboard.Listener(on_press=client.on_press, on_release=client.on_release) as listener:
+            while client.running and listener.running:
+                time.sleep(0.2)
+    finally:
+        client.close()
+        stats = client.callback_timer.summary()
+        if stats["count"]:
+            print(
+                f"[client] Key callbacks: {stats['count']} calls, p50 {stats['p50_ms']:.3f} ms, "
+                f"p99 {stats['p99_ms']:.3f} ms, max {stats['max_ms']:.3f} ms, "
+                f"{stats['over_budget']} over the {CALLBACK_BUDGET_MS:g} ms budget."
+            )
     return 0
 
 
@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+
+class Outbox:
+    """Durable FIFO of payloads that could not reach the backend.
+
+    Entries survive listener restarts. When more than `max_entries` are queued
+    the oldest are evicted. Each entry carries its own `retry_at`, so an entry
+    that keeps failing backs off without holding up the others. Only the
+    dispatcher's event loop thread touches the connection.
+    """
+
+    def __init__(self, path: Path, max_entries: int = 50) -> None:
+        self.path = path
+        self.max_entries = max(1, max_entries)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                created_at REAL NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                payload TEXT NOT NULL,
+                retry_at REAL NOT NULL DEFAULT 0
+            )
+            """
+        )
+        columns = {row[1] for row in self._connection.execute("PRAGMA table_info('outbox')")}
+        if "retry_at" not in columns:
+            self._connection.execute("ALTER TABLE outbox ADD COLUMN retry_at REAL NOT NULL DEFAULT 0")
+        self._connection.commit()
+
+    def add(self, payload: dict, attempts: int = 0) -> int:
+        """Store a payload and return how many old entries were evicted to make room."""
+
+        with self._connection:
+            self._connection.execute(
+                "INSERT INTO outbox (created_at, attempts, payload) VALUES (?, ?, ?)",
+                (time.time(), attempts, json.dumps(payload)),
+            )
+            evicted = self._connection.execute(
+                "DELETE FROM outbox WHERE id NOT IN (SELECT id FROM outbox ORDER BY id DESC LIMIT ?)",
+                (self.max_entries,),
+            ).rowcount
+        return evicted
+
+    def batch(self, limit: int, exclude: set[int]) -> List[Tuple[int, int, dict]]:
+        """Oldest entries that are due for another attempt."""
+
+        rows = self._connection.execute(
+            "SELECT id, attempts, payload FROM outbox WHERE retry_at <= ? ORDER BY id LIMIT ?",
+            (time.time(), limit + len(exclude)),
+        ).fetchall()
+        return [(row[0], row[1], json.loads(row[2])) for row in rows if row[0] not in exclude][:limit]
+
+    def next_due(self, exclude: set[int]) -> Optional[float]:
+        """Seconds until the earliest entry outside `exclude` is due, or None if there is none."""
+
+        rows = self._connection.execute("SELECT id, retry_at FROM outbox").fetchall()
+        due = [retry_at for entry_id, retry_at in rows if entry_id not in exclude]
+        return max(0.0, min(due) - time.time()) if due else None
+
+    def remove(self, entry_id: int) -> None:
+        with self._connection:
+            self._connection.execute("DELETE FROM outbox WHERE id = ?", (entry_id,))
+
+    def record_attempt(self, entry_id: int) -> int:
+        with self._connection:
+            self._connection.execute("UPDATE outbox SET attempts = attempts + 1 WHERE id = ?", (entry_id,))
+            row = self._connection.execute("SELECT attempts FROM outbox WHERE id = ?", (entry_id,)).fetchone()
+        return row[0] if row else 0
+
+    def postpone(self, entry_id: int, seconds: float) -> None:
+        with self._connection:
+            self._connection.execute("UPDATE outbox SET retry_at = ? WHERE id = ?", (time.time() + seconds, entry_id))
+
+    def __len__(self) -> int:
+        return self._connection.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+    def close(self) -> None:
+        self._connection.close()
@@ -2,9 +2,21 @@ from __future__ import annotations
 
 import multiprocessing as mp
 import platform
+import queue
 import sys
 import time
 from dataclasses import dataclass
+from typing import Any, Optional, Tuple
+
+from client.tracing import write_rendered
+
+# Messages understood by the overlay loop:
+#   ("show", text[, trace_id])   replace the window contents and show it; with a
+#                                trace id, record when the text is on screen
+#   ("append", text) append streamed text to the current contents
+#   ("hide",)        hide the window
+#   ("stop",)        close the window and exit the loop
+OverlayMessage = Tuple[Any, ...]
 
 
 @dataclass(frozen=True)
@@ -14,19 +26,58 @@ class OverlayAppearance:
     duration: float = 15.0  # seconds; 0 disables auto-close
 
 
-def _render_overlay(text: str, appearance: OverlayAppearance) -> None:
+def _trace_id(message: OverlayMessage) -> Optional[str]:
+    return message[2] if len(message) > 2 else None
+
+
+def _font_size(text: str) -> int:
+    text_length = len(text)
+    if text_length > 800:
+        return 12
+    if text_length > 400:
+        return 13
+    if text_length > 200:
+        return 14
+    return 16
+
+
+def _overlay_loop(messages: Any, appearance: OverlayAppearance, exit_when_hidden: bool = False) -> None:
     if platform.system().lower() == "darwin":
-        if _render_overlay_macos(text, appearance):
+        if _run_macos_overlay(messages, appearance, exit_when_hidden):
             return
     try:
         import tkinter as tk
     except ImportError:
         print("[overlay] tkinter not available; displaying response in console only.")
-        print(text)
-        time.sleep(max(appearance.duration, 3.0))
+        _run_console_overlay(messages, appearance, exit_when_hidden)
         return
+    _run_tk_overlay(tk, messages, appearance, exit_when_hidden)
+
+
+def _run_console_overlay(messages: Any, appearance: OverlayAppearance, exit_when_hidden: bool) -> None:
+    while True:
+        message = messages.get()
+        kind = message[0]
+        if kind == "stop":
+            return
+        if kind in {"show", "append"}:
+            print(message[1])
+            trace_id = _trace_id(message)
+            if trace_id:
+                write_rendered(trace_id)
+            if exit_when_hidden:
+                time.sleep(max(appearance.duration, 3.0))
+                return
 
-    root = tk.Tk()
+
+def _run_tk_overlay(tk: Any, messages: Any, appearance: OverlayAppearance, exit_when_hidden: bool) -> None:
+    try:
+        root = tk.Tk()
+    except tk.TclError as exc:
+        print(f"[overlay] Unable to open overlay window ({exc}); displaying response in console only.")
+        _run_console_overlay(messages, appearance, exit_when_hidden)
+        return
+    root.withdraw()
     root.title("AI Response")
     root.attributes("-topmost", True)
     root.overrideredirect(True)
@@ -38,19 +89,10 @@ def _render_overlay(text: str, appearance: OverlayAppearance) -> None:
 
     root.configure(bg=background)
 
-    text_length = len(text)
-    if text_length > 800:
-        font_size = 12
-    elif text_length > 400:
-        font_size = 13
-    elif text_length > 200:
-        font_size = 14
-    else:
-        font_size = 16
-
     label = tk.Label(
-        text=text,
-        font=("Helvetica", font_size),
+        root,
+        text="",
+        font=("Helvetica", 16),
         justify="right",
         wraplength=max(200, appearance.width),
         bg=background,
@@ -60,30 +102,84 @@ def _render_overlay(text: str, appearance: OverlayAppearance) -> None:
     )
     label.pack(anchor="ne")
 
-    root.update_idletasks()
-    screen_width = root.winfo_screenwidth()
-    screen_height = root.winfo_screenheight()
-    window_width = label.winfo_width()
-    window_height = label.winfo_height()
-    if window_width + 40 > screen_width:
-        window_width = screen_width - 40
-        label.config(wraplength=window_width)
-        root.update_idletasks()
-        window_height = label.winfo_height()
-    if window_height + 40 > screen_height:
-        window_height = screen_height - 40
-        label.config(wraplength=window_width - 20)
+    state: dict = {"text": "", "hide_job": None, "visible": False}
+
+    def place() -> None:
+        label.config(wraplength=max(200, appearance.width))
         root.update_idletasks()
-        window_height = label.winfo_height()
-    x = max(0, screen_width - window_width - 20)
-    y = 20
-    root.geometry(f"{window_width}x{window_height}+{x}+{y}")
+        screen_width = root.winfo_screenwidth()
+        screen_height = root.winfo_screenheight()
+        window_width = label.winfo_reqwidth()
+        window_height = label.winfo_reqheight()
+        if window_width + 40 > screen_width:
+            window_width = screen_width - 40
+            label.config(wraplength=window_width)
+            root.update_idletasks()
+            window_height = label.winfo_reqheight()
+        if window_height + 40 > screen_height:
+            window_height = screen_height - 40
+            label.config(wraplength=window_width - 20)
+            root.update_idletasks()
+            window_height = label.winfo_reqheight()
+        x = max(0, screen_width - window_width - 20)
+        y = 20
+        root.geometry(f"{window_width}x{window_height}+{x}+{y}")
 
-    if appearance.duration > 0:
-        root.after(int(appearance.duration * 1000), root.destroy)
+    def hide(_event: Any = None) -> None:
+        if state["hide_job"] is not None:
+            root.after_cancel(state["hide_job"])
+            state["hide_job"] = None
+        state["visible"] = False
+        if exit_when_hidden:
+            root.destroy()
+            return
+        root.withdraw()
+
+    def render(text: str) -> None:
+        state["text"] = text
+        label.config(text=text, font=("Helvetica", _font_size(text)))
+        place()
+        if not state["visible"]:
+            root.deiconify()
+            root.attributes("-topmost", True)
+            state["visible"] = True
+        root.lift()
+        if state["hide_job"] is not None:
+            root.after_cancel(state["hide_job"])
+            state["hide_job"] = None
+        if appearance.duration > 0:
+            state["hide_job"] = root.after(int(appearance.duration * 1000), hide)
 
-    root.bind("<Escape>", lambda _event: root.destroy())
-    root.bind("<Button-1>", lambda _event: root.destroy())
+    def poll() -> None:
+        while True:
+            try:
+                message = messages.get_nowait()
+            except queue.Empty:
+                break
+            except (EOFError, OSError):
+                root.destroy()
+                return
+            kind = message[0]
+            if kind == "stop":
+                root.destroy()
+                return
+            if kind == "show":
+                render(message[1])
+                trace_id = _trace_id(message)
+                if trace_id:
+                    # Tk redraws in idle callbacks; this one runs once the text is painted.
+                    root.after_idle(write_rendered, trace_id)
+            elif kind == "append":
+                render(state["text"] + message[1])
+            elif kind == "hide" and state["visible"]:
+                hide()
+                if exit_when_hidden:
+                    return
+        root.after(30, poll)
+
+    root.bind("<Escape>", hide)
+    root.bind("<Button-1>", hide)
+    poll()
 
     try:
         root.mainloop()
@@ -91,15 +187,23 @@ def _render_overlay(text: str, appearance: OverlayAppearance) -> None:
         sys.exit(0)
 
 
-def show_overlay(text: str, appearance: OverlayAppearance) -> mp.Process | None:
+def _render_overlay(text: str, appearance: OverlayAppearance) -> None:
+    messages: "queue.Queue[OverlayMessage]" = queue.Queue()
+    messages.put(("show", text))
+    _overlay_loop(messages, appearance, exit_when_hidden=True)
+
+
+def _overlay_context() -> Any:
     try:
         if sys.platform in {"win32", "darwin"}:
-            ctx = mp.get_context("spawn")
-        else:
-            ctx = mp.get_context("fork")
+            return mp.get_context("spawn")
+        return mp.get_context("fork")
     except ValueError:  # pragma: no cover - fallback when preferred context unavailable
-        ctx = mp.get_context()
+        return mp.get_context()
+
 
+def show_overlay(text: str, appearance: OverlayAppearance) -> mp.Process | None:
+    ctx = _overlay_context()
     try:
         process = ctx.Process(target=_render_overlay, args=(text, appearance), daemon=True)
         process.start()
@@ -110,11 +214,69 @@ def show_overlay(text: str, appearance: OverlayAppearance) -> mp.Process | None:
         return None
 
 
-def _render_overlay_macos(text: str, appearance: OverlayAppearance) -> bool:
+class OverlayProcess:
+    """Long-lived overlay window fed over a queue.
+
+    The process and its window are created once; each response is a message
+    that updates the same window in place, so showing an answer costs a queue
+    put instead of a process launch and a new toolkit root.
+    """
+
+    def __init__(self, appearance: OverlayAppearance) -> None:
+        self.appearance = appearance
+        ctx = _overlay_context()
+        self._messages = ctx.Queue()
+        self._process: Optional[mp.process.BaseProcess] = ctx.Process(
+            target=_overlay_loop,
+            args=(self._messages, appearance),
+            name="overlay",
+            daemon=True,
+        )
+
+    def start(self) -> bool:
+        assert self._process is not None
+        try:
+            self._process.start()
+        except Exception as exc:  # pragma: no cover - last resort fallback
+            print(f"[overlay] Failed to launch overlay process: {exc}")
+            self._process = None
+            return False
+        return True
+
+    @property
+    def alive(self) -> bool:
+        return self._process is not None and self._process.is_alive()
+
+    def show(self, text: str, trace_id: Optional[str] = None) -> None:
+        message: OverlayMessage = ("show", text, trace_id) if trace_id else ("show", text)
+        self._send(message, fallback_text=text)
+
+    def append(self, text: str) -> None:
+        self._send(("append", text))
+
+    def hide(self) -> None:
+        self._send(("hide",))
+
+    def close(self) -> None:
+        if not self.alive:
+            return
+        assert self._process is not None
+        self._messages.put(("stop",))
+        self._process.join(timeout=2)
+        if self._process.is_alive():
+            self._process.terminate()
+
+    def _send(self, message: OverlayMessage, fallback_text: Optional[str] = None) -> None:
+        if self.alive:
+            self._messages.put(message)
+        elif fallback_text is not None:
+            show_overlay(fallback_text, self.appearance)
+
+
+def _run_macos_overlay(messages: Any, appearance: OverlayAppearance, exit_when_hidden: bool) -> bool:
     try:
         import objc
         from AppKit import (
-            NSApp,
             NSApplication,
             NSPanel,
             NSScreen,
@@ -140,10 +302,37 @@ def _render_overlay_macos(text: str, appearance: OverlayAppearance) -> bool:
             self = objc.super(OverlayController, self).init()
             if self is None:
                 return None
-            self.panel = None
+            self.text = ""
+            self.panel = NSPanel.alloc().initWithContentRect_styleMask_backing_defer_(
+                NSMakeRect(40, 40, appearance.width + 40, 120),
+                NSWindowStyleMaskBorderless,
+                NSBackingStoreBuffered,
+                False,
+            )
+            self.panel.setLevel_(NSStatusWindowLevel)
+            self.panel.setOpaque_(False)
+            self.panel.setAlphaValue_(max(0.05, min(appearance.opacity, 1.0)))
+            self.panel.setBackgroundColor_(NSColor.blackColor())
+            self.panel.setHasShadow_(True)
+            behaviors = (
+                NSWindowCollectionBehaviorCanJoinAllSpaces
+                | NSWindowCollectionBehaviorFullScreenAuxiliary
+            )
+            self.panel.setCollectionBehavior_(behaviors)
+
+            self.text_view = NSTextView.alloc().initWithFrame_(NSMakeRect(20, 20, appearance.width, 80))
+            self.text_view.setEditable_(False)
+            self.text_view.setSelectable_(False)
+            self.text_view.setDrawsBackground_(False)
+            self.text_view.setTextColor_(NSColor.whiteColor())
+            self.text_view.setAlignment_(NSTextAlignmentRight)
+            self.text_view.setHorizontallyResizable_(False)
+            self.text_view.textContainer().setWidthTracksTextView_(True)
+            self.panel.contentView().addSubview_(self.text_view)
             return self
 
-        def show_(self, _sender=None):
+        def render_(self, text):
+            self.text = text
             width = appearance.width + 40
             line_estimate = max(1, text.count("\n") + len(text) // max(1, appearance.width // 8))
             height = max(120, min(600, 50 + line_estimate * 24))
@@ -159,67 +348,63 @@ def _render_overlay_macos(text: str, appearance: OverlayAppearance) -> bool:
             else:
                 x, y = 40, 40
 
-            panel = NSPanel.alloc().initWithContentRect_styleMask_backing_defer_(
-                NSMakeRect(x, y, width, height),
-                NSWindowStyleMaskBorderless,
-                NSBackingStoreBuffered,
-                False,
-            )
-            panel.setLevel_(NSStatusWindowLevel)
-            panel.setOpaque_(False)
-            panel.setAlphaValue_(max(0.05, min(appearance.opacity, 1.0)))
-            panel.setBackgroundColor_(NSColor.blackColor())
-            panel.setHasShadow_(True)
-            behaviors = (
-                NSWindowCollectionBehaviorCanJoinAllSpaces
-                | NSWindowCollectionBehaviorFullScreenAuxiliary
-            )
-            panel.setCollectionBehavior_(behaviors)
-
-            text_view = NSTextView.alloc().initWithFrame_(NSMakeRect(20, 20, width - 40, height - 40))
-            text_view.setEditable_(False)
-            text_view.setSelectable_(False)
-            text_view.setDrawsBackground_(False)
-            text_view.setString_(text)
-            text_view.setTextColor_(NSColor.whiteColor())
-            text_len = len(text)
-            if text_len > 800:
-                font_size = 12
-            elif text_len > 400:
-                font_size = 13
-            elif text_len > 200:
-                font_size = 14
-            else:
-                font_size = 16
-            text_view.setFont_(NSFont.systemFontOfSize_(font_size))
-            text_view.setAlignment_(NSTextAlignmentRight)
-            text_view.setHorizontallyResizable_(False)
-            text_view.textContainer().setContainerSize_((width - 40, float("inf")))
-            text_view.textContainer().setWidthTracksTextView_(True)
-            panel.contentView().addSubview_(text_view)
-
-            panel.makeKeyAndOrderFront_(None)
+            self.panel.setFrame_display_(NSMakeRect(x, y, width, height), True)
+            self.text_view.setFrame_(NSMakeRect(20, 20, width - 40, height - 40))
+            self.text_view.textContainer().setContainerSize_((width - 40, float("inf")))
+            self.text_view.setString_(text)
+            self.text_view.setTextColor_(NSColor.whiteColor())
+            self.text_view.setFont_(NSFont.systemFontOfSize_(_font_size(text)))
+            self.text_view.setAlignment_(NSTextAlignmentRight)
+
+            self.panel.makeKeyAndOrderFront_(None)
             app.activateIgnoringOtherApps_(True)
-            self.panel = panel
 
+            NSObject.cancelPreviousPerformRequestsWithTarget_(self)
             if appearance.duration > 0:
-                NSTimer.scheduledTimerWithTimeInterval_target_selector_userInfo_repeats_(
-                    appearance.duration,
-                    self,
-                    "close:",
-                    None,
-                    False,
-                )
-
-        def close_(self, _sender=None):
-            if self.panel is not None:
-                self.panel.orderOut_(None)
-                self.panel.close()
+                self.performSelector_withObject_afterDelay_("hide:", None, appearance.duration)
+
+        def hide_(self, _sender=None):
+            self.panel.orderOut_(None)
+            if exit_when_hidden:
+                self.stop_(None)
+
+        def stop_(self, _sender=None):
+            self.panel.orderOut_(None)
+            self.panel.close()
             AppHelper.stopEventLoop()
 
+        def poll_(self, _timer):
+            while True:
+                try:
+                    message = messages.get_nowait()
+                except queue.Empty:
+                    return
+                except (EOFError, OSError):
+                    self.stop_(None)
+                    return
+                kind = message[0]
+                if kind == "stop":
+                    self.stop_(None)
+                    return
+                if kind == "show":
+                    self.render_(message[1])
+                    trace_id = _trace_id(message)
+                    if trace_id:
+                        write_rendered(trace_id)
+                elif kind == "append":
+                    self.render_(self.text + message[1])
+                elif kind == "hide":
+                    self.hide_(None)
+
     app = NSApplication.sharedApplication()
     app.setActivationPolicy_(1)  # accessory
     controller = OverlayController.alloc().init()
-    controller.show_(None)
+    NSTimer.scheduledTimerWithTimeInterval_target_selector_userInfo_repeats_(
+        0.03,
+        controller,
+        "poll:",
+        None,
+        True,
+    )
     AppHelper.runConsoleEventLoop()
     return True
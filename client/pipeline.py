@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import queue
+import threading
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+# Key callbacks run on the OS input hook; past about a millisecond the desktop
+# starts to lag and, on Linux, keystrokes can be dropped.
+CALLBACK_BUDGET_MS = 1.0
+
+Command = Tuple[Callable[..., Any], Tuple[Any, ...]]
+
+
+class CommandPipeline:
+    """Runs listener commands (clipboard reads, captures, submits) off the key hook.
+
+    Commands run one at a time on a single worker thread, in the order the
+    keys were pressed, so a prompt typed after pressing the start key is
+    submitted after the stale requests were cancelled.
+    """
+
+    def __init__(self, name: str = "listener-commands") -> None:
+        self._queue: "queue.SimpleQueue[Optional[Command]]" = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def post(self, handler: Callable[..., Any], *args: Any) -> None:
+        self._queue.put((handler, args))
+
+    def close(self, timeout: float = 5.0) -> None:
+        self._queue.put(None)
+        self._thread.join(timeout=timeout)
+
+    def _run(self) -> None:
+        while True:
+            command = self._queue.get()
+            if command is None:
+                return
+            handler, args = command
+            try:
+                handler(*args)
+            except Exception as exc:  # pragma: no cover - keep the worker alive
+                print(f"[client] Command {getattr(handler, '__name__', handler)} failed: {exc}")
+
+
+class CallbackTimer:
+    """Execution time of key callbacks, to check they stay within budget."""
+
+    def __init__(self, budget_ms: float = CALLBACK_BUDGET_MS, keep: int = 2048) -> None:
+        self.budget_ns = int(budget_ms * 1_000_000)
+        self.count = 0
+        self.over_budget = 0
+        self.max_ns = 0
+        self._samples: Deque[int] = deque(maxlen=keep)
+
+    def record(self, elapsed_ns: int) -> None:
+        self.count += 1
+        self._samples.append(elapsed_ns)
+        if elapsed_ns > self.max_ns:
+            self.max_ns = elapsed_ns
+        if elapsed_ns > self.budget_ns:
+            self.over_budget += 1
+
+    def summary(self) -> Dict[str, float]:
+        samples = sorted(self._samples)
+        if not samples:
+            return {"count": 0}
+
+        def percentile(fraction: float) -> float:
+            return samples[min(len(samples) - 1, int(len(samples) * fraction))] / 1_000_000
+
+        return {
+            "count": self.count,
+            "p50_ms": percentile(0.5),
+            "p99_ms": percentile(0.99),
+            "max_ms": self.max_ns / 1_000_000,
+            "over_budget": self.over_budget,
+        }
@@ -10,6 +10,7 @@ if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
 from run import (
+    backend_socket_path,
     ensure_venv,
     install_dependencies,
     parse_env_file,
@@ -34,6 +35,7 @@ def main() -> int:
     wait_for_status(
         env_values.get("HOST", "127.0.0.1"),
         env_values.get("PORT", "8000"),
+        socket_path=backend_socket_path(env_values),
     )
     print("Backend detected. Launching listener...")
 
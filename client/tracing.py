@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import json
+import os
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+from client.config import DATA_DIR
+
+TRACE_HEADER = "x-trace-id"
+TRACE_FILE = DATA_DIR / "traces.jsonl"
+
+# Marks a traced request collects, in order. Each names the end of a stage:
+# "captured" ends the capture stage that began with the key press, and so on.
+# The overlay process adds "rendered" in a record of its own.
+CLIENT_MARKS = ("captured", "encoded", "sent", "first_byte", "last_byte", "handled")
+
+
+class ClientTrace:
+    """Timestamps of one hotkey request, from the key press to the answer on screen.
+
+    Marks are milliseconds after the key press; `start_ns` is wall-clock time
+    so client, overlay and backend records line up on the same machine.
+    """
+
+    def __init__(self, kind: str) -> None:
+        self.trace_id = uuid.uuid4().hex
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self._origin = time.perf_counter()
+        self.marks: Dict[str, float] = {}
+        self.server_timing: Optional[str] = None
+
+    def mark(self, name: str) -> None:
+        self.marks[name] = round((time.perf_counter() - self._origin) * 1000, 3)
+
+    def record(self) -> Dict[str, Any]:
+        record: Dict[str, Any] = {
+            "trace_id": self.trace_id,
+            "source": "client",
+            "kind": self.kind,
+            "start_ns": self.start_ns,
+            "marks": self.marks,
+        }
+        if self.server_timing:
+            record["server_timing"] = self.server_timing
+        return record
+
+
+def write_trace(record: Dict[str, Any]) -> None:
+    """Append one record to the trace file; never raises."""
+
+    line = (json.dumps(record, separators=(",", ":")) + "\n").encode("utf-8")
+    try:
+        TRACE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        # A single O_APPEND write keeps lines from the listener and the overlay
+        # process whole without a lock; records are far below a page.
+        fd = os.open(str(TRACE_FILE), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+    except OSError:
+        pass
+
+
+def write_rendered(trace_id: str) -> None:
+    """Record, from the overlay process, that the answer for `trace_id` is on screen."""
+
+    write_trace({"trace_id": trace_id, "source": "overlay", "start_ns": time.time_ns(), "marks": {"rendered": 0.0}})
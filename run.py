@@ -1,18 +1,25 @@
 #!/usr/bin/env python3
 from __future__ import annotations
 
+import argparse
 import errno
+import hashlib
+import http.client
 import os
 import platform
 import shutil
 import signal
+import socket
 import subprocess
 import sys
 import tempfile
+import threading
 import time
 import venv
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 from urllib.error import URLError
 from urllib.parse import urlparse
 from urllib.request import Request, urlopen, urlretrieve
@@ -23,6 +30,51 @@ ROOT = Path(__file__).resolve().parent
 VENV_DIR = ROOT / ".venv"
 REQUIREMENTS_FILE = ROOT / "requirements.txt"
 ENV_FILE = ROOT / ".env"
+DEPENDENCY_STAMP = ".requirements.sha256"
+
+
+class BootTimings:
+    def __init__(self) -> None:
+        self.started = time.monotonic()
+        self.steps: List[Tuple[str, float, float]] = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def step(self, name: str) -> Iterator[None]:
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            finished = time.monotonic()
+            with self._lock:
+                self.steps.append((name, started - self.started, finished - started))
+
+    def report(self) -> None:
+        total = time.monotonic() - self.started
+        print(f"Startup timings ({total:.2f}s total):")
+        for name, offset, duration in sorted(self.steps, key=lambda item: item[1]):
+            print(f"  {name:<20} +{offset:6.2f}s  {duration:6.2f}s")
+
+
+def poll_with_backoff(
+    check: Callable[[], bool],
+    timeout: float,
+    initial_delay: float = 0.05,
+    max_delay: float = 1.0,
+    should_abort: Optional[Callable[[], None]] = None,
+) -> bool:
+    deadline = time.monotonic() + timeout
+    delay = initial_delay
+    while True:
+        if check():
+            return True
+        if should_abort is not None:
+            should_abort()
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        time.sleep(min(delay, remaining))
+        delay = min(delay * 2, max_delay)
 
 
 def parse_env_file(path: Path) -> Dict[str, str]:
@@ -40,6 +92,13 @@ def parse_env_file(path: Path) -> Dict[str, str]:
     return env
 
 
+def env_flag(env: Dict[str, str], key: str, default: bool) -> bool:
+    value = env.get(key)
+    if value is None:
+        return default
+    return value.strip().lower() in {"1", "true", "yes", "on"}
+
+
 def apply_env_defaults(env: Dict[str, str]) -> None:
     env.setdefault("OLLAMA_MODEL", "llama3.1:8b")
     env.setdefault("OLLAMA_VISION_MODEL", "llava:13b")
@@ -60,9 +119,24 @@ def venv_python(venv_dir: Path) -> Path:
     return venv_dir / "bin" / "python"
 
 
-def install_dependencies(python_executable: Path) -> None:
+def dependency_fingerprint(python_executable: Path) -> str:
+    digest = hashlib.sha256()
+    digest.update(REQUIREMENTS_FILE.read_bytes())
+    digest.update(str(python_executable).encode("utf-8"))
+    venv_config = python_executable.parent.parent / "pyvenv.cfg"
+    if venv_config.exists():
+        digest.update(venv_config.read_bytes())
+    return digest.hexdigest()
+
+
+def install_dependencies(python_executable: Path, force: bool = False) -> None:
     if not REQUIREMENTS_FILE.exists():
         raise FileNotFoundError("requirements.txt not found")
+    stamp = python_executable.parent.parent / DEPENDENCY_STAMP
+    fingerprint = dependency_fingerprint(python_executable)
+    if not force and stamp.exists() and stamp.read_text(encoding="utf-8").strip() == fingerprint:
+        print("Dependencies up to date, skipping install.")
+        return
     print("Installing dependencies...")
     subprocess.check_call(
         [
@@ -79,6 +153,7 @@ def install_dependencies(python_executable: Path) -> None:
         [str(python_executable), "-m", "pip", "install", "-r", str(REQUIREMENTS_FILE)],
         cwd=str(ROOT),
     )
+    stamp.write_text(fingerprint + "\n", encoding="utf-8")
 
 
 def ensure_ollama_installed(env: Dict[str, str]) -> None:
@@ -146,7 +221,7 @@ def ensure_ollama_installed(env: Dict[str, str]) -> None:
         print("Ollama CLI still not found after automated attempts. Manual installation may be required before continuing.")
 
 
-def ensure_ollama_model(env: Dict[str, str]) -> None:
+def ensure_ollama_model(env: Dict[str, str], on_spawn: Optional[Callable[[subprocess.Popen], None]] = None) -> None:
     backend = (env.get("AI_BACKEND") or "").strip().lower()
     if backend != "ollama":
         return
@@ -173,8 +248,13 @@ def ensure_ollama_model(env: Dict[str, str]) -> None:
         print(f"Warning: Unable to check existing Ollama models ({exc}). Continuing with pull attempt.")
 
     print(f"Pulling Ollama model '{model}'...")
-    pull_result = subprocess.run(["ollama", "pull", model])
-    if pull_result.returncode != 0:
+    pull = subprocess.Popen(["ollama", "pull", model])
+    if on_spawn is not None:
+        on_spawn(pull)
+    returncode = pull.wait()
+    if returncode < 0:
+        print(f"Ollama model pull for '{model}' was stopped.")
+    elif returncode != 0:
         print(
             "Warning: Ollama model pull failed. Ensure the Ollama daemon is running and the model name is correct."
         )
@@ -204,7 +284,9 @@ def ollama_service_ready(base_url: str, timeout: float = 2.0) -> bool:
         return False
 
 
-def ensure_ollama_running(env: Dict[str, str]) -> Optional[subprocess.Popen]:
+def ensure_ollama_running(
+    env: Dict[str, str], on_spawn: Optional[Callable[[subprocess.Popen], None]] = None
+) -> Optional[subprocess.Popen]:
     backend = (env.get("AI_BACKEND") or "").strip().lower()
     if backend != "ollama":
         return None
@@ -228,52 +310,104 @@ def ensure_ollama_running(env: Dict[str, str]) -> Optional[subprocess.Popen]:
     except FileNotFoundError:
         print("Failed to start Ollama daemon: binary not found after installation attempts.")
         return None
+    if on_spawn is not None:
+        on_spawn(proc)
 
-    start = time.monotonic()
-    timeout = 30.0
-    while time.monotonic() - start < timeout:
+    def check_exited() -> None:
         if proc.poll() is not None:
-            print("Ollama daemon exited unexpectedly during startup.")
-            return None
-        if ollama_service_ready(base_url):
+            raise RuntimeError("Ollama daemon exited unexpectedly during startup.")
+
+    try:
+        if poll_with_backoff(lambda: ollama_service_ready(base_url, timeout=1.0), 30.0, should_abort=check_exited):
             print("Ollama daemon is ready.")
             return proc
-        time.sleep(1.0)
+    except RuntimeError as exc:
+        print(exc)
+        return None
 
     print("Warning: Ollama daemon did not become ready within 30 seconds. Continuing, but LLM calls may fail.")
     return proc
 
 
-def backend_available(env: Dict[str, str]) -> bool:
-    host = env.get("HOST", "127.0.0.1")
-    port = env.get("PORT", "8000")
-    url = f"http://{host}:{port}/status"
+def backend_socket_path(env: Dict[str, str]) -> Optional[Path]:
+    value = (env.get("BACKEND_SOCKET") or "").strip()
+    if not value or not hasattr(socket, "AF_UNIX"):
+        return None
+    path = Path(value)
+    return path if path.is_absolute() else ROOT / path
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTP over a Unix domain socket, for health checks against BACKEND_SOCKET."""
+
+    def __init__(self, path: Path, timeout: float) -> None:
+        super().__init__("localhost", timeout=timeout)
+        self.path = path
+
+    def connect(self) -> None:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(str(self.path))
+        except OSError:
+            sock.close()
+            raise
+        self.sock = sock
+
+
+def status_ok(host: str, port: str, socket_path: Optional[Path] = None, timeout: float = 5.0) -> bool:
+    if socket_path is not None:
+        connection = UnixHTTPConnection(socket_path, timeout)
+        try:
+            connection.request("GET", "/status")
+            return connection.getresponse().status == 200
+        except (OSError, http.client.HTTPException):
+            return False
+        finally:
+            connection.close()
     try:
-        with urlopen(Request(url), timeout=3.0) as response:
+        with urlopen(Request(f"http://{host}:{port}/status"), timeout=timeout) as response:
             return response.getcode() == 200
-    except URLError:
+    except (URLError, ConnectionError):
         return False
 
 
+def backend_available(env: Dict[str, str]) -> bool:
+    return status_ok(env.get("HOST", "127.0.0.1"), env.get("PORT", "8000"), backend_socket_path(env), timeout=3.0)
+
+
 def start_backend(python_executable: Path, env: Dict[str, str]) -> Optional[subprocess.Popen]:
     host = env.get("HOST", "127.0.0.1")
     port = env.get("PORT", "8000")
+    workers = int(env.get("BACKEND_WORKERS", "1") or "1")
+
+    socket_path = backend_socket_path(env)
+    tcp = socket_path is None or env_flag(env, "BACKEND_TCP", True)
+    address = " and ".join(
+        ([f"{host}:{port}"] if tcp else []) + ([f"unix:{socket_path}"] if socket_path is not None else [])
+    )
 
     if backend_available(env):
-        print(f"Backend already running on {host}:{port}, reusing existing instance.")
+        print(f"Backend already running on {address}, reusing existing instance.")
         return None
 
-    cmd = [
-        str(python_executable),
-        "-m",
-        "uvicorn",
-        "backend.backend:app",
-        "--host",
-        host,
-        "--port",
-        port,
-    ]
-    print(f"Starting backend on {host}:{port} ...")
+    if socket_path is not None:
+        # Binds the socket itself (and TCP unless BACKEND_TCP=0); see backend/serve.py.
+        cmd = [str(python_executable), "-m", "backend.serve"]
+    else:
+        cmd = [
+            str(python_executable),
+            "-m",
+            "uvicorn",
+            "backend.backend:app",
+            "--host",
+            host,
+            "--port",
+            port,
+        ]
+        if workers > 1:
+            cmd += ["--workers", str(workers)]
+    print(f"Starting backend on {address} ({workers} worker{'s' if workers > 1 else ''}) ...")
     creationflags = getattr(subprocess, "CREATE_NEW_PROCESS_GROUP", 0)
     child_env = {**os.environ, **env}
     child_env["PYTHONPATH"] = f"{ROOT}{os.pathsep}" + child_env.get("PYTHONPATH", "")
@@ -293,23 +427,75 @@ def start_backend(python_executable: Path, env: Dict[str, str]) -> Optional[subp
 
 
 def wait_for_status(
-    host: str, port: str, timeout: float = 30.0, process: Optional[subprocess.Popen] = None
+    host: str,
+    port: str,
+    timeout: float = 30.0,
+    process: Optional[subprocess.Popen] = None,
+    socket_path: Optional[Path] = None,
 ) -> None:
-    url = f"http://{host}:{port}/status"
-    start = time.monotonic()
-    while True:
-        try:
-            request = Request(url)
-            with urlopen(request, timeout=5.0) as response:
-                if response.getcode() == 200:
-                    return
-        except URLError:
-            pass
+    def healthy() -> bool:
+        return status_ok(host, port, socket_path)
+
+    def check_exited() -> None:
         if process is not None and process.poll() is not None:
             raise RuntimeError("Backend process exited during startup.")
-        if time.monotonic() - start > timeout:
-            raise TimeoutError(f"Backend did not report healthy within {timeout} seconds")
-        time.sleep(1.0)
+
+    if not poll_with_backoff(healthy, timeout, initial_delay=0.02, max_delay=0.5, should_abort=check_exited):
+        raise TimeoutError(f"Backend did not report healthy within {timeout} seconds")
+
+
+class OllamaBootstrap:
+    """Gets Ollama ready on a worker thread while the backend starts.
+
+    Installation runs in `start()` on the calling thread, before anything runs
+    in parallel, because it may prompt for a sudo or UAC password. Starting
+    the daemon and pulling the model then run in the background. `stop()`
+    does not wait for them: it cancels the work, kills a pull in progress, and
+    stops the daemon if this bootstrap started it.
+    """
+
+    def __init__(self, env: Dict[str, str], timings: BootTimings) -> None:
+        self.env = env
+        self.timings = timings
+        self._children: List[Tuple[subprocess.Popen, str]] = []
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="bootstrap")
+        self._future: Optional[Future] = None
+        self._stopped = False
+
+    def start(self) -> None:
+        with self.timings.step("ollama install"):
+            ensure_ollama_installed(self.env)
+        self._future = self._pool.submit(self._prepare)
+
+    def wait(self) -> None:
+        if self._future is not None:
+            self._future.result()
+
+    def stop(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            self._stopped = True
+            children = list(reversed(self._children))
+        for proc, name in children:
+            terminate_process(proc, name)
+
+    def _track(self, name: str) -> Callable[[subprocess.Popen], None]:
+        def track(proc: subprocess.Popen) -> None:
+            with self._lock:
+                self._children.append((proc, name))
+                stopped = self._stopped
+            if stopped:
+                # Spawned after stop(): nobody else will clean it up.
+                terminate_process(proc, name)
+
+        return track
+
+    def _prepare(self) -> None:
+        with self.timings.step("ollama daemon"):
+            ensure_ollama_running(self.env, on_spawn=self._track("ollama daemon"))
+        with self.timings.step("ollama model"):
+            ensure_ollama_model(self.env, on_spawn=self._track("ollama pull"))
 
 
 def start_listener(python_executable: Path, env: Dict[str, str]) -> subprocess.Popen:
@@ -347,30 +533,54 @@ def terminate_process(proc: Optional[subprocess.Popen], name: str) -> None:
             proc.kill()
 
 
-def main() -> int:
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Bootstrap and launch the AI hotkey assistant.")
+    parser.add_argument("--reinstall", action="store_true", help="Reinstall dependencies even if requirements.txt is unchanged.")
+    parser.add_argument("--workers", type=int, default=None, help="Number of backend worker processes (default: BACKEND_WORKERS or 1).")
+    args = parser.parse_args(argv)
+    if args.workers is not None and args.workers < 1:
+        parser.error("--workers must be at least 1")
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    timings = BootTimings()
     env_values = parse_env_file(ENV_FILE)
     apply_env_defaults(env_values)
-    ensure_venv(VENV_DIR)
+    if args.workers is not None:
+        env_values["BACKEND_WORKERS"] = str(args.workers)
+    with timings.step("venv"):
+        ensure_venv(VENV_DIR)
     python_executable = venv_python(VENV_DIR)
     if not python_executable.exists():
         raise FileNotFoundError(f"Virtual environment Python not found at {python_executable}")
 
-    install_dependencies(python_executable)
-    clear_logs()
-    ensure_ollama_installed(env_values)
-    ollama_proc: Optional[subprocess.Popen] = ensure_ollama_running(env_values)
-    ensure_ollama_model(env_values)
-    backend_proc: Optional[subprocess.Popen] = start_backend(python_executable, env_values)
+    with timings.step("dependencies"):
+        install_dependencies(python_executable, force=args.reinstall)
+    if env_flag(env_values, "LOGS_CLEAR_ON_START", True):
+        with timings.step("clear logs"):
+            clear_logs()
+
+    backend_proc: Optional[subprocess.Popen] = None
     listener_proc: Optional[subprocess.Popen] = None
+    ollama = OllamaBootstrap(env_values, timings)
+    ollama.start()
 
     try:
-        wait_for_status(
-            env_values.get("HOST", "127.0.0.1"),
-            env_values.get("PORT", "8000"),
-            process=backend_proc,
-        )
+        with timings.step("backend spawn"):
+            backend_proc = start_backend(python_executable, env_values)
+        with timings.step("backend ready"):
+            wait_for_status(
+                env_values.get("HOST", "127.0.0.1"),
+                env_values.get("PORT", "8000"),
+                process=backend_proc,
+                socket_path=backend_socket_path(env_values),
+            )
         print("Backend is ready.")
+        ollama.wait()
         listener_proc = start_listener(python_executable, env_values)
+        timings.report()
 
         while True:
             time.sleep(1.0)
@@ -384,7 +594,7 @@ def main() -> int:
     finally:
         terminate_process(listener_proc, "listener")
         terminate_process(backend_proc, "backend")
-        terminate_process(ollama_proc, "ollama daemon")
+        ollama.stop()
     return 0
 
 
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""Micro-benchmark for /generate request parsing and response serialisation.
+
+Compares the previous path (stdlib json into a dict, FastAPI's Dict[str, Any]
+validation, then GenerationPayload.model_validate; stdlib json for the
+response) with the single-pass path (GenerationPayload.model_validate_json on
+the raw body; orjson for the response) on payloads carrying screenshot-sized
+base64 images. Reports CPU time and peak allocated memory per request.
+
+    python scripts/bench_json.py --image-kib 512 2048 --images 1 3
+"""
+from __future__ import annotations
+
+import argparse
+import base64
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from pydantic import TypeAdapter
+
+from backend.backend import GenerationPayload
+from backend.fastjson import dumps, orjson
+
+RESPONSE = {
+    "status": "ok",
+    "id": "5d0c6c1e-2f53-4d0a-9a4e-8c3c9d1f0b7a",
+    "model": "llama3.1:8b",
+    "response": "1. Read the screenshot.\n" * 40 + "Answer: 192.168.10.0/26",
+    "final_answer": "Answer: 192.168.10.0/26",
+    "elapsed_ms": 1834,
+}
+
+
+def build_body(image_kib: int, images: int) -> bytes:
+    raw = os.urandom(image_kib * 1024)
+    encoded = base64.b64encode(raw).decode("ascii")
+    payload = {
+        "prompt": "What subnet is shown in the screenshot?",
+        "context": {"question_type": "subnetting"},
+        "images": [encoded] * images,
+        "options": {"max_tokens": 256},
+    }
+    return json.dumps(payload).encode("utf-8")
+
+
+def previous_path(body: bytes) -> bytes:
+    data = json.loads(body)
+    data = TypeAdapter(Dict[str, Any]).validate_python(data)
+    GenerationPayload.model_validate(data)
+    return json.dumps(RESPONSE, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def fast_path(body: bytes) -> bytes:
+    GenerationPayload.model_validate_json(body)
+    return dumps(RESPONSE)
+
+
+def _measure(run: Callable[[bytes], bytes], body: bytes, rounds: int) -> Dict[str, float]:
+    run(body)
+    samples: List[float] = []
+    for _ in range(rounds):
+        started = time.process_time()
+        run(body)
+        samples.append((time.process_time() - started) * 1000)
+    tracemalloc.start()
+    run(body)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"cpu_ms": statistics.median(samples), "peak_kib": peak / 1024}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--image-kib", type=int, nargs="+", default=[512, 2048], help="Raw size of each image.")
+    parser.add_argument("--images", type=int, nargs="+", default=[1, 3])
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    if orjson is None:
+        print("orjson is not installed; responses use the stdlib fallback.")
+    header = f"{'body KiB':>9} {'path':>9} {'cpu ms':>9} {'peak KiB':>10} {'cpu saved':>10} {'mem saved':>10}"
+    print(header)
+    print("-" * len(header))
+    for image_kib in args.image_kib:
+        for images in args.images:
+            body = build_body(image_kib, images)
+            before = _measure(previous_path, body, args.rounds)
+            after = _measure(fast_path, body, args.rounds)
+            size = len(body) / 1024
+            print(f"{size:>9.0f} {'previous':>9} {before['cpu_ms']:>9.2f} {before['peak_kib']:>10.0f}")
+            print(
+                f"{size:>9.0f} {'fast':>9} {after['cpu_ms']:>9.2f} {after['peak_kib']:>10.0f} "
+                f"{1 - after['cpu_ms'] / before['cpu_ms']:>10.0%} {1 - after['peak_kib'] / before['peak_kib']:>10.0%}"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""Micro-benchmark for notes retrieval as the vault grows.
+
+Generates synthetic Obsidian-style vaults and measures `gather_relevant_notes`
+in scan mode and indexed mode: cold latency, warm latency, peak memory and the
+number of files opened per query. Exits non-zero when the indexed warm p95 at
+the gate size exceeds the gate threshold.
+
+    python scripts/bench_notes.py --sizes 100 1000 10000 50000
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from backend.notes import gather_relevant_notes, reset_notes_indexes
+
+TOPICS = [
+    "ARP", "IPv4", "IPv6", "Subnetting", "VLAN", "OSPF", "Ethernet", "Switching", "Routing", "DHCP",
+    "DNS", "TCP", "UDP", "NAT", "ACL", "STP", "EtherChannel", "Wireless", "SSH", "Telnet",
+]
+VOCABULARY = [
+    "address", "broadcast", "network", "host", "mask", "prefix", "gateway", "frame", "packet", "header",
+    "router", "switch", "interface", "port", "protocol", "segment", "table", "forwarding", "mac", "cable",
+    "fiber", "copper", "console", "config", "verify", "ping", "traceroute", "neighbor", "discovery", "layer",
+]
+QUERIES = [
+    "what is the broadcast address for 10.1.2.0/23",
+    "how does arp resolve a mac address",
+    "explain ospf neighbor discovery",
+    "configure ssh on a cisco router interface",
+    "difference between tcp and udp segment header",
+]
+
+_opened = 0
+_counting = False
+
+
+def _audit(event: str, _args: tuple) -> None:
+    global _opened
+    if _counting and event == "open":
+        _opened += 1
+
+
+def build_vault(target: Path, count: int, seed: int = 7) -> None:
+    rng = random.Random(seed)
+    module_size = 40
+    for index in range(count):
+        module = target / "CCNA" / f"Module {index // module_size + 1}"
+        module.mkdir(parents=True, exist_ok=True)
+        topic = rng.choice(TOPICS)
+        title = f"Networking – {topic} {index}"
+        links = " ".join(f"[[Networking – {rng.choice(TOPICS)} {rng.randrange(count)}]]" for _ in range(3))
+        sections = []
+        for heading in ("Key Ideas", "Definitions", "Explanation", "Common Mistakes", "Quick Checks"):
+            bullets = "\n".join(
+                "- " + " ".join(rng.choice(VOCABULARY) for _ in range(rng.randint(6, 14)))
+                for _ in range(rng.randint(3, 6))
+            )
+            sections.append(f"## {heading}\n{bullets}")
+        body = (
+            f"---\ntitle: \"{title}\"\ntags: [\"networking\", \"{topic.lower()}\"]\n---\n\n"
+            f"# {title}\n\n" + "\n\n".join(sections) + f"\n\n## Connections\n- Related: {links}\n"
+        )
+        (module / f"{title}.md").write_text(body, encoding="utf-8")
+
+
+def _measure(run: Callable[[str], List[str]], queries: List[str], rounds: int) -> Dict[str, float]:
+    global _opened, _counting
+    started = time.perf_counter()
+    run(queries[0])
+    cold_ms = (time.perf_counter() - started) * 1000
+
+    samples: List[float] = []
+    _opened = 0
+    _counting = True
+    try:
+        for _ in range(rounds):
+            for query in queries:
+                started = time.perf_counter()
+                run(query)
+                samples.append((time.perf_counter() - started) * 1000)
+    finally:
+        _counting = False
+    files_per_query = _opened / max(1, len(samples))
+
+    tracemalloc.start()
+    run(queries[-1])
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    samples.sort()
+    return {
+        "cold_ms": cold_ms,
+        "warm_p50_ms": statistics.median(samples),
+        "warm_p95_ms": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        "peak_kib": peak / 1024,
+        "files_per_query": files_per_query,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000, 50000])
+    parser.add_argument("--modes", nargs="+", choices=["scan", "index"], default=["scan", "index"])
+    parser.add_argument("--rounds", type=int, default=20, help="Warm rounds over the query set (index mode).")
+    parser.add_argument("--scan-rounds", type=int, default=1, help="Warm rounds over the query set (scan mode).")
+    parser.add_argument("--gate-size", type=int, default=10000)
+    parser.add_argument("--gate-ms", type=float, default=10.0)
+    parser.add_argument("--keep", action="store_true", help="Keep generated vaults for inspection.")
+    args = parser.parse_args()
+
+    sys.addaudithook(_audit)
+    failures: List[str] = []
+    header = f"{'notes':>7} {'mode':>6} {'cold ms':>10} {'p50 ms':>9} {'p95 ms':>9} {'peak KiB':>10} {'files/q':>8}"
+    print(header)
+    print("-" * len(header))
+    for size in args.sizes:
+        vault = Path(tempfile.mkdtemp(prefix=f"notes-bench-{size}-"))
+        try:
+            build_vault(vault, size)
+            for mode in args.modes:
+                reset_notes_indexes()
+                use_index = mode == "index"
+                rounds = args.rounds if use_index else args.scan_rounds
+                result = _measure(
+                    lambda query: gather_relevant_notes(query, notes_root=vault, use_index=use_index),
+                    QUERIES,
+                    rounds,
+                )
+                print(
+                    f"{size:>7} {mode:>6} {result['cold_ms']:>10.1f} {result['warm_p50_ms']:>9.2f} "
+                    f"{result['warm_p95_ms']:>9.2f} {result['peak_kib']:>10.1f} {result['files_per_query']:>8.1f}"
+                )
+                if use_index and size == args.gate_size and result["warm_p95_ms"] > args.gate_ms:
+                    failures.append(
+                        f"indexed retrieval p95 {result['warm_p95_ms']:.2f} ms at {size} notes exceeds {args.gate_ms} ms"
+                    )
+        finally:
+            if args.keep:
+                print(f"  vault kept at {vault}")
+            else:
+                shutil.rmtree(vault, ignore_errors=True)
+            reset_notes_indexes()
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
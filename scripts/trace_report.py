@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""Hotkey-to-pixel latency report from the listener and backend trace files.
+
+The listener writes a record per traced request to client/data/traces.jsonl
+(key press, capture, encode, send, first byte, last byte), the overlay process
+adds when the answer was rendered, and the backend writes its stage timings to
+backend/data/traces.jsonl. Records are joined on the trace id and shown as a
+waterfall per request plus percentiles per stage across all requests.
+
+    python scripts/trace_report.py                 # last 5 waterfalls + percentiles
+    python scripts/trace_report.py --last 20 --kind screenshot
+    python scripts/trace_report.py --trace 3f9c2a... --no-summary
+
+Backend spans are placed by wall-clock time, which is exact when the backend
+runs on the same machine. For a remote backend pass only the client file: the
+stage durations from the Server-Timing header are shown instead, laid end to
+end from the moment the request was sent.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+DEFAULT_FILES = [ROOT / "client" / "data" / "traces.jsonl", ROOT / "backend" / "data" / "traces.jsonl"]
+
+# Client stages, each ending at the mark of the same index.
+CLIENT_STAGES = (
+    ("capture", "captured"),
+    ("encode", "encoded"),
+    ("queue", "sent"),
+    ("request", "first_byte"),
+    ("download", "last_byte"),
+)
+BAR_WIDTH = 48
+
+
+@dataclass
+class Stage:
+    name: str
+    start: float  # ms after the key press
+    end: float
+    depth: int = 0
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+@dataclass
+class RequestTrace:
+    trace_id: str
+    client: Dict
+    backend: Optional[Dict] = None
+    overlay: Optional[Dict] = None
+    stages: List[Stage] = field(default_factory=list)
+
+    @property
+    def total(self) -> float:
+        return max((stage.end for stage in self.stages), default=0.0)
+
+
+def load_records(paths: Iterable[Path]) -> Dict[str, Dict[str, Dict]]:
+    """Records by trace id and source ("client", "backend", "overlay")."""
+
+    records: Dict[str, Dict[str, Dict]] = {}
+    for path in paths:
+        if not path.exists():
+            continue
+        with path.open(encoding="utf-8") as stream:
+            for line in stream:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(record, dict) and "trace_id" in record:
+                    records.setdefault(record["trace_id"], {})[record.get("source", "")] = record
+    return records
+
+
+def parse_server_timing(header: str) -> List[Tuple[str, float]]:
+    timings = []
+    for item in header.split(","):
+        name, _, params = item.strip().partition(";")
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "dur":
+                try:
+                    timings.append((name, float(value)))
+                except ValueError:
+                    pass
+    return timings
+
+
+def build_trace(trace_id: str, sources: Dict[str, Dict]) -> RequestTrace:
+    client = sources["client"]
+    trace = RequestTrace(trace_id, client, sources.get("backend"), sources.get("overlay"))
+    marks: Dict[str, float] = client.get("marks", {})
+    previous = 0.0
+    for name, mark in CLIENT_STAGES:
+        if mark in marks:
+            trace.stages.append(Stage(name, previous, marks[mark]))
+            previous = marks[mark]
+    if trace.overlay is not None:
+        rendered = (trace.overlay["start_ns"] - client["start_ns"]) / 1e6
+        trace.stages.append(Stage("render", previous, max(previous, rendered)))
+    elif "handled" in marks:
+        trace.stages.append(Stage("handoff", previous, marks["handled"]))
+
+    sent = marks.get("sent", 0.0)
+    if trace.backend is not None:
+        offset = (trace.backend["start_ns"] - client["start_ns"]) / 1e6
+        for name, start, duration in trace.backend.get("spans", []):
+            if name != "total":
+                # Dotted names are sub-stages, e.g. upstream.ttfb within upstream.
+                depth = 1 + name.count(".")
+                trace.stages.append(Stage(f"backend.{name}", offset + start, offset + start + duration, depth))
+    elif client.get("server_timing"):
+        # Durations only: lay the top-level stages end to end from the send.
+        cursor = sent
+        for name, duration in parse_server_timing(client["server_timing"]):
+            if name == "total" or "." in name:
+                continue
+            trace.stages.append(Stage(f"backend.{name}", cursor, cursor + duration, depth=1))
+            cursor += duration
+    trace.stages.sort(key=lambda stage: (stage.start, stage.depth))
+    return trace
+
+
+def render_waterfall(trace: RequestTrace) -> str:
+    total = trace.total or 1.0
+    label_width = max(len(stage.name) + 2 * stage.depth for stage in trace.stages) if trace.stages else 8
+    lines = [f"trace {trace.trace_id} ({trace.client.get('kind', '?')}) total {trace.total:.1f} ms"]
+    for stage in trace.stages:
+        begin = int(stage.start / total * BAR_WIDTH)
+        width = max(1, int(round(stage.duration / total * BAR_WIDTH)))
+        bar = (" " * begin + "#" * width)[:BAR_WIDTH].ljust(BAR_WIDTH)
+        label = ("  " * stage.depth + stage.name).ljust(label_width)
+        lines.append(f"  {label} |{bar}| {stage.start:9.1f} +{stage.duration:9.1f} ms")
+    return "\n".join(lines)
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def render_summary(traces: List[RequestTrace]) -> str:
+    durations: Dict[str, List[float]] = {}
+    for trace in traces:
+        for stage in trace.stages:
+            durations.setdefault(stage.name, []).append(stage.duration)
+        durations.setdefault("total", []).append(trace.total)
+    width = max(len(name) for name in durations)
+    lines = [
+        f"{len(traces)} request(s); stage durations in ms",
+        f"  {'stage'.ljust(width)} {'n':>5} {'p50':>9} {'p90':>9} {'p99':>9} {'max':>9}",
+    ]
+    for name, samples in durations.items():
+        lines.append(
+            f"  {name.ljust(width)} {len(samples):>5} {percentile(samples, 0.5):9.1f} "
+            f"{percentile(samples, 0.9):9.1f} {percentile(samples, 0.99):9.1f} {max(samples):9.1f}"
+        )
+    return "\n".join(lines)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="*", type=Path, default=DEFAULT_FILES, help="Trace files to join")
+    parser.add_argument("--last", type=int, default=5, help="Waterfalls to print (most recent first)")
+    parser.add_argument("--kind", choices=["prompt", "clipboard", "screenshot"], help="Only requests of this kind")
+    parser.add_argument("--trace", help="Print the waterfall of a single trace id")
+    parser.add_argument("--no-summary", action="store_true", help="Skip the percentile table")
+    args = parser.parse_args()
+
+    records = load_records(args.files)
+    traces = [
+        build_trace(trace_id, sources)
+        for trace_id, sources in records.items()
+        if "client" in sources and (args.kind is None or sources["client"].get("kind") == args.kind)
+    ]
+    traces.sort(key=lambda trace: trace.client["start_ns"], reverse=True)
+    if args.trace:
+        traces = [trace for trace in traces if trace.trace_id == args.trace]
+    if not traces:
+        print("No traced requests found.")
+        return 1
+
+    for trace in traces[: 1 if args.trace else max(0, args.last)]:
+        print(render_waterfall(trace))
+        print()
+    if not args.no_summary:
+        print(render_summary(traces))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
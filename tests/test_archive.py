@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import backend.archive as archive
+import backend.storage as storage
+
+
+@pytest.fixture
+def log_db(tmp_path, monkeypatch: pytest.MonkeyPatch):
+    db_path = tmp_path / "ai_logs.db"
+    monkeypatch.setattr(storage, "DB_PATH", db_path)
+    monkeypatch.setattr(storage, "LOG_FILE", tmp_path / "ai_output.jsonl")
+    monkeypatch.setattr(archive, "DB_PATH", db_path)
+    monkeypatch.setattr(archive, "ARCHIVE_DIR", tmp_path / "archive")
+    (tmp_path / "archive").mkdir()
+    storage._ensure_sqlite_schema()
+    return db_path
+
+
+def test_retention_returns_freed_pages(log_db) -> None:
+    old = (datetime.now(timezone.utc) - timedelta(days=30)).isoformat()
+    with sqlite3.connect(log_db) as connection:
+        connection.executemany(
+            "INSERT INTO logs (id, created_at, backend, model, prompt, response, elapsed_ms) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(f"row-{index}", old, "ollama", "m", "prompt", "x" * 4000, 1) for index in range(500)],
+        )
+        connection.commit()
+
+    archive.apply_retention(retention_days=7, max_bytes=1 << 30)
+
+    with sqlite3.connect(log_db) as connection:
+        assert connection.execute("SELECT COUNT(*) FROM logs").fetchone()[0] == 0
+        assert connection.execute("PRAGMA freelist_count").fetchone()[0] == 0
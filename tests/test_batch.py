@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, List
+
+import pytest
+from fastapi.testclient import TestClient
+
+import backend.backend as backend_app
+import backend.config as config
+import backend.ratelimit as ratelimit
+
+
+@pytest.fixture
+def default_settings(monkeypatch: pytest.MonkeyPatch):
+    """Settings as they are with an empty .env, and a fresh key registry."""
+
+    monkeypatch.setattr(config, "_load_raw_env", lambda: {})
+    config.get_settings.cache_clear()
+    monkeypatch.setattr(ratelimit, "_REGISTRY", None)
+    yield config.get_settings()
+    config.get_settings.cache_clear()
+
+
+@pytest.fixture
+def client(default_settings, monkeypatch: pytest.MonkeyPatch) -> TestClient:
+    async def ready() -> None:
+        return None
+
+    async def generate_response(**kwargs: Any) -> Dict[str, Any]:
+        return {
+            "id": kwargs["question"],
+            "model": "m",
+            "response": "Answer: 1",
+            "final_answer": "Answer: 1",
+            "elapsed_ms": 0,
+        }
+
+    async def archive_responses(*args: Any) -> None:
+        return None
+
+    monkeypatch.setattr(backend_app, "wait_until_ready", ready)
+    monkeypatch.setattr(backend_app, "generate_response", generate_response)
+    monkeypatch.setattr(backend_app, "archive_responses", archive_responses)
+    monkeypatch.setattr(backend_app.context, "select_history", lambda prompt, domain: [])
+    monkeypatch.setattr(backend_app, "gather_relevant_notes", lambda prompt: [])
+    return TestClient(backend_app.app)
+
+
+def _lines(response) -> List[Dict[str, Any]]:
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+@pytest.mark.parametrize("size", [12, 100])
+def test_default_size_batch_succeeds_under_default_limits(client: TestClient, default_settings, size: int) -> None:
+    assert size <= default_settings.batch_max_prompts
+    response = client.post(
+        "/generate-batch",
+        json={"prompts": [f"question {index}" for index in range(size)], "context": {}},
+        headers={"x-api-key": default_settings.api_key},
+    )
+    assert response.status_code == 200
+    lines = _lines(response)
+    assert lines[-1] == {"status": "done", "count": size, "failed": 0}
+
+
+def test_large_batch_only_empties_the_bucket(client: TestClient, default_settings) -> None:
+    headers = {"x-api-key": default_settings.api_key}
+    prompts = [f"question {index}" for index in range(default_settings.rate_limit_burst + 5)]
+    assert client.post("/generate-batch", json={"prompts": prompts, "context": {}}, headers=headers).status_code == 200
+    assert client.post("/generate-batch", json={"prompts": prompts, "context": {}}, headers=headers).status_code == 429
@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+import backend.cancellation as cancellation
+import backend.config as config
+from backend.backend import cancel_generation
+from backend.cancellation import RequestCancelled, registry
+
+
+@pytest.fixture(autouse=True)
+def default_settings(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(config, "_load_raw_env", lambda: {})
+    config.get_settings.cache_clear()
+    yield config.get_settings()
+    config.get_settings.cache_clear()
+
+
+def _request(key_id: str) -> SimpleNamespace:
+    return SimpleNamespace(state=SimpleNamespace(key_policy=SimpleNamespace(key_id=key_id)))
+
+
+def test_only_the_owning_key_can_cancel() -> None:
+    async def scenario() -> None:
+        started = asyncio.Event()
+
+        async def work() -> None:
+            started.set()
+            await asyncio.sleep(5)
+
+        runner = asyncio.create_task(registry.run("req-1", work(), owner="key-a"))
+        await started.wait()
+        with pytest.raises(HTTPException) as denied:
+            await cancel_generation("req-1", _request("key-b"))
+        assert denied.value.status_code == 404
+        assert not runner.done()
+        assert await cancel_generation("req-1", _request("key-a")) == {"status": "cancelled", "id": "req-1"}
+        with pytest.raises(RequestCancelled):
+            await runner
+
+    asyncio.run(scenario())
+
+
+def test_shared_cancel_requires_the_owning_key(tmp_path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(cancellation, "CANCEL_DB", tmp_path / "cancellations.db")
+    cancellation._record_running("req-2", "key-a")
+    assert not cancellation.request_shared_cancel("req-2", "key-b")
+    assert not cancellation._take_shared_cancel("req-2")
+    assert cancellation.request_shared_cancel("req-2", "key-a")
+    assert cancellation._take_shared_cancel("req-2")
+    cancellation._forget_running("req-2")
+    assert not cancellation.request_shared_cancel("req-2", "key-a")
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import threading
+import time
+from pathlib import Path
+
+from backend import notes
+from backend.notes import IncrementalNotesQuery, NotesIndex, _tokenize
+from backend.notes_store import MappedNotesIndex
+
+
+def _write_vault(root: Path, count: int) -> None:
+    for number in range(count):
+        (root / f"note{number}.md").write_text(f"# Note {number}\nvlan trunk port{number}\n", encoding="utf-8")
+
+
+def _wait_for(predicate, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_stale_index_refreshes_off_the_query_path(tmp_path: Path, monkeypatch) -> None:
+    _write_vault(tmp_path, 3)
+    index = NotesIndex(root=tmp_path, refresh_interval=0.0)
+    index.refresh()
+    (tmp_path / "late.md").write_text("# Late\nvlan\n", encoding="utf-8")
+
+    release = threading.Event()
+    walked = threading.Event()
+    original = notes.iter_markdown_files
+
+    def slow_walk(root: Path):
+        walked.set()
+        release.wait(5)
+        return original(root)
+
+    monkeypatch.setattr(notes, "iter_markdown_files", slow_walk)
+    started = time.monotonic()
+    results = index.search({"vlan"}, 10)
+    assert time.monotonic() - started < 1.0
+    assert len(results) == 3
+    assert walked.wait(5)
+    release.set()
+    _wait_for(lambda: len(index.search({"vlan"}, 10)) == 4)
+
+
+def test_queries_during_refresh_see_a_consistent_index(tmp_path: Path) -> None:
+    _write_vault(tmp_path, 200)
+    index = NotesIndex(root=tmp_path, refresh_interval=3600.0)
+    index.refresh()
+    query = IncrementalNotesQuery(index)
+    errors: list[Exception] = []
+    stop = threading.Event()
+
+    def churn() -> None:
+        number = 0
+        while not stop.is_set():
+            path = tmp_path / f"note{number % 200}.md"
+            path.write_text(f"# Note\nvlan edited {number}\n" if number % 2 else "", encoding="utf-8")
+            index.refresh()
+            number += 1
+
+    writer = threading.Thread(target=churn)
+    writer.start()
+    try:
+        for attempt in range(300):
+            try:
+                text = "vlan trunk" if attempt % 2 else "vlan"
+                query.update(text)
+                query.results(5)
+                index.search(_tokenize(text), 5, neighbours=2)
+            except Exception as exc:
+                errors.append(exc)
+                break
+    finally:
+        stop.set()
+        writer.join()
+    assert not errors
+
+
+def test_mapped_index_breaks_ties_like_the_in_memory_index(tmp_path: Path) -> None:
+    vault = tmp_path / "vault"
+    vault.mkdir()
+    # Written in reverse so neither insertion order nor inode order matches path order.
+    for name in ["e", "d", "c", "b", "a"]:
+        (vault / f"{name}.md").write_text(f"# {name}\nospf area\n[[hub]]\n", encoding="utf-8")
+    (vault / "hub.md").write_text("# hub\nrouting\n", encoding="utf-8")
+    (vault / "z.md").write_text("# z\nospf ospf area\n", encoding="utf-8")
+
+    index = NotesIndex(root=vault)
+    index.refresh()
+    mapped = MappedNotesIndex(root=vault, path=tmp_path / "notes_index.bin")
+
+    expected = index.search({"ospf", "area"}, 3, neighbours=1)
+    assert [excerpt.splitlines()[0] for excerpt in expected] == [
+        "### Note: z.md",
+        "### Note: a.md",
+        "### Note: b.md",
+        "### Linked note: hub.md",
+    ]
+    assert mapped.search({"ospf", "area"}, 3, neighbours=1) == expected
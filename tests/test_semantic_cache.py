@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+from backend.prompts_loader import GenerationProfile
+from backend.semantic_cache import SemanticCache, cache_scope, normalise
+
+VECTOR = normalise([0.3, 0.5, 0.8])
+SYSTEM = "You are a networking tutor."
+PROFILE = GenerationProfile(max_tokens=256, temperature=0.0)
+
+
+def _cache_with(question: str) -> SemanticCache:
+    cache = SemanticCache(threshold=0.92)
+    cache.add("subnetting", "first", VECTOR, cache_scope(question, SYSTEM, PROFILE))
+    return cache
+
+
+def test_same_numbers_hit() -> None:
+    cache = _cache_with("How many usable hosts are in a /23?")
+    scope = cache_scope("How many usable hosts fit in a /23 network?", SYSTEM, PROFILE)
+    match = cache.lookup("subnetting", VECTOR, scope)
+    assert match is not None and match[0] == "first"
+
+
+def test_different_numbers_miss() -> None:
+    cache = _cache_with("How many usable hosts are in a /23?")
+    assert cache.lookup("subnetting", VECTOR, cache_scope("How many usable hosts are in a /24?", SYSTEM, PROFILE)) is None
+
+
+def test_different_addresses_miss() -> None:
+    cache = _cache_with("What is the network address of 10.1.2.77/23?")
+    scope = cache_scope("What is the network address of 10.1.4.77/23?", SYSTEM, PROFILE)
+    assert cache.lookup("subnetting", VECTOR, scope) is None
+
+
+def test_system_prompt_and_options_are_part_of_the_scope() -> None:
+    question = "How many usable hosts are in a /23?"
+    cache = _cache_with(question)
+    assert cache.lookup("subnetting", VECTOR, cache_scope(question, SYSTEM + " Be brief.", PROFILE)) is None
+    tighter = PROFILE.merged({"max_tokens": 64})
+    assert cache.lookup("subnetting", VECTOR, cache_scope(question, SYSTEM, tighter)) is None
@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import pytest
+
+from backend.services.solvers import solve
+
+
+@pytest.mark.parametrize(
+    "question",
+    [
+        "What is the wildcard mask for 10.0.0.0/8?",
+        "Is 10.1.3.255 a usable host in 10.1.2.0/23?",
+        "What is the next subnet after 192.168.1.0/26?",
+        "What is the previous subnet before 192.168.1.64/26?",
+        "Are 10.0.0.5/24 and 10.0.1.5 in the same subnet?",
+        "What class is 172.16.4.1/16?",
+        "Explain 192.168.1.0/24.",
+        "Divide 192.168.1.0/24 into 4 subnets.",
+        "What is the network address of 10.0.0.0/8 and 10.1.0.0/16?",
+    ],
+)
+def test_unrecognised_questions_fall_through(question: str) -> None:
+    assert solve("subnetting", question) is None
+
+
+@pytest.mark.parametrize(
+    ("question", "answer"),
+    [
+        ("What is the network address of 192.168.1.77/26?", "Answer: Network 192.168.1.64/26"),
+        ("What is the broadcast address for 10.1.2.0/23?", "Answer: Broadcast 10.1.3.255/23"),
+        ("How many usable hosts are in 172.16.0.0/20?", "Answer: 4094 usable hosts"),
+        (
+            "Give the first and last host of 192.168.1.130 255.255.255.192",
+            "Answer: First host 192.168.1.129/26, last host 192.168.1.190/26",
+        ),
+        (
+            "Find the network address, host range and broadcast of 10.0.0.9/30",
+            "Answer: Network 10.0.0.8/30, first host 10.0.0.9/30, last host 10.0.0.10/30, broadcast 10.0.0.11/30",
+        ),
+    ],
+)
+def test_answers_only_what_was_asked(question: str, answer: str) -> None:
+    response = solve("subnetting", question)
+    assert response is not None
+    assert response.splitlines()[-1] == answer
+
+
+def test_other_domains_have_no_solver() -> None:
+    assert solve("sql", "What is the network address of 192.168.1.77/26?") is None
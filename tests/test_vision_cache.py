@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import base64
+import io
+
+import pytest
+
+pytest.importorskip("PIL")
+from PIL import Image, ImageDraw, ImageFont  # noqa: E402
+
+import backend.vision_cache as vision_cache  # noqa: E402
+from backend.vision_cache import VisionCache, VisionEntry, hash_images, prompt_key  # noqa: E402
+
+
+def _screenshot(question: str, size: int = 14) -> str:
+    image = Image.new("RGB", (1920, 1080), (250, 250, 250))
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((300, 200, 1600, 800), fill=(255, 255, 255), outline=(120, 120, 120))
+    draw.text((340, 300), question, fill=(20, 20, 20), font=ImageFont.load_default(size=size))
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG")
+    return base64.b64encode(buffer.getvalue()).decode("ascii")
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch: pytest.MonkeyPatch) -> VisionCache:
+    monkeypatch.setattr(vision_cache, "VISION_CACHE_DB", tmp_path / "vision_cache.db")
+    return VisionCache()
+
+
+def _store(cache: VisionCache, key: str, image: str) -> None:
+    hashes = hash_images([image], 256)
+    assert hashes is not None
+    cache.add(VisionEntry("first", key, hashes, "m", "Answer: 62", "Answer: 62"))
+
+
+@pytest.mark.parametrize("size", [14, 20, 28])
+def test_one_digit_change_misses(cache: VisionCache, size: int) -> None:
+    key = prompt_key("m", "Answer the question on screen.")
+    _store(cache, key, _screenshot("How many usable hosts are in 192.168.1.77/26?", size))
+    changed = hash_images([_screenshot("How many usable hosts are in 192.168.1.77/27?", size)], 256)
+    assert changed is not None
+    assert cache.lookup(key, changed) is None
+    # Also after a restart, when the entry comes from disk.
+    assert VisionCache().lookup(key, changed) is None
+
+
+def test_identical_capture_hits_from_disk(cache: VisionCache) -> None:
+    key = prompt_key("m", "Answer the question on screen.")
+    image = _screenshot("How many usable hosts are in 192.168.1.77/26?")
+    _store(cache, key, image)
+    hashes = hash_images([image], 256)
+    assert hashes is not None
+    match = VisionCache().lookup(key, hashes)
+    assert match is not None and match[0].id == "first" and match[2] == "disk"